@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import os
 
 base_path= os.path.dirname(os.path.abspath(__file__))
@@ -0,0 +1,256 @@
+# Headless HTTP API over the CAPM, indicator and forecast code, so other services don't have to
+# go through the Streamlit pages. It is a plain ASGI app (Starlette, which Streamlit already
+# ships with); blocking work runs on a thread pool behind async handlers.
+# Responses are cached in memory with an ETag, and concurrent requests for the same computation
+# (same tickers and parameters) wait on one shared job instead of each starting their own.
+#
+#   uvicorn api:app --port 8000
+#   curl 'localhost:8000/capm?tickers=AAPL,MSFT&years=1&rf=4'
+#   curl 'localhost:8000/indicators/AAPL?name=rsi&period=1y'
+#   curl 'localhost:8000/forecast/AAPL?order=auto&bands=1'
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import hashlib
+import warnings
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import numpy as np
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+import capm_functions
+from pages.utils.data_cache import default_cache
+from pages.utils.bulk_download import fetch_many
+
+API_TTL = float(os.environ.get("CAPM_API_TTL", 300))
+FORECAST_TTL = float(os.environ.get("CAPM_API_FORECAST_TTL", 3600))
+EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get("CAPM_API_WORKERS", 8)), thread_name_prefix='api')
+INDICATOR_PARAMS = {'rsi': ('length',), 'sma': ('length',), 'macd': ('fast', 'slow', 'signal')}
+
+
+class NotFound(Exception):
+    # no such ticker, or not enough history to answer; the only error the routes turn into a 404
+    pass
+
+
+class ResponseCache:
+    # serialized JSON bodies with their ETag, dropped after their ttl or when least recently used
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0}
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[2] < time.time():
+            self._entries.pop(key, None)
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry
+
+    def put(self, key, body, ttl):
+        entry = (body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"', time.time() + ttl)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+
+class Coalescer:
+    # one executor job per key at a time; requests arriving while it runs await the same future
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.stats = {'computed': 0, 'coalesced': 0}
+        self._inflight = {}
+
+    async def run(self, key, fn, *args):
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.stats['computed'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        # shielded so one client going away doesn't cancel the job for the others
+        return await asyncio.shield(future)
+
+
+CACHE = ResponseCache()
+COALESCER = Coalescer(EXECUTOR)
+
+
+#function to make a payload JSON-safe: NaN/inf become null, numpy scalars and timestamps plain values
+def _clean(value):
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return None if not math.isfinite(value) else float(value)
+    if isinstance(value, (pd.Timestamp, date)):
+        return value.isoformat()[:10]
+    return value
+
+
+def _records(frame):
+    return _clean(frame.reset_index().to_dict('records'))
+
+
+def _json(payload, status_code=200, headers=None):
+    body = json.dumps(_clean(payload), separators=(',', ':')).encode()
+    return Response(body, status_code=status_code, media_type='application/json', headers=headers)
+
+
+#function to answer from the response cache, or compute once (coalesced) and cache; honours If-None-Match
+async def _serve(request, key, ttl, fn, *args):
+    entry = CACHE.get(key)
+    if entry is None:
+        try:
+            payload = await COALESCER.run(key, fn, *args)
+        except NotFound as error:
+            return _json({'error': str(error)}, 404)
+        except ValueError as error:
+            return _json({'error': str(error)}, 422)
+        entry = CACHE.put(key, json.dumps(_clean(payload), separators=(',', ':')).encode(), ttl)
+    body, etag, expires = entry
+    headers = {'ETag': etag, 'Cache-Control': f"max-age={max(int(expires - time.time()), 0)}"}
+    if etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+#function for the CAPM page's numbers: beta, alpha, R² and expected return per ticker against sp500
+def capm_payload(tickers, years, rf):
+    cache = default_cache()
+    end = date.today()
+    start = date(end.year - years, end.month, end.day)
+    sp500 = cache.get('sp500', 'fred', start, end)[['sp500']].reset_index()
+    prices, report = fetch_many(list(tickers), 'yahoo', start, end, cache=cache)
+    if len(prices.columns) < 2:
+        raise NotFound("none of the tickers could be downloaded")
+    returns = capm_functions.daily_returns(pd.merge(prices, sp500, on='Date', how='inner'))
+    stats = capm_functions.batch_regression(returns, 'sp500', rf / 252)
+    rm = returns['sp500'].mean() * 252
+    stats['expected_return'] = capm_functions.capm_return(stats['beta'], rm, rf)
+    columns = ['beta', 'alpha', 'r2', 'beta_se', 'n_obs', 'expected_return']
+    return {'start': start, 'end': end, 'rf': rf, 'market_return': rm,
+            'stocks': _records(stats[columns]),
+            'failed': list(report.loc[report['Error'].notna(), 'Symbol'])}
+
+
+#function for one indicator of the Stock Analysis charts over a period of the full history
+def indicator_payload(ticker, name, period, params):
+    from pages.utils import indicator_engine
+    history = default_cache().get(ticker, 'yahoo')
+    if len(history) == 0:
+        raise NotFound(f"no price history for {ticker!r}")
+    values = indicator_engine.compute(history, name, period, symbol=ticker, **dict(params))
+    return {'ticker': ticker, 'indicator': name, 'period': period, 'params': dict(params),
+            'data': _records(values)}
+
+
+#function for the Stock Prediction page's 30-day forecast (optionally with Monte Carlo bands)
+def forecast_payload(ticker, order_mode, bands):
+    from pages.utils.model_train import get_data, forecast_pipeline
+    close_price = get_data(ticker)
+    if len(close_price) < 90:
+        raise NotFound(f"only {len(close_price)} bars of history for {ticker!r}")
+    # serial order search: forking a process pool from a server thread isn't safe
+    result = forecast_pipeline(close_price, ticker=ticker, order_mode=order_mode, bands=bands, search_workers=1)
+    forecast = result['forecast']
+    if bands:
+        forecast = forecast.join(result['bands'])
+    return {'ticker': ticker, 'order': list(result['order']), 'rmse': float(result['rmse']),
+            'forecast': _records(forecast.rename_axis('Date'))}
+
+
+def _number(request, name, default, cast=float):
+    try:
+        return cast(request.query_params.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+async def health(request):
+    return _json({'status': 'ok', 'responses': CACHE.stats, 'jobs': COALESCER.stats,
+                  'prices': default_cache().stats})
+
+
+async def capm(request):
+    tickers = tuple(sorted({t.strip().upper() for t in request.query_params.get('tickers', '').split(',') if t.strip()}))
+    if not tickers:
+        return _json({'error': "tickers is required, e.g. ?tickers=AAPL,MSFT"}, 400)
+    try:
+        years, rf = _number(request, 'years', 1, int), _number(request, 'rf', 0.0)
+    except ValueError as error:
+        return _json({'error': str(error)}, 400)
+    return await _serve(request, ('capm', tickers, years, rf), API_TTL, capm_payload, tickers, years, rf)
+
+
+async def indicators(request):
+    ticker = request.path_params['ticker'].upper()
+    name = request.query_params.get('name', 'rsi').lower()
+    period = request.query_params.get('period', '1y')
+    if name not in INDICATOR_PARAMS:
+        return _json({'error': f"name must be one of {', '.join(INDICATOR_PARAMS)}"}, 400)
+    try:
+        params = tuple((p, _number(request, p, None, int)) for p in INDICATOR_PARAMS[name]
+                       if p in request.query_params)
+    except ValueError as error:
+        return _json({'error': str(error)}, 400)
+    return await _serve(request, ('indicators', ticker, name, period, params), API_TTL,
+                        indicator_payload, ticker, name, period, params)
+
+
+async def forecast(request):
+    ticker = request.path_params['ticker'].upper()
+    order_mode = request.query_params.get('order', 'auto')
+    bands = request.query_params.get('bands', '0') in ('1', 'true', 'yes')
+    if order_mode not in ('auto', 'fixed'):
+        return _json({'error': "order must be 'auto' or 'fixed'"}, 400)
+    return await _serve(request, ('forecast', ticker, order_mode, bands), FORECAST_TTL,
+                        forecast_payload, ticker, order_mode, bands)
+
+
+#function run around the server's life: statsmodels' fitting warnings are switched off once, for the whole
+#process, instead of a request thread silencing every warning; its import turns them back on, so it goes first
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    from statsmodels.tools.sm_exceptions import ModelWarning
+    warnings.filterwarnings('ignore', category=ModelWarning)
+    warnings.filterwarnings('ignore', module=r'statsmodels\.')
+    # raised on behalf of model_train's adfuller call, so it carries that module's name
+    warnings.filterwarnings('ignore', message='adfuller', category=FutureWarning)
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route('/health', health),
+    Route('/capm', capm),
+    Route('/indicators/{ticker}', indicators),
+    Route('/forecast/{ticker}', forecast),
+])
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("CAPM_API_HOST", "127.0.0.1"), port=int(os.environ.get("CAPM_API_PORT", 8000)))
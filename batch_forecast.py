@@ -0,0 +1,198 @@
+# Headless batch forecasting over the tickers.txt universe.
+# Runs the same pipeline as the Stock Prediction page (rolling mean -> differencing order ->
+# scaling -> ARIMA evaluate + forecast) for every symbol on a process pool, streams finished
+# results into Parquet part files and records them in a checkpoint so an interrupted run resumes.
+# --retry-failed reruns symbols that errored or timed out; their old rows are removed from the
+# earlier parts when the new ones are written, so the results stay one row per symbol.
+#
+#   python batch_forecast.py --out forecasts --workers 8 --timeout 120
+#   python batch_forecast.py --out forecasts            # rerun: skips symbols already done
+#   pd.read_parquet('forecasts/results')                  # one row per symbol
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+
+class ForecastTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise ForecastTimeout()
+
+
+#function to run the prediction page's pipeline for one symbol inside a worker process
+def forecast_symbol(symbol, order_mode='auto', timeout=120):
+    from pages.utils.model_train import (get_data, get_rolling_mean, get_differencing_order, scaling,
+                                         evaluate_model, get_forecast, inverse_scaling, select_order,
+                                         ARIMA_ORDER)
+    row = {'symbol': symbol, 'status': 'ok', 'error': None, 'p': None, 'd': None, 'q': None,
+           'rmse': None, 'fit_seconds': None, 'forecast_start': None, 'forecast': None}
+    started = None
+    warnings.simplefilter('ignore')
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.alarm(int(timeout))
+    try:
+        close_price = get_data(symbol)
+        # fit time starts once the prices are loaded, so a slow download doesn't count as fitting
+        started = time.perf_counter()
+        if len(close_price) < 90:
+            raise ValueError(f"only {len(close_price)} bars of history")
+        rolling_price = get_rolling_mean(close_price)
+        differencing_order = get_differencing_order(rolling_price)
+        scaled_data, scaler = scaling(rolling_price)
+        if order_mode == 'auto':
+            order = select_order(scaled_data[:-30], differencing_order, ticker=symbol,
+                                 time_budget=timeout / 2, max_workers=1)['order']
+        else:
+            order = ARIMA_ORDER
+        rmse = evaluate_model(scaled_data, differencing_order, ticker=symbol, order=order)
+        forecast = get_forecast(scaled_data, differencing_order, ticker=symbol, order=order)
+        row.update(p=order[0], d=differencing_order, q=order[1], rmse=float(rmse),
+                   forecast_start=str(forecast.index[0].date()),
+                   forecast=[float(v) for v in inverse_scaling(scaler, forecast['Close']).reshape(-1)])
+    except ForecastTimeout:
+        row.update(status='timeout', error=f"exceeded {timeout}s")
+    except Exception as e:
+        row.update(status='error', error=f"{type(e).__name__}: {e}")
+    finally:
+        signal.alarm(0)
+    if started is not None:
+        row['fit_seconds'] = time.perf_counter() - started
+    return row
+
+
+def load_tickers(path):
+    from pages.utils.ticker_universe import read_universe
+    return list(read_universe(path).symbols)
+
+
+#function to read {symbol: status} for everything an earlier run finished
+def load_checkpoint(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    done[entry['symbol']] = entry['status']
+                except (ValueError, KeyError):
+                    continue
+    return done
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([('symbol', pa.string()), ('status', pa.string()), ('error', pa.string()),
+                      ('p', pa.int64()), ('d', pa.int64()), ('q', pa.int64()), ('rmse', pa.float64()),
+                      ('fit_seconds', pa.float64()), ('forecast_start', pa.string()),
+                      ('forecast', pa.list_(pa.float64()))])
+
+
+#function to write a frame as a Parquet file atomically
+def _write_part(frame, path):
+    frame.to_parquet(path + '.tmp', index=False, schema=_schema())
+    os.replace(path + '.tmp', path)
+
+
+#function to drop the rows of symbols from the existing parts (a retried symbol's earlier result)
+def drop_results(symbols, results_dir):
+    for name in sorted(n for n in os.listdir(results_dir) if n.endswith('.parquet')):
+        path = os.path.join(results_dir, name)
+        frame = pd.read_parquet(path)
+        stale = frame['symbol'].isin(symbols)
+        if stale.any():
+            # an emptied part is kept, so part numbering stays sequential
+            _write_part(frame[~stale], path)
+
+
+#function to write buffered results as a new Parquet part under out/results, then mark them done in the
+#checkpoint; rows for symbols in `replace` first remove what earlier parts hold for them
+def flush(rows, out_dir, checkpoint_path, replace=()):
+    if not rows:
+        return
+    results_dir = os.path.join(out_dir, 'results')
+    os.makedirs(results_dir, exist_ok=True)
+    retried = {row['symbol'] for row in rows} & set(replace)
+    if retried:
+        drop_results(retried, results_dir)
+    part = len([n for n in os.listdir(results_dir) if n.endswith('.parquet')])
+    _write_part(pd.DataFrame(rows), os.path.join(results_dir, f"part-{part:05d}.parquet"))
+    with open(checkpoint_path, 'a') as f:
+        for row in rows:
+            f.write(json.dumps({'symbol': row['symbol'], 'status': row['status']}) + '\n')
+    rows.clear()
+
+
+def progress_line(done, total, fit_times, failures, started):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    p50, p95 = np.percentile(fit_times, [50, 95]) if fit_times else (0.0, 0.0)
+    return (f"{done}/{total} symbols · {done / elapsed * 60:.1f} symbols/min · "
+            f"fit p50 {p50:.2f}s p95 {p95:.2f}s · {failures} failed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast the next 30 days for every ticker in tickers.txt")
+    parser.add_argument('--tickers', default=os.path.join(BASE_DIR, 'tickers.txt'))
+    parser.add_argument('--out', default=os.path.join(BASE_DIR, 'forecasts'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--timeout', type=float, default=120, help="seconds allowed per symbol")
+    parser.add_argument('--order', choices=('auto', 'fixed'), default='auto')
+    parser.add_argument('--flush-every', type=int, default=25)
+    parser.add_argument('--limit', type=int, default=None, help="only the first N tickers")
+    parser.add_argument('--retry-failed', action='store_true', help="rerun symbols that errored or timed out")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    checkpoint_path = os.path.join(args.out, 'checkpoint.jsonl')
+    tickers = load_tickers(args.tickers)[:args.limit]
+    done = load_checkpoint(checkpoint_path)
+    retried = set()
+    if args.retry_failed:
+        retried = {t for t, status in done.items() if status != 'ok'}
+        done = {t: status for t, status in done.items() if status == 'ok'}
+    todo = [t for t in tickers if t not in done]
+    print(f"{len(tickers)} tickers, {len(done)} already done, {len(todo)} to run on {args.workers} workers")
+
+    rows, fit_times, failures, finished = [], [], 0, 0
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=args.workers)
+    try:
+        futures = [pool.submit(forecast_symbol, t, args.order, args.timeout) for t in todo]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            finished += 1
+            if row['fit_seconds'] is not None:
+                fit_times.append(row['fit_seconds'])
+            failures += row['status'] != 'ok'
+            if len(rows) >= args.flush_every:
+                flush(rows, args.out, checkpoint_path, retried)
+                print(progress_line(finished, len(todo), fit_times, failures, started), flush=True)
+    except KeyboardInterrupt:
+        print("interrupted, saving finished results")
+        pool.shutdown(wait=False, cancel_futures=True)
+    finally:
+        flush(rows, args.out, checkpoint_path, retried)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    print(progress_line(finished, len(todo), fit_times, failures, started))
+    report = {'finished': finished, 'failed': failures, 'seconds': round(time.perf_counter() - started, 1),
+              'fit_p50': float(np.percentile(fit_times, 50)) if fit_times else None,
+              'fit_p95': float(np.percentile(fit_times, 95)) if fit_times else None}
+    with open(os.path.join(args.out, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
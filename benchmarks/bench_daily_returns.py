@@ -0,0 +1,59 @@
+# Benchmark: vectorized capm_functions.daily_returns vs. the old per-cell loop
+# run from the repo root:  python benchmarks/bench_daily_returns.py [--full]
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import capm_functions
+
+ROWS = [1_000, 10_000]
+TICKERS = [10, 100, 500]
+# the loop version is O(rows x tickers) interpreter work; skip the biggest grids unless --full
+LOOP_CELL_LIMIT = 200_000
+
+#synthetic Date + geometric random walk price frame, shaped like the CAPM page's stocks_df
+def make_prices(rows, tickers, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0003, 0.02, size=(rows, tickers))
+    prices = 100 * np.exp(np.cumsum(steps, axis=0))
+    df = pd.DataFrame(prices, columns=[f"T{i}" for i in range(tickers)])
+    df.insert(0, 'Date', pd.bdate_range('2000-01-03', periods=rows))
+    return df
+
+#the pre-vectorization implementation (with .iat, since chained df[i][j] assignment is a no-op under copy-on-write)
+def loop_daily_returns(df):
+    df_daily_return = df.copy()
+    for c in range(1, len(df.columns)):
+        for j in range(1, len(df)):
+            df_daily_return.iat[j, c] = ((df.iat[j, c]-df.iat[j-1, c])/df.iat[j-1, c])*100
+        df_daily_return.iat[0, c] = 0
+    return df_daily_return
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main(full=False):
+    print(f"{'rows':>7} {'tickers':>7} {'vectorized':>12} {'loop':>12} {'speedup':>9}")
+    for rows in ROWS:
+        for tickers in TICKERS:
+            df = make_prices(rows, tickers)
+            fast = best_of(lambda: capm_functions.daily_returns(df), 5)
+            if full or rows * tickers <= LOOP_CELL_LIMIT:
+                slow = best_of(lambda: loop_daily_returns(df), 1)
+                expected = loop_daily_returns(df).iloc[:, 1:].to_numpy(dtype=float)
+                got = capm_functions.daily_returns(df).iloc[:, 1:].to_numpy(dtype=float)
+                assert np.allclose(expected, got), "vectorized returns differ from the loop"
+                print(f"{rows:>7} {tickers:>7} {fast*1e3:>10.2f}ms {slow*1e3:>10.0f}ms {slow/fast:>8.0f}x")
+            else:
+                print(f"{rows:>7} {tickers:>7} {fast*1e3:>10.2f}ms {'skipped':>12} {'-':>9}")
+
+if __name__ == '__main__':
+    main(full='--full' in sys.argv)
@@ -0,0 +1,93 @@
+# Rerun latency of the CAPM page when the stock selection changes by one ticker.
+# Synthetic prices for --tickers symbols plus sp500 are served from a temp directory through a
+# LocalProvider (no network). A basket of --basket stocks is analysed once, then we time one rerun
+# after adding a stock and one after removing a stock, for
+#   full    what the page used to do: sp500, fetch_many, merge, daily_returns, batch_regression, rolling_beta
+#   graph   CapmGraph.table/returns/regression/rolling, reusing every node the change didn't touch
+#
+# run from the repo root:  python benchmarks/capm_incremental.py --basket 200 --repeat 5
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import pandas as pd
+from datetime import date
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'benchmarks'))
+os.environ.setdefault('CAPM_INSTRUMENT', '0')
+
+import capm_functions
+from load_test import make_stub
+from pages.utils.data_cache import PriceCache, LocalProvider
+from pages.utils.bulk_download import fetch_many
+from pages.utils.capm_graph import CapmGraph
+
+RF = 2.0
+WINDOW = 252
+
+
+#function for one rerun the way the page did it before the graph: everything rebuilt from the cache
+def full_rerun(cache, symbols, start, end):
+    market = cache.get('sp500', 'fred', start, end)[['sp500']].reset_index()
+    table, _ = fetch_many(symbols, 'yahoo', start, end, cache=cache)
+    table = pd.merge(table, market, on='Date', how='inner')
+    returns = capm_functions.daily_returns(table)
+    return capm_functions.batch_regression(returns, 'sp500', RF / 252), capm_functions.rolling_beta(returns, WINDOW)
+
+
+#function for one rerun through the graph
+def graph_rerun(graph, symbols, start, end):
+    table, _ = graph.table(symbols, start, end)
+    return graph.regression(table, RF), graph.rolling(table, WINDOW)
+
+
+#function for the median seconds of run(selection) over the given selections
+def timeit(run, selections):
+    seconds = []
+    for selection in selections:
+        started = time.perf_counter()
+        run(selection)
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAPM page rerun latency after a one-ticker selection change")
+    parser.add_argument('--tickers', type=int, default=400)
+    parser.add_argument('--basket', type=int, default=200)
+    parser.add_argument('--days', type=int, default=800)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    stub = tempfile.mkdtemp(prefix='capm-graph-')
+    symbols = make_stub(stub, args.tickers, args.days)
+    provider = LocalProvider(stub)
+    cache = PriceCache(root=os.path.join(stub, 'cache'), providers={'yahoo': provider, 'fred': provider},
+                       memory_entries=args.tickers + 16)
+    end = date.today()
+    start = date(end.year - 3, end.month, end.day)
+    basket = symbols[:args.basket]
+    # warm the price cache so both modes only pay for computation and lookups
+    full_rerun(cache, symbols[:args.basket + args.repeat + 1], start, end)
+
+    print(f"{args.basket} stocks x {args.days} days, median of {args.repeat}")
+    print(f"{'change':>8} {'full':>10} {'graph':>10} {'speedup':>8}")
+    for change in ('add', 'remove'):
+        graph = CapmGraph(cache=cache)
+        graph_rerun(graph, basket, start, end)
+        # each repetition is a different one-ticker change from the analysed basket
+        if change == 'add':
+            selections = [basket + [symbols[args.basket + i]] for i in range(args.repeat)]
+        else:
+            selections = [basket[:i] + basket[i + 1:] for i in range(args.repeat)]
+        full = timeit(lambda selection: full_rerun(cache, selection, start, end), selections)
+        incremental = timeit(lambda selection: graph_rerun(graph, selection, start, end), selections)
+        print(f"{change:>8} {full * 1e3:>8.1f}ms {incremental * 1e3:>8.1f}ms {full / incremental:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Speed of the multi-factor engine (factor_functions) at universe scale.
+# Synthetic daily excess returns for --stocks stocks on --factors factors over --years years, with
+# ragged start dates (like real listings) and a few missing days, so both the shared-Gram path and
+# the per-stock Gram path are exercised. We time
+#   lstsq     one np.linalg.lstsq per stock (what a loop over calculate_beta-style fits costs)
+#   batched   factor_regression: one batched solve for every stock
+#   rolling   rolling_factor_regression over a 252-day window, every --step days
+# and report the largest loading difference between lstsq and the batched fit.
+#
+# run from the repo root:  python benchmarks/factor_regression.py --stocks 500 --factors 10 --years 25
+import os
+import sys
+import time
+import argparse
+import statistics
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('CAPM_INSTRUMENT', '0')
+
+import factor_functions
+
+
+#function for a returns table (Date, stocks..., sp500) and a factor table (Date, F1..Fk) in %
+def make_data(stocks, factors, years, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = 252 * years
+    dates = pd.bdate_range(end='2026-10-16', periods=rows)
+    market = rng.normal(0.03, 1.0, rows)
+    F = rng.normal(0, 0.6, (rows, factors - 1))
+    loadings = rng.normal(0, 0.5, (factors - 1, stocks))
+    Y = market[:, None] * rng.uniform(0.5, 1.5, stocks) + F @ loadings + rng.normal(0, 1.5, (rows, stocks))
+    for j, first in enumerate(rng.integers(0, rows // 2, stocks)):
+        Y[:first * (j % 3 == 0), j] = np.nan
+    Y[rng.random(Y.shape) < 0.001] = np.nan
+    returns = pd.DataFrame(Y, columns=[f'S{j:04d}' for j in range(stocks)])
+    returns.insert(0, 'Date', dates)
+    returns['sp500'] = market
+    table = pd.DataFrame(F, columns=[f'F{k}' for k in range(1, factors)])
+    table.insert(0, 'Date', dates)
+    return returns, table
+
+
+#function to fit every stock with its own lstsq call: returns the loadings (stocks x 1+factors)
+def lstsq_loop(returns, table):
+    X = np.column_stack([np.ones(len(returns)), returns['sp500'], table[table.columns[1:]]])
+    out = []
+    for name in returns.columns[1:-1]:
+        y = returns[name].to_numpy()
+        ok = ~np.isnan(y)
+        out.append(np.linalg.lstsq(X[ok], y[ok], rcond=None)[0])
+    return np.array(out)
+
+
+def timeit(run, repeat):
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched multi-factor regression vs one lstsq per stock")
+    parser.add_argument('--stocks', type=int, default=500)
+    parser.add_argument('--factors', type=int, default=10, help="including the market")
+    parser.add_argument('--years', type=int, default=25)
+    parser.add_argument('--window', type=int, default=252)
+    parser.add_argument('--step', type=int, default=21)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    returns, table = make_data(args.stocks, args.factors, args.years)
+    print(f"{args.stocks} stocks x {args.factors} factors x {len(returns)} days, median of {args.repeat}")
+    loop, expected = timeit(lambda: lstsq_loop(returns, table), args.repeat)
+    batched, stats = timeit(lambda: factor_functions.factor_regression(returns, table), args.repeat)
+    rolling, _ = timeit(lambda: factor_functions.rolling_factor_regression(
+        returns, table, args.window, step=args.step), args.repeat)
+    rolling_daily, _ = timeit(lambda: factor_functions.rolling_factor_regression(
+        returns, table, args.window, step=1), 1)
+    terms = ['alpha', 'market'] + list(table.columns[1:])
+    error = np.nanmax(np.abs(stats[terms].to_numpy() - expected))
+    print(f"{'lstsq':>22} {loop:>8.3f}s")
+    print(f"{'batched':>22} {batched:>8.3f}s  {loop / batched:.0f}x, max loading difference {error:.1e}")
+    print(f"{f'rolling (step {args.step})':>22} {rolling:>8.3f}s")
+    print(f"{'rolling (step 1)':>22} {rolling_daily:>8.3f}s")
+
+
+if __name__ == '__main__':
+    main()
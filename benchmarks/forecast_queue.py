@@ -0,0 +1,70 @@
+# How long the Stock Prediction page's script thread is blocked while forecasting several tickers.
+# Synthetic Close histories (random walks, the length get_data returns) are forecast
+#   inline   one after another on the calling thread, as the page used to (blocked the whole time)
+#   queue    submitted to a ForecastQueue with --workers processes; we time the submit calls (all the
+#            script thread pays), the first and the last result, and report the queue's wait/fit metrics
+#
+# run from the repo root:  python benchmarks/forecast_queue.py --tickers 4 --workers 4
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('CAPM_INSTRUMENT', '0')
+
+
+#function for n synthetic Close frames of `rows` business days
+def make_closes(n, rows=450, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2026-10-16', periods=rows, name='Date')
+    return {f'T{i}': pd.DataFrame({'Close': 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, rows)))}, index=dates)
+            for i in range(n)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Script-thread blocking: inline forecasts vs the forecast queue")
+    parser.add_argument('--tickers', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--order', choices=['auto', 'fixed'], default='auto')
+    args = parser.parse_args()
+
+    from pages.utils.model_train import forecast_pipeline, MODEL_CACHE
+    from pages.utils.forecast_queue import ForecastQueue
+    import statsmodels.tsa.arima.model
+    warnings.simplefilter('ignore')
+    closes = make_closes(args.tickers)
+
+    started = time.perf_counter()
+    for symbol, close in closes.items():
+        forecast_pipeline(close, ticker=symbol, order_mode=args.order)
+    inline = time.perf_counter() - started
+    MODEL_CACHE.clear()
+
+    queue = ForecastQueue(max_workers=args.workers)
+    started = time.perf_counter()
+    jobs = [queue.submit(symbol, close, args.order) for symbol, close in closes.items()]
+    submitted = time.perf_counter() - started
+    first = None
+    while not all(job.done for job in jobs):
+        if first is None and any(job.done for job in jobs):
+            first = time.perf_counter() - started
+        time.sleep(0.05)
+    total = time.perf_counter() - started
+    metrics = queue.metrics()
+    queue.shutdown()
+
+    print(f"{args.tickers} tickers, order {args.order}, {args.workers} workers")
+    print(f"inline   script thread blocked {inline:.2f}s")
+    print(f"queue    script thread blocked {submitted * 1e3:.1f}ms, first result {first or total:.2f}s, "
+          f"all results {total:.2f}s ({metrics['failed']} failed)")
+    print(f"         queue wait p50 {metrics['wait_p50']:.2f}s p95 {metrics['wait_p95']:.2f}s, "
+          f"fit p50 {metrics['fit_p50']:.2f}s p95 {metrics['fit_p95']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Cold import cost of each page and helper module.
+# Every target is imported in a fresh interpreter (--repeat times, median kept): for a page only its
+# top-level import statements are executed, not the Streamlit body, so the number is what a new
+# session worker pays before the page can draw anything. We also list which heavy libraries the
+# import dragged in; with lazy imports those only load once a page actually needs them.
+#
+# run from the repo root:  python benchmarks/import_time.py [--repeat 5] [--json out.json]
+import os
+import sys
+import ast
+import json
+import argparse
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['TradingApp.py', 'pages/CAPM_Return.py', 'pages/CAPM_Screener.py', 'pages/StockAnalysis.py',
+         'pages/StockPrediction.py']
+MODULES = ['capm_functions', 'portfolio_functions', 'simulation_functions', 'factor_functions', 'indicator_functions',
+           'pages.utils.data_cache',
+           'pages.utils.indicator_engine', 'pages.utils.plotly_figure', 'pages.utils.model_train',
+           'pages.utils.screener', 'pages.utils.live_quotes']
+HEAVY = ['streamlit', 'plotly.express', 'plotly.graph_objects', 'statsmodels', 'sklearn', 'scipy',
+         'pandas_ta', 'pandas_datareader', 'yfinance', 'requests']
+
+PROBE = """
+import sys, time, json
+sys.path.insert(0, {base!r})
+started = time.perf_counter()
+exec(compile({source!r}, 'imports', 'exec'), {{}})
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+#function to pull the import block at the top of a page script (imports further down run on demand)
+def page_imports(path):
+    with open(os.path.join(BASE_DIR, path), encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    imports = []
+    for node in tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        imports.append(ast.unparse(node))
+    return '\n'.join(imports)
+
+
+#function to run the import source in a fresh interpreter; returns (seconds, heavy modules loaded)
+def probe(source):
+    code = PROBE.format(base=BASE_DIR, source=source, heavy=HEAVY)
+    out = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return result['seconds'], result['loaded']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of the app's pages and modules")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    targets = [(page, page_imports(page)) for page in PAGES] + [(m, f'import {m}') for m in MODULES]
+    results = {}
+    print(f"{'target':<32} {'median':>9} {'best':>9}  heavy modules loaded")
+    for name, source in targets:
+        try:
+            runs = [probe(source) for _ in range(args.repeat)]
+        except RuntimeError as error:
+            print(f"{name:<32} {'failed':>9}  {error}")
+            continue
+        seconds = [r[0] for r in runs]
+        results[name] = {'median': statistics.median(seconds), 'best': min(seconds), 'loaded': runs[0][1]}
+        print(f"{name:<32} {results[name]['median']:>8.3f}s {results[name]['best']:>8.3f}s  "
+              f"{', '.join(runs[0][1]) or '-'}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
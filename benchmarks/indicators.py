@@ -0,0 +1,154 @@
+# indicator_functions against pandas_ta: agreement and speed.
+# Synthetic OHLC histories (ragged start dates, like real listings) are run through each indicator
+#   pandas_ta   one call per ticker on its own history, as the chart pages did; when pandas_ta is not
+#               installed, per-ticker pandas code of the same shape is timed instead
+#   numpy       one indicator_functions call over the whole rows x tickers matrix
+# We print the best of --repeat wall times and, against pandas_ta, the largest absolute difference
+# between the two, which fails the run when it is above --tolerance. Without pandas_ta nothing is
+# compared: tests/test_indicator_functions.py holds the parity tests (gaps included).
+#
+# run from the repo root:  python benchmarks/indicators.py --rows 2520 --tickers 500
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+#function for pandas_ta's ema (SMA of the first length values, then an EWM without adjustment)
+def _ema(close, length):
+    close = close.copy()
+    seed = close.iloc[:length].mean()
+    close.iloc[:length - 1] = np.nan
+    close.iloc[length - 1] = seed
+    return close.ewm(span=length, adjust=False).mean()
+
+
+#function for pandas_ta's rma (Wilder smoothing)
+def _rma(values, length):
+    return values.ewm(alpha=1 / length, min_periods=length).mean()
+
+
+#function for the per-ticker baseline: pandas_ta when it is installed, else pandas code timed in its place;
+#returns (functions, whether they are pandas_ta)
+def reference():
+    try:
+        import pandas_ta as pta
+    except ImportError:
+        pta = None
+
+    def rsi(bars):
+        if pta is not None:
+            return pta.rsi(bars['Close'], length=14)
+        change = bars['Close'].diff()
+        up, down = _rma(change.clip(lower=0), 14), _rma((-change).clip(lower=0), 14)
+        return 100 * up / (up + down)
+
+    def macd(bars):
+        if pta is not None:
+            frame = pta.macd(bars['Close'])
+            return frame['MACD_12_26_9'], frame['MACDs_12_26_9'], frame['MACDh_12_26_9']
+        line = _ema(bars['Close'], 12) - _ema(bars['Close'], 26)
+        signal = _ema(line.loc[line.first_valid_index():], 9).reindex(line.index)
+        return line, signal, line - signal
+
+    def bollinger(bars):
+        if pta is not None:
+            frame = pta.bbands(bars['Close'], length=20, std=2.0)
+            return frame['BBL_20_2.0'], frame['BBM_20_2.0'], frame['BBU_20_2.0']
+        middle, deviation = bars['Close'].rolling(20).mean(), bars['Close'].rolling(20).std(ddof=0)
+        return middle - 2 * deviation, middle, middle + 2 * deviation
+
+    def atr(bars):
+        if pta is not None:
+            return pta.atr(bars['High'], bars['Low'], bars['Close'], length=14)
+        previous = bars['Close'].shift()
+        true_range = pd.concat([bars['High'] - bars['Low'], (bars['High'] - previous).abs(),
+                                (bars['Low'] - previous).abs()], axis=1).max(axis=1)
+        true_range.iloc[:1] = np.nan
+        return _rma(true_range, 14)
+
+    def sma(bars):
+        return pta.sma(bars['Close'], length=50) if pta is not None else bars['Close'].rolling(50).mean()
+
+    def ema(bars):
+        return pta.ema(bars['Close'], length=10) if pta is not None else _ema(bars['Close'], 10)
+
+    functions = {'rsi': rsi, 'sma': sma, 'ema': ema, 'macd': macd, 'bollinger': bollinger, 'atr': atr}
+    return functions, pta is not None
+
+
+#function for ragged synthetic OHLC: {field: rows x tickers frame}, NaN before each ticker's listing
+def make_bars(rows, tickers, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, (rows, tickers)), axis=0))
+    spread = np.abs(rng.normal(0, 0.01, (rows, tickers))) * close
+    listed = np.arange(rows)[:, None] >= rng.integers(0, rows // 2, tickers)
+    index = pd.bdate_range(end='2026-10-16', periods=rows, name='Date')
+    columns = [f'T{i}' for i in range(tickers)]
+    return {field: pd.DataFrame(np.where(listed, values, np.nan), index=index, columns=columns)
+            for field, values in (('Close', close), ('High', close + spread), ('Low', close - spread))}
+
+
+def best(run, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="indicator_functions vs pandas_ta: agreement and speed")
+    parser.add_argument('--rows', type=int, default=2520)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=1e-6)
+    args = parser.parse_args()
+
+    import indicator_functions
+    bars = make_bars(args.rows, args.tickers)
+    functions, checked = reference()
+    kernels = {'rsi': lambda: indicator_functions.rsi(bars['Close'].to_numpy()),
+               'sma': lambda: indicator_functions.sma(bars['Close'].to_numpy()),
+               'ema': lambda: indicator_functions.ema(bars['Close'].to_numpy()),
+               'macd': lambda: indicator_functions.macd(bars['Close'].to_numpy()),
+               'bollinger': lambda: indicator_functions.bollinger(bars['Close'].to_numpy()),
+               'atr': lambda: indicator_functions.atr(bars['High'].to_numpy(), bars['Low'].to_numpy(),
+                                                      bars['Close'].to_numpy())}
+    histories = [{field: frame[name].dropna() for field, frame in bars.items()} for name in bars['Close']]
+
+    print(f"{args.rows} rows x {args.tickers} tickers, reference: "
+          + ("pandas_ta" if checked else "per-ticker pandas (pandas_ta is not installed: timings only)"))
+    print(f"{'indicator':<10} {'reference':>10} {'numpy':>9} {'speedup':>8} {'max diff':>10}")
+    failed = False
+    for name, kernel in kernels.items():
+        slow, expected = best(lambda: [functions[name](history) for history in histories], args.repeat)
+        fast, result = best(kernel, args.repeat)
+        if not checked:
+            print(f"{name:<10} {slow * 1e3:>8.1f}ms {fast * 1e3:>7.1f}ms {slow / fast:>7.1f}x {'-':>10}")
+            continue
+        outputs = result if isinstance(result, tuple) else (result,)
+        difference = 0.0
+        for j, history in enumerate(histories):
+            want = expected[j] if isinstance(expected[j], tuple) else (expected[j],)
+            rows = bars['Close'].index.get_indexer(history['Close'].index)
+            for got, reference_values in zip(outputs, want):
+                got, reference_values = got[rows, j], reference_values.to_numpy(dtype=np.float64)
+                if (np.isnan(got) != np.isnan(reference_values)).any():
+                    difference = np.inf
+                both = ~np.isnan(got) & ~np.isnan(reference_values)
+                if both.any():
+                    difference = max(difference, float(np.max(np.abs(got[both] - reference_values[both]))))
+        failed |= difference > args.tolerance
+        print(f"{name:<10} {slow * 1e3:>8.1f}ms {fast * 1e3:>7.1f}ms {slow / fast:>7.1f}x {difference:>10.2e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
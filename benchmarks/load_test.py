@@ -0,0 +1,148 @@
+# Load test for the HTTP API (api.py) against a local data stub: synthetic daily prices for
+# --tickers symbols plus sp500 are written to a temp directory and served through
+# CAPM_LOCAL_DATA, so no network is touched. The app runs under uvicorn in a child process;
+# asyncio keep-alive connections hit it and we report requests/sec and p50/p99 latency for
+#   cold      every request a different ticker (compute path)
+#   burst     many concurrent requests for one uncached ticker (coalesced into one job)
+#   hot       repeated requests for cached responses
+#   etag      repeated requests sending If-None-Match (304s)
+# run from the repo root:  python benchmarks/load_test.py --requests 2000 --concurrency 32
+import os
+import sys
+import time
+import socket
+import subprocess
+import argparse
+import tempfile
+import asyncio
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+#function to write synthetic single-factor prices for n tickers (T0000, T0001, ...) and sp500
+def make_stub(directory, n, days=800, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days, name='Date')
+    market = rng.normal(0.04, 1.0, days)
+    pd.DataFrame({'sp500': 4000 * np.cumprod(1 + market / 100)}, index=dates).to_parquet(
+        os.path.join(directory, 'sp500.parquet'))
+    for i in range(n):
+        returns = rng.uniform(0.5, 1.5) * market + rng.normal(0, 1.5, days)
+        close = 50 * np.cumprod(1 + returns / 100)
+        pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                      'Volume': 1e6}, index=dates).to_parquet(os.path.join(directory, f'T{i:04d}.parquet'))
+    return [f'T{i:04d}' for i in range(n)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+#function to send one keep-alive GET on an open connection; returns the status code
+async def _get(reader, writer, host, path, headers):
+    extra = ''.join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{extra}\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    length = 0
+    for line in lines[1:]:
+        if line.lower().startswith('content-length:'):
+            length = int(line.split(':', 1)[1])
+    if length:
+        await reader.readexactly(length)
+    return int(lines[0].split()[1])
+
+
+#function to fire paths over `concurrency` keep-alive connections (asyncio, so the client stays cheap)
+def run(host, port, paths, concurrency, headers=None):
+    queue = list(reversed(paths))
+    results = []
+
+    async def worker():
+        reader, writer = await asyncio.open_connection(host, port)
+        while queue:
+            path = queue.pop()
+            started = time.perf_counter()
+            status = await _get(reader, writer, host, path, headers)
+            results.append((time.perf_counter() - started, status))
+        writer.close()
+
+    async def main():
+        await asyncio.gather(*[worker() for _ in range(min(concurrency, len(paths)))])
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    seconds = time.perf_counter() - started
+    latencies = np.array([r[0] for r in results])
+    statuses = pd.Series([r[1] for r in results]).value_counts().to_dict()
+    return {'requests': len(paths), 'rps': len(paths) / seconds,
+            'p50_ms': np.percentile(latencies, 50) * 1e3, 'p99_ms': np.percentile(latencies, 99) * 1e3,
+            'statuses': statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/sec and p99 latency of the CAPM API on a local stub")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--endpoint', choices=['capm', 'indicators'], default='capm')
+    parser.add_argument('--startup-timeout', type=float, default=60, help="seconds to wait for the server")
+    args = parser.parse_args()
+
+    stub = tempfile.mkdtemp(prefix='capm-stub-')
+    tickers = make_stub(stub, args.tickers)
+    env = dict(os.environ, CAPM_LOCAL_DATA=stub, CAPM_CACHE_DIR=os.path.join(stub, 'cache'))
+    port = free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'api:app', '--port', str(port),
+                               '--log-level', 'warning'], cwd=BASE_DIR, env=env)
+    base = f'http://127.0.0.1:{port}'
+
+    import requests
+    deadline = time.time() + args.startup_timeout
+    while True:
+        try:
+            requests.get(base + '/health', timeout=5)
+            break
+        except requests.ConnectionError:
+            exited = server.poll()
+            if exited is not None:
+                sys.exit(f"the API server exited with code {exited}")
+            if time.time() > deadline:
+                server.terminate()
+                server.wait()
+                sys.exit(f"the API server did not come up within {args.startup_timeout:g}s")
+            time.sleep(0.1)
+
+    def path(ticker):
+        if args.endpoint == 'capm':
+            return f'/capm?tickers={ticker}&years=2'
+        return f'/indicators/{ticker}?name=rsi&period=1y'
+
+    etag = requests.get(base + path(tickers[0])).headers['ETag']
+    scenarios = {
+        'cold': [path(t) for t in tickers[1:]],
+        'burst': [path(tickers[-1]).replace('years=2', 'years=1') if args.endpoint == 'capm'
+                  else path(tickers[-1]).replace('1y', '6mo')] * args.concurrency,
+        'hot': [path(tickers[0])] * args.requests,
+        'etag': [path(tickers[0])] * args.requests,
+    }
+    print(f"{'scenario':>8} {'requests':>9} {'req/s':>9} {'p50':>9} {'p99':>9}  statuses")
+    for name, paths in scenarios.items():
+        computed = requests.get(base + '/health').json()['jobs']['computed']
+        result = run('127.0.0.1', port, paths, args.concurrency, {'If-None-Match': etag} if name == 'etag' else None)
+        jobs = requests.get(base + '/health').json()['jobs']['computed'] - computed
+        extra = f"  jobs={jobs}" if name == 'burst' else ''
+        print(f"{name:>8} {result['requests']:>9} {result['rps']:>9.1f} {result['p50_ms']:>7.2f}ms "
+              f"{result['p99_ms']:>7.2f}ms  {result['statuses']}{extra}")
+    server.terminate()
+    server.wait()
+
+
+if __name__ == '__main__':
+    main()
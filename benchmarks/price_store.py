@@ -0,0 +1,109 @@
+# Memory and time of whole-universe CAPM analytics: per-symbol DataFrames versus the price store.
+# Synthetic OHLCV histories for --tickers symbols (ragged start dates, like real listings) are written
+# as a CAPM_LOCAL_DATA directory and built into a memory-mapped store. Each mode then runs in a
+# fresh interpreter, loads the whole universe, computes daily returns and regresses every symbol
+# on sp500. We report the private (anonymous) memory held after loading, the peak allocated while
+# computing (tracemalloc), and separately the mapped store pages, which are shared page cache.
+#   frames   every symbol's full history as a DataFrame, then one wide Close frame with a Date column
+#   store    one Close view of the store for all symbols (float32)
+#
+# run from the repo root:  python benchmarks/price_store.py --tickers 2000 --rows 5000
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+PROBE = """
+import sys, time, json, tracemalloc
+sys.path.insert(0, {base!r})
+import numpy as np, pandas as pd
+import capm_functions
+from pages.utils.price_store import PriceStore
+
+def memory():
+    fields = dict(line.split(':', 1) for line in open('/proc/self/status') if line.startswith(('RssAnon', 'RssFile')))
+    return {{k: int(v.split()[0]) * 1024 for k, v in fields.items()}}
+
+before = memory()
+started = time.perf_counter()
+if {mode!r} == 'frames':
+    frames = {{s: pd.read_parquet({stub!r} + '/' + s + '.parquet') for s in {symbols!r}}}
+    market = pd.read_parquet({stub!r} + '/sp500.parquet')
+    wide = pd.DataFrame({{s: f['Close'] for s, f in frames.items()}})
+    wide['sp500'] = market['sp500']
+    table = wide.rename_axis('Date').reset_index()
+else:
+    store = PriceStore({store!r})
+    table = store.view(store.symbols, 'Close')
+loaded = memory()
+tracemalloc.start()
+stats = capm_functions.batch_regression(capm_functions.daily_returns(table, first_row='nan'))
+seconds = time.perf_counter() - started
+peak = tracemalloc.get_traced_memory()[1]
+after = memory()
+print(json.dumps({{'seconds': seconds, 'loaded': loaded['RssAnon'] - before['RssAnon'], 'analytics': peak,
+                   'file': after['RssFile'] - before['RssFile'],
+                   'beta_mean': float(np.nanmean(stats['beta']))}}))
+"""
+
+
+#function to write ragged synthetic OHLCV histories and sp500 as SYMBOL.parquet files
+def make_universe(directory, tickers, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2026-10-16', periods=rows, name='Date')
+    market = rng.normal(0.03, 1.0, rows)
+    pd.DataFrame({'sp500': 1000 * np.cumprod(1 + market / 100)}, index=dates).to_parquet(
+        os.path.join(directory, 'sp500.parquet'))
+    symbols = [f'T{i:05d}' for i in range(tickers)]
+    for symbol in symbols:
+        first = int(rng.integers(0, rows - 250))
+        returns = rng.uniform(0.5, 1.5) * market[first:] + rng.normal(0, 1.5, rows - first)
+        close = 50 * np.cumprod(1 + returns / 100)
+        pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                      'Volume': rng.integers(1e5, 1e7, rows - first)},
+                     index=dates[first:]).to_parquet(os.path.join(directory, symbol + '.parquet'))
+    return symbols
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whole-universe memory: DataFrames vs the memory-mapped price store")
+    parser.add_argument('--tickers', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32')
+    args = parser.parse_args()
+
+    from pages.utils.price_store import write_store
+    stub = tempfile.mkdtemp(prefix='capm-store-')
+    symbols = make_universe(stub, args.tickers, args.rows)
+
+    def load(symbol):
+        frame = pd.read_parquet(os.path.join(stub, symbol + '.parquet'))
+        return frame.rename(columns={'sp500': 'Close'}) if symbol == 'sp500' else frame
+
+    started = time.perf_counter()
+    store = write_store(os.path.join(stub, 'store'), symbols + ['sp500'], load, dtype=args.dtype)
+    print(f"store: {len(store)} symbols x {len(store.dates)} dates, {store.nbytes / 2 ** 20:.1f} MiB on disk "
+          f"({args.dtype}), built in {time.perf_counter() - started:.1f}s")
+    print(f"{'mode':>7} {'seconds':>8} {'loaded':>10} {'analytics':>10} {'mapped':>10}  mean beta")
+    for mode in ('frames', 'store'):
+        code = PROBE.format(base=BASE_DIR, mode=mode, stub=stub, symbols=symbols, store=store.path)
+        out = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True,
+                             env=dict(os.environ, CAPM_INSTRUMENT='0'))
+        if out.returncode != 0:
+            print(out.stderr)
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:>7} {r['seconds']:>7.2f}s {r['loaded'] / 2 ** 20:>7.1f}MiB {r['analytics'] / 2 ** 20:>7.1f}MiB "
+              f"{r['file'] / 2 ** 20:>7.1f}MiB  {r['beta_mean']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+# Benchmark suite over the app's hot paths, offline.
+# Every case is run over a grid of rows x tickers on synthetic prices (or on recorded ones with
+# --data <dir of SYMBOL.parquet/.csv files>, e.g. a CAPM_LOCAL_DATA directory). For each case we keep
+# the best and median wall time of --repeat runs and the peak traced memory of one extra run,
+# write everything to a JSON file, and compare against a stored baseline so regressions show up.
+#
+# run from the repo root:
+#   python benchmarks/suite.py --save-baseline          # record benchmarks/baseline.json
+#   python benchmarks/suite.py                          # compare; exits 1 if anything regressed
+#   python benchmarks/suite.py --only chart --quick     # a subset on the small grid
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import warnings
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, 'results')
+# a case regresses when it is this much slower (or bigger) than the baseline, and by more than the noise floor
+THRESHOLD = 0.25
+NOISE_SECONDS = 0.002
+NOISE_BYTES = 1 << 20
+
+GRID = {'rows': [1_000, 10_000], 'tickers': [10, 100, 500]}
+QUICK_GRID = {'rows': [1_000], 'tickers': [10]}
+# single-series cases (charts, indicators, ARIMA) only vary the number of rows
+SERIES_ROWS = [1_000, 10_000]
+QUICK_SERIES_ROWS = [1_000]
+MODEL_ROWS = [250, 500]
+QUICK_MODEL_ROWS = [250]
+
+
+#synthetic Date + geometric random walk price frame, shaped like the CAPM page's stocks_df (sp500 last)
+def make_prices(rows, tickers, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0003, 0.01, rows)
+    steps = np.outer(market, rng.uniform(0.5, 1.5, tickers)) + rng.normal(0, 0.015, (rows, tickers))
+    columns = {'Date': pd.bdate_range('1990-01-02', periods=rows)}
+    columns.update({f"T{i}": 100 * np.exp(np.cumsum(steps[:, i])) for i in range(tickers)})
+    columns['sp500'] = 1000 * np.exp(np.cumsum(market))
+    return pd.DataFrame(columns)
+
+
+#synthetic factor returns (Date, SMB, HML, MOM in %) on a returns frame's dates
+def make_factors(returns, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = pd.DataFrame(rng.normal(0, 0.5, (len(returns), 3)), columns=['SMB', 'HML', 'MOM'])
+    factors.insert(0, 'Date', returns['Date'].to_numpy())
+    return factors
+
+
+#synthetic daily OHLCV bars indexed by Date, shaped like the Stock Analysis history
+def make_ohlc(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, rows)))
+    spread = np.abs(rng.normal(0, 0.01, rows)) * close
+    return pd.DataFrame({'Open': close * (1 + rng.normal(0, 0.005, rows)), 'High': close + spread,
+                         'Low': close - spread, 'Close': close, 'Volume': rng.integers(1e5, 1e7, rows)},
+                        index=pd.bdate_range('1990-01-02', periods=rows, name='Date'))
+
+
+#function to read one recorded SYMBOL.parquet / SYMBOL.csv (the LocalProvider layout) indexed by Date
+def _read(directory, name):
+    path = os.path.join(directory, name)
+    frame = pd.read_parquet(path + '.parquet') if os.path.exists(path + '.parquet') \
+        else pd.read_csv(path + '.csv', parse_dates=['Date'])
+    return frame.set_index('Date') if 'Date' in frame.columns else frame
+
+
+def _recorded(directory):
+    names = {os.path.splitext(f)[0] for f in os.listdir(directory) if f.endswith(('.parquet', '.csv'))}
+    return sorted(names - {'sp500'})
+
+
+#price frames from recorded files instead: the first `tickers` symbols and sp500, last `rows` common dates
+def load_prices(directory, rows, tickers):
+    columns = {n: _read(directory, n)['Close'] for n in _recorded(directory)[:tickers]}
+    columns['sp500'] = _read(directory, 'sp500')['sp500']
+    frame = pd.DataFrame(columns).dropna().tail(rows)
+    return frame.rename_axis('Date').reset_index()
+
+
+def load_ohlc(directory, rows):
+    return _read(directory, _recorded(directory)[0]).tail(rows)
+
+
+# ---- cases: each takes its parameters and returns a zero-argument function to time ----
+
+def case_daily_returns(prices):
+    import capm_functions
+    return lambda: capm_functions.daily_returns(prices)
+
+
+def case_normalize(prices):
+    import capm_functions
+    return lambda: capm_functions.normalize(prices)
+
+
+def case_calculate_beta(prices):
+    import capm_functions
+    returns = capm_functions.daily_returns(prices)
+    stocks = [c for c in returns.columns[1:] if c != 'sp500']
+    return lambda: [capm_functions.calculate_beta(returns, s) for s in stocks]
+
+
+def case_batch_regression(prices):
+    import capm_functions
+    returns = capm_functions.daily_returns(prices)
+    return lambda: capm_functions.batch_regression(returns)
+
+
+def case_rolling_beta(prices):
+    import capm_functions
+    returns = capm_functions.daily_returns(prices)
+    return lambda: capm_functions.rolling_beta(returns, 252)
+
+
+def case_factor_regression(prices):
+    import capm_functions
+    import factor_functions
+    returns = capm_functions.daily_returns(prices)
+    factors = make_factors(returns)
+    return lambda: factor_functions.factor_regression(returns, factors)
+
+
+def case_rolling_factor_regression(prices):
+    import capm_functions
+    import factor_functions
+    returns = capm_functions.daily_returns(prices)
+    factors = make_factors(returns)
+    return lambda: factor_functions.rolling_factor_regression(returns, factors, 252, step=21)
+
+
+#function to time one indicator_functions kernel over every price column of the matrix at once
+def case_indicators(name, prices):
+    import indicator_functions
+    values = prices.iloc[:, 1:].to_numpy()
+    return lambda: getattr(indicator_functions, name)(values)
+
+
+def _chart(builder, ohlc, period='max'):
+    from pages.utils import plotly_figure, indicator_engine
+
+    def run():
+        # time the computation, not the indicator engine's LRU
+        indicator_engine._cache.clear()
+        return getattr(plotly_figure, builder)(ohlc, period)
+    return run
+
+
+def _indicator(name, ohlc, period='max'):
+    from pages.utils import indicator_engine
+
+    def run():
+        indicator_engine._cache.clear()
+        return indicator_engine.compute(ohlc, name, period)
+    return run
+
+
+def case_differencing_order(close):
+    from pages.utils import model_train
+
+    def run():
+        model_train._differencing_orders.clear()
+        return model_train.get_differencing_order(close)
+    return run
+
+
+def case_fit_model(close):
+    from pages.utils import model_train
+    scaled, _ = model_train.scaling(model_train.get_rolling_mean(close))
+    d = model_train.get_differencing_order(pd.DataFrame(scaled))
+
+    def run():
+        model_train.MODEL_CACHE.clear()
+        return model_train.fit_model(scaled, d, order=(2, 2))
+    return run
+
+
+# name -> (kind, factory); kind picks the parameter grid and the input shape
+CASES = {
+    'daily_returns': ('matrix', case_daily_returns),
+    'normalize': ('matrix', case_normalize),
+    'calculate_beta': ('matrix', case_calculate_beta),
+    'batch_regression': ('matrix', case_batch_regression),
+    'rolling_beta': ('matrix', case_rolling_beta),
+    'factor_regression': ('matrix', case_factor_regression),
+    'rolling_factor_regression': ('matrix', case_rolling_factor_regression),
+    'indicators.rsi': ('matrix', lambda prices: case_indicators('rsi', prices)),
+    'indicators.macd': ('matrix', lambda prices: case_indicators('macd', prices)),
+    'indicators.bollinger': ('matrix', lambda prices: case_indicators('bollinger', prices)),
+    'chart.close_chart': ('series', lambda ohlc: _chart('close_chart', ohlc)),
+    'chart.candlestick': ('series', lambda ohlc: _chart('candlestick', ohlc)),
+    'chart.RSI': ('series', lambda ohlc: _chart('RSI', ohlc)),
+    'chart.MACD': ('series', lambda ohlc: _chart('MACD', ohlc)),
+    'chart.Moving_average': ('series', lambda ohlc: _chart('Moving_average', ohlc)),
+    'indicator.rsi': ('series', lambda ohlc: _indicator('rsi', ohlc)),
+    'indicator.sma': ('series', lambda ohlc: _indicator('sma', ohlc)),
+    'indicator.macd': ('series', lambda ohlc: _indicator('macd', ohlc)),
+    'model.get_differencing_order': ('model', lambda ohlc: case_differencing_order(ohlc[['Close']])),
+    'model.fit_model': ('model', lambda ohlc: case_fit_model(ohlc[['Close']])),
+}
+
+
+#function to expand the cases into (id, name, params, factory input builder) for the chosen grid
+def plan(quick=False, only=None, data=None):
+    grid = QUICK_GRID if quick else GRID
+    rows = {'series': QUICK_SERIES_ROWS if quick else SERIES_ROWS,
+            'model': QUICK_MODEL_ROWS if quick else MODEL_ROWS}
+    items = []
+    for name, (kind, factory) in CASES.items():
+        if only and not any(o in name for o in only):
+            continue
+        if kind == 'matrix':
+            for r in grid['rows']:
+                for t in grid['tickers']:
+                    build = (lambda r=r, t=t: load_prices(data, r, t)) if data else (lambda r=r, t=t: make_prices(r, t))
+                    items.append((f"{name}[rows={r},tickers={t}]", name, {'rows': r, 'tickers': t}, factory, build))
+        else:
+            for r in rows[kind]:
+                build = (lambda r=r: load_ohlc(data, r)) if data else (lambda r=r: make_ohlc(r))
+                items.append((f"{name}[rows={r}]", name, {'rows': r}, factory, build))
+    return items
+
+
+#function to time one case: best/median of `repeat` runs (after a warm-up), then peak memory of one traced run
+def measure(run, repeat):
+    run()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'best': min(times), 'median': float(np.median(times)), 'repeat': repeat, 'peak_bytes': peak}
+
+
+#function to compare results with a baseline; returns rows for cases present in both
+def compare(results, baseline, threshold=THRESHOLD):
+    rows = []
+    for case_id, current in results.items():
+        before = baseline.get(case_id)
+        if before is None:
+            continue
+        time_ratio = current['best'] / before['best'] if before['best'] else float('inf')
+        memory_ratio = current['peak_bytes'] / before['peak_bytes'] if before['peak_bytes'] else float('inf')
+        slower = time_ratio > 1 + threshold and current['best'] - before['best'] > NOISE_SECONDS
+        bigger = memory_ratio > 1 + threshold and current['peak_bytes'] - before['peak_bytes'] > NOISE_BYTES
+        rows.append({'case': case_id, 'time_ratio': time_ratio, 'memory_ratio': memory_ratio,
+                     'regressed': slower or bigger})
+    return rows
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'platform': platform.platform(), 'processor': platform.processor()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory of the app's hot paths, compared with a baseline")
+    parser.add_argument('--quick', action='store_true', help="small grid only")
+    parser.add_argument('--only', nargs='*', help="run cases whose name contains any of these")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--data', default=None, help="directory of recorded SYMBOL.parquet/.csv files plus sp500")
+    parser.add_argument('--out', default=None, help="results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="write these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--list', action='store_true')
+    args = parser.parse_args()
+
+    items = plan(args.quick, args.only, args.data)
+    if args.list:
+        print('\n'.join(item[0] for item in items))
+        return 0
+
+    warnings.simplefilter('ignore')
+    results = {}
+    print(f"{'case':<48} {'best':>10} {'median':>10} {'peak mem':>10}")
+    for case_id, name, params, factory, build in items:
+        # the model cases are much slower per run; time them fewer times
+        repeat = max(1, args.repeat // 5) if name.startswith('model.') else args.repeat
+        result = measure(factory(build()), repeat)
+        result.update(name=name, params=params)
+        results[case_id] = result
+        print(f"{case_id:<48} {result['best']*1e3:>8.2f}ms {result['median']*1e3:>8.2f}ms "
+              f"{result['peak_bytes']/2**20:>8.1f}MB", flush=True)
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'environment': environment(),
+              'threshold': args.threshold, 'results': results}
+    out = args.out or os.path.join(DEFAULT_RESULTS, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('platform') != report['environment']['platform']:
+        print("note: baseline was recorded on a different platform; ratios are only indicative")
+    rows = compare(results, baseline['results'], args.threshold)
+    report['comparison'] = rows
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n{'case':<48} {'time':>8} {'memory':>8}")
+    for row in rows:
+        flag = '  REGRESSED' if row['regressed'] else ''
+        print(f"{row['case']:<48} {row['time_ratio']:>7.2f}x {row['memory_ratio']:>7.2f}x{flag}")
+    regressed = [row['case'] for row in rows if row['regressed']]
+    print(f"\n{len(regressed)} of {len(rows)} cases regressed beyond {args.threshold:.0%}")
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,32 +1,214 @@
-import plotly.express as px
 import numpy as np
+import pandas as pd
+from price_view import PriceView
+# Every function below takes either a DataFrame with the Date column first and one column per
+# series, or a price_view.PriceView (a Date axis plus a value matrix, typically a zero-copy view
+# of the memory-mapped price store). Views come back as views, with float32 prices kept float32.
+
 #function to plot interactive plotly chart
 def interactive_plot(df):
+    # plotly.express is slow to import and only this chart needs it
+    import plotly.express as px
     fig=px.line()
-    for i in df.columns[1:]:
-        fig.add_scatter(x=df['Date'],y=df[i],name=i)
+    if isinstance(df, PriceView):
+        for i in df.names:
+            fig.add_scatter(x=df.dates,y=df[i],name=i)
+    else:
+        for i in df.columns[1:]:
+            fig.add_scatter(x=df['Date'],y=df[i],name=i)
     fig.update_layout(width=450,margin=dict(l=20,r=20,t=50,b=20),legend=dict(orientation='h',yanchor='bottom',
         y=1.02,xanchor='right',x=1,))
     return fig
 
 #function to normalize the prices based on the initial price
+#returns a new table; the prices passed in are left as they are
 def normalize(df):
-    for i in df.columns[1:]:
-        df[i] = df[i]/df[i][0]
-    return df
+    values = price_matrix(df)
+    if isinstance(df, PriceView):
+        return PriceView(df.dates, df.names, values / values[0])
+    df_normalized = pd.DataFrame(values / values[0], index=df.index, columns=df.columns[1:])
+    df_normalized.insert(0, df.columns[0], df[df.columns[0]].to_numpy())
+    return df_normalized
+
+#function to pull the price columns (everything after Date) into one contiguous float64 matrix
+#(a PriceView's values are returned as they are)
+def price_matrix(df):
+    if isinstance(df, PriceView):
+        return df.values
+    return np.ascontiguousarray(df[df.columns[1:]].to_numpy(dtype=np.float64))
+
+#function to carry the last valid price down each column so a gap doesn't break the return chain
+def _ffill(values):
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    rows = np.where(missing, 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+#function to calculate simple or log returns (in %) for a whole price matrix in one pass
+#row 0 is NaN, and so is every row where the price itself is missing; the next valid
+#price is measured against the last valid one before the gap
+#float32 prices give float32 returns, anything else is computed in float64
+def returns_matrix(values, kind='simple'):
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        values = values.astype(np.float64, copy=False)
+    if values.ndim == 1:
+        return returns_matrix(values[:, None], kind)[:, 0]
+    prices = _ffill(values)
+    out = np.empty(prices.shape, dtype=prices.dtype)
+    out[0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(prices[1:], prices[:-1], out=out[1:])
+        if kind == 'simple':
+            out[1:] -= 1
+        elif kind == 'log':
+            np.log(out[1:], out=out[1:])
+        else:
+            raise ValueError(f"unknown return kind: {kind!r}")
+    out[1:] *= 100
+    out[np.isnan(values)] = np.nan
+    return out
 
 #function to calculate daily returns
-def daily_returns(df):
-    df_daily_return = df.copy() 
-    for i in df.columns[1:]:
-        for j in range(1,len(df)):
-            df_daily_return[i][j] = ((df[i][j]-df[i][j-1])/df[i][j-1])*100
-        df_daily_return[i][0]=0
+#first_row: 'zero' (default, as before), 'nan' or 'drop'
+def daily_returns(df, kind='simple', first_row='zero'):
+    rets = returns_matrix(price_matrix(df), kind)
+    view = isinstance(df, PriceView)
+    index = None if view else df.index
+    dates = df.dates if view else df[df.columns[0]].to_numpy()
+    if first_row == 'zero':
+        rets[0] = 0
+    elif first_row == 'drop':
+        rets, dates = rets[1:], dates[1:]
+        index = None if view else index[1:]
+    elif first_row != 'nan':
+        raise ValueError(f"unknown first_row policy: {first_row!r}")
+    if view:
+        return PriceView(dates, df.names, rets)
+    df_daily_return = pd.DataFrame(rets, index=index, columns=df.columns[1:])
+    df_daily_return.insert(0, df.columns[0], dates)
     return df_daily_return
 
 #function to calculate beta
 def calculate_beta(stocks_daily_return,stock):
-    rm = stocks_daily_return['sp500'].mean()*252
+    if isinstance(stocks_daily_return, PriceView):
+        stats = batch_regression(stocks_daily_return.select(['sp500', stock]))
+    else:
+        stats = batch_regression(stocks_daily_return[['Date', 'sp500', stock]])
+    return stats.at[stock, 'beta'], stats.at[stock, 'alpha']
+
+#function to split a returns table into the stock names, the market column (float64) and the stock columns
+#(float64 for a frame; a view's columns keep their dtype and are converted block by block by the callers)
+def _market_and_stocks(stocks_daily_return, market):
+    if isinstance(stocks_daily_return, PriceView):
+        stocks = [i for i in stocks_daily_return.names if i != market]
+        x = stocks_daily_return[market].astype(np.float64)
+        y = stocks_daily_return.select(stocks).values
+        return stocks, x, y
+    stocks = [i for i in stocks_daily_return.columns[1:] if i != market]
+    x = stocks_daily_return[market].to_numpy(dtype=np.float64)
+    y = stocks_daily_return[stocks].to_numpy(dtype=np.float64)
+    return stocks, x, y
+
+#function to fit y = alpha + beta*x for every column of y at once; rows where x or that
+#column is NaN are left out of that column's fit
+def _regress(x, y):
+    valid = ~np.isnan(y) & ~np.isnan(x)[:, None]
+    n = valid.sum(axis=0).astype(np.float64)
+    xv = np.where(valid, x[:, None], 0.0)
+    yv = np.where(valid, y, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mx = xv.sum(axis=0) / n
+        my = yv.sum(axis=0) / n
+        dx = np.where(valid, xv - mx, 0.0)
+        dy = np.where(valid, yv - my, 0.0)
+        sxx = np.einsum('ij,ij->j', dx, dx)
+        sxy = np.einsum('ij,ij->j', dx, dy)
+        syy = np.einsum('ij,ij->j', dy, dy)
+        beta = sxy / sxx
+        alpha = my - beta * mx
+        ssr = np.maximum(syy - beta * sxy, 0.0)
+        s2 = ssr / (n - 2)
+        return {
+            'beta': beta,
+            'alpha': alpha,
+            'r2': 1 - ssr / syy,
+            'resid_vol': np.sqrt(s2),
+            'beta_se': np.sqrt(s2 / sxx),
+            'alpha_se': np.sqrt(s2 * (1 / n + mx ** 2 / sxx)),
+            'n_obs': n.astype(np.int64),
+        }
+
+# stocks regressed per block in batch_regression, so a whole-universe run only ever holds this many
+# columns of float64 temporaries
+BLOCK_COLUMNS = 256
+
+#function to regress every stock in the daily returns frame on the market column in one pass
+#rf is the daily risk-free return in % (a scalar, or one value per row); when it is non-zero
+#beta/alpha come from the excess-return CAPM regression
+def batch_regression(stocks_daily_return, market='sp500', rf=0):
+    stocks, x, y = _market_and_stocks(stocks_daily_return, market)
+    rf = np.asarray(rf, dtype=np.float64)
+    if rf.ndim:
+        rf = rf.reshape(-1)
+        if len(rf) != len(x):
+            raise ValueError(f"risk-free series has {len(rf)} rows, returns have {len(x)}")
+        rf_y = rf[:, None]
+    else:
+        rf_y = rf
+    x = x - rf
+    blocks = [_regress(x, np.asarray(y[:, i:i + BLOCK_COLUMNS], dtype=np.float64) - rf_y)
+              for i in range(0, max(y.shape[1], 1), BLOCK_COLUMNS)]
+    stats = {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+    return pd.DataFrame(stats, index=pd.Index(stocks, name='Stocks'))
+
+#function to turn betas into annualized CAPM expected returns (all rates in % per year)
+def capm_return(beta, rm, rf=0):
+    return rf + beta * (rm - rf)
+
+#function to sum each column over a trailing window (or everything so far when window is None) in O(1) per step
+def _window_sums(a, window):
+    total = np.cumsum(a, axis=0)
+    if window is None or window >= len(a):
+        return total
+    total[window:] -= total[:-window].copy()
+    return total
+
+#function to calculate beta over time for every stock from running sums of x, y, xy and x^2
+#window=None gives an expanding beta; halflife (in rows) switches to an exponentially weighted beta
+def rolling_beta(stocks_daily_return, window=None, market='sp500', min_periods=None, halflife=None):
+    stocks, x, y = _market_and_stocks(stocks_daily_return, market)
+    y = np.asarray(y, dtype=np.float64)
+    if min_periods is None:
+        min_periods = window if window is not None else 20
+    valid = ~np.isnan(y) & ~np.isnan(x)[:, None]
+    # shift both series by their means; beta is unchanged and the running sums lose less precision
+    xv = np.where(valid, x[:, None] - np.nanmean(x), 0.0)
+    yv = np.where(valid, y - np.nanmean(y, axis=0), 0.0)
+    w = valid.astype(np.float64)
+
+    if halflife is None:
+        n = _window_sums(w, window)
+        sx, sy = _window_sums(xv, window), _window_sums(yv, window)
+        sxy, sxx = _window_sums(xv * yv, window), _window_sums(xv * xv, window)
+        count = n
+    else:
+        decay = 0.5 ** (1 / halflife)
+        n, sx, sy, sxy, sxx = (np.empty_like(xv) for _ in range(5))
+        state = np.zeros((5, xv.shape[1]))
+        for t in range(len(xv)):
+            state *= decay
+            state += (w[t], xv[t], yv[t], xv[t] * yv[t], xv[t] * xv[t])
+            n[t], sx[t], sy[t], sxy[t], sxx[t] = state
+        count = np.cumsum(w, axis=0)
 
-    b,a = np.polyfit(stocks_daily_return['sp500'],stocks_daily_return[stock],1)
-    return b,a
\ No newline at end of file
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = (sxy - sx * sy / n) / (sxx - sx * sx / n)
+    beta[count < max(min_periods, 2)] = np.nan
+    if isinstance(stocks_daily_return, PriceView):
+        return PriceView(stocks_daily_return.dates, stocks, beta)
+    df_beta = pd.DataFrame(beta, index=stocks_daily_return.index, columns=stocks)
+    df_beta.insert(0, stocks_daily_return.columns[0], stocks_daily_return[stocks_daily_return.columns[0]].to_numpy())
+    return df_beta
@@ -0,0 +1,311 @@
+import io
+import os
+import re
+import numpy as np
+import pandas as pd
+import capm_functions
+from price_view import PriceView
+
+# Multi-factor (Fama-French style) regressions on top of the CAPM daily returns table.
+# Every stock is regressed on an intercept plus K factors: the market excess return (the table's
+# sp500 column minus rf) and any factor series from a CSV/Parquet file (Mkt-RF, SMB, HML, Mom, ...)
+# or built from the returns themselves (momentum_factor). All returns are in %.
+# The fit for all stocks is one batched least-squares solve: X'X and X'Y come out of single
+# matrix products, each stock only gets its own X'X when it has missing days, and the (K+1)^2
+# systems are inverted together. Rolling fits reuse cumulative sums of the per-day Gram terms x x',
+# so every window costs a difference of two rows whatever its length.
+
+# factor file the CAPM page uses when none is uploaded
+DEFAULT_FACTOR_FILE = os.environ.get("CAPM_FACTOR_FILE")
+# stocks fitted together in rolling_factor_regression; bounds the (days x factors x stocks) running sums
+ROLLING_BLOCK = 64
+# a data row of a Kenneth French file: a YYYYMM or YYYYMMDD date, then the factors
+FRENCH_ROW = re.compile(r'\s*(\d{6}|\d{8})\s*,')
+
+
+#function to cut the factor table out of a CSV as Kenneth French's site ships it: a few lines of text
+#above the header row and, below the monthly or daily rows, annual factors and a copyright line.
+#Keeps the line before the first dated row as the header and the rows up to the first one that
+#isn't a date of the same kind; any other CSV comes back as it is
+def _french_table(text):
+    lines = text.splitlines()
+    first = next((i for i, line in enumerate(lines) if FRENCH_ROW.match(line)), None)
+    if not first:
+        return text
+    width = len(FRENCH_ROW.match(lines[first]).group(1))
+    last = first
+    while last < len(lines):
+        row = FRENCH_ROW.match(lines[last])
+        if row is None or len(row.group(1)) != width:
+            break
+        last += 1
+    return '\n'.join(lines[first - 1:last])
+
+
+#function to read factor returns from a CSV or Parquet file (a path or an uploaded file) into a
+#Date-first frame (in %); the date may be the index, a Date column or YYYYMMDD/YYYYMM integers
+#(Kenneth French's files, which can be used as downloaded); percent=False multiplies decimal returns by 100
+def load_factors(path, percent=True):
+    if os.path.splitext(getattr(path, 'name', str(path)))[1].lower() in ('.parquet', '.pq'):
+        frame = pd.read_parquet(path)
+    else:
+        if hasattr(path, 'read'):
+            text = path.read()
+        else:
+            with open(path, 'rb') as f:
+                text = f.read()
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', errors='replace')
+        frame = pd.read_csv(io.StringIO(_french_table(text)), skipinitialspace=True)
+        frame.columns = [str(column).strip() for column in frame.columns]
+    if isinstance(frame.index, pd.DatetimeIndex):
+        frame = frame.rename_axis('Date').reset_index()
+    date = 'Date' if 'Date' in frame.columns else frame.columns[0]
+    dates = frame[date]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        text = dates.astype(str).str.strip()
+        if text.str.fullmatch(r'\d{8}').all():
+            dates = pd.to_datetime(text, format='%Y%m%d')
+        elif text.str.fullmatch(r'\d{6}').all():
+            dates = pd.to_datetime(text, format='%Y%m')
+        else:
+            dates = pd.to_datetime(text)
+    values = frame.drop(columns=[date]).apply(pd.to_numeric, errors='coerce').astype(np.float64)
+    if not percent:
+        values = values * 100
+    values.insert(0, 'Date', dates.to_numpy())
+    return values.sort_values('Date').reset_index(drop=True)
+
+
+#function to build a momentum (winners minus losers) factor from a returns table: each day, the
+#equal-weighted return of the top `quantile` of stocks by their return over the past `lookback`
+#days excluding the most recent `skip`, minus that of the bottom `quantile`
+def momentum_factor(stocks_daily_return, lookback=252, skip=21, quantile=0.3, market='sp500', name='MOM'):
+    dates, stocks, _, y = _split(stocks_daily_return, market)
+    y = np.asarray(y, dtype=np.float64)
+    # cumulative log growth, so a past window's return is a difference of two rows
+    growth = np.cumsum(np.log1p(np.nan_to_num(y) / 100), axis=0)
+    listed = np.cumsum(~np.isnan(y), axis=0)
+    factor = np.full(len(dates), np.nan)
+    for t in range(lookback + 1, len(dates)):
+        hi, lo = t - 1 - skip, t - 1 - lookback
+        ranked = (listed[hi] - listed[lo] == lookback - skip) & ~np.isnan(y[t])
+        if ranked.sum() < 2:
+            continue
+        past = np.where(ranked, growth[hi] - growth[lo], np.nan)
+        low, high = np.nanquantile(past, [quantile, 1 - quantile])
+        winners, losers = ranked & (past >= high), ranked & (past <= low)
+        if winners.any() and losers.any():
+            factor[t] = y[t, winners].mean() - y[t, losers].mean()
+    return pd.DataFrame({'Date': dates, name: factor})
+
+
+#function to split a returns table into its dates, stock names, market column (or None) and stock matrix;
+#columns in exclude are left out altogether (e.g. the index column when the factors carry their own market)
+def _split(stocks_daily_return, market, exclude=()):
+    if isinstance(stocks_daily_return, PriceView):
+        dates = stocks_daily_return.dates
+        names = stocks_daily_return.names
+    else:
+        dates = stocks_daily_return[stocks_daily_return.columns[0]].to_numpy()
+        names = list(stocks_daily_return.columns[1:])
+    if any(name in exclude for name in names):
+        names = [name for name in names if name not in exclude]
+        if isinstance(stocks_daily_return, PriceView):
+            stocks_daily_return = stocks_daily_return.select(names)
+        else:
+            stocks_daily_return = stocks_daily_return[[stocks_daily_return.columns[0]] + names]
+    if market is None or market not in names:
+        if isinstance(stocks_daily_return, PriceView):
+            return dates, names, None, stocks_daily_return.values
+        return dates, names, None, stocks_daily_return[names].to_numpy(dtype=np.float64)
+    stocks, x, y = capm_functions._market_and_stocks(stocks_daily_return, market)
+    return dates, stocks, x, y
+
+
+#function to line the factors up with the returns' dates: (factor names, T x K matrix with NaN on days
+#a factor is missing, the daily risk-free rate per row)
+#rf=None takes the factor file's RF column when it has one (and 0 otherwise)
+def _design(dates, x, factors, rf):
+    names, columns = [], []
+    file_rf = None
+    if factors is not None:
+        if isinstance(factors, PriceView):
+            factors = factors.to_frame().reset_index()
+        aligned = factors.set_index(factors.columns[0]).reindex(pd.DatetimeIndex(dates))
+        if 'RF' in aligned.columns:
+            file_rf = aligned.pop('RF').to_numpy(dtype=np.float64)
+        names += list(aligned.columns)
+        columns += [aligned[name].to_numpy(dtype=np.float64) for name in aligned.columns]
+    if rf is None:
+        rf = file_rf if file_rf is not None else 0.0
+    rf = np.broadcast_to(np.asarray(rf, dtype=np.float64), (len(dates),))
+    if x is not None:
+        names.insert(0, 'market')
+        columns.insert(0, x - rf)
+    if not columns:
+        raise ValueError("no factors: pass a factor table or keep the market column in the returns")
+    return names, np.column_stack(columns), rf
+
+
+#function to invert Grams G (.. x p x p) fitted on n days; NaN where there are too few days or a missing
+#value (a singular Gram, e.g. collinear factors, gets its pseudo-inverse rather than an error)
+def _inverse(G, n):
+    p = G.shape[-1]
+    ok = (np.broadcast_to(n, G.shape[:-2]) > p) & np.isfinite(G).all(axis=(-2, -1))
+    Ginv = np.full(G.shape, np.nan)
+    if ok.any():
+        Ginv[ok] = np.linalg.pinv(G[ok], hermitian=True)
+    return Ginv
+
+
+#function to turn inverse Grams, X'y (.. x p), y'y, sum(y) and day counts into loadings, standard
+#errors, t-stats, R^2 and residual volatility
+def _solve(Ginv, Xty, yty, sy, n):
+    p = Ginv.shape[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coef = np.einsum('...ij,...j->...i', Ginv, Xty)
+        ssr = np.maximum(yty - np.einsum('...i,...i->...', coef, Xty), 0.0)
+        s2 = ssr / (n - p)
+        se = np.sqrt(s2[..., None] * np.diagonal(Ginv, axis1=-2, axis2=-1))
+        sst = yty - sy ** 2 / n
+        return {'coef': coef, 'se': se, 't': coef / se, 'r2': 1 - ssr / sst, 'resid_vol': np.sqrt(s2)}
+
+
+#function to name the output columns: alpha and the factor loadings, then _se and _t for each
+def _labels(names):
+    terms = ['alpha'] + names
+    return terms, [f"{term}_se" for term in terms], [f"{term}_t" for term in terms]
+
+
+#function to regress every stock on an intercept plus all the factors in one batched solve
+#factors: None (market only, the CAPM), or a Date-first table of factor returns in % such as
+#load_factors() gives; a factor table that already has the market factor (Mkt-RF) should be
+#used with market=None and the index column in exclude, so it isn't fitted as a stock.
+#rf is the daily risk-free return in % (scalar or per row)
+#returns one row per stock: alpha, one loading per factor, their standard errors (_se) and
+#t-stats (_t), r2, resid_vol (daily residual volatility in %) and n_obs
+def factor_regression(stocks_daily_return, factors=None, market='sp500', rf=None, exclude=()):
+    dates, stocks, x, y = _split(stocks_daily_return, market, exclude)
+    names, F, rf = _design(dates, x, factors, rf)
+    # days where any factor is missing are dropped for every stock
+    rows = ~np.isnan(F).any(axis=1)
+    X = np.column_stack([np.ones(rows.sum()), F[rows]])
+    p = X.shape[1]
+    gram = (X[:, :, None] * X[:, None, :]).reshape(len(X), p * p)
+    blocks = []
+    for i in range(0, max(len(stocks), 1), capm_functions.BLOCK_COLUMNS):
+        Y = np.asarray(y[rows, i:i + capm_functions.BLOCK_COLUMNS], dtype=np.float64) - rf[rows, None]
+        valid = ~np.isnan(Y)
+        Y = np.where(valid, Y, 0.0)
+        n = valid.sum(axis=0).astype(np.float64)
+        if valid.all():
+            Ginv = np.broadcast_to(_inverse(X.T @ X, len(X)), (Y.shape[1], p, p))
+        else:
+            # each stock's X'X over its own days: one product of the validity mask with the x x' terms
+            Ginv = _inverse((valid.T.astype(np.float64) @ gram).reshape(-1, p, p), n)
+        blocks.append((_solve(Ginv, (X.T @ Y).T, np.einsum('ij,ij->j', Y, Y), Y.sum(axis=0), n), n))
+    terms, se_labels, t_labels = _labels(names)
+    columns = {}
+    for key, labels in (('coef', terms), ('se', se_labels), ('t', t_labels)):
+        values = np.concatenate([fit[key] for fit, _ in blocks])
+        columns.update({label: values[:, j] for j, label in enumerate(labels)})
+    columns['r2'] = np.concatenate([fit['r2'] for fit, _ in blocks])
+    columns['resid_vol'] = np.concatenate([fit['resid_vol'] for fit, _ in blocks])
+    columns['n_obs'] = np.concatenate([n for _, n in blocks]).astype(np.int64)
+    return pd.DataFrame(columns, index=pd.Index(stocks, name='Stocks'))
+
+
+#function for the rows where the windows ending at `at` (ascending) start or stop: the days are added
+#up between consecutive edges, then accumulated over those segments, so a sparse `at` only pays for
+#one pass over the data plus a short running sum
+def _window_edges(at, window, days):
+    edges = np.unique(np.concatenate([[0], np.maximum(at - window + 1, 0), at + 1]))
+    return edges[edges < days]
+
+
+#function to turn running totals over the segments that start at `edges` into the trailing window sums at `at`
+def _windows(total, edges, at, window):
+    starts = np.maximum(at - window + 1, 0)
+    # running total through day r: the segments up to the one that ends at r
+    def through(r):
+        return total[np.searchsorted(edges, r, side='right') - 1]
+    before = np.where((starts > 0).reshape((-1,) + (1,) * (total.ndim - 1)), through(np.maximum(starts - 1, 0)), 0.0)
+    return through(at) - before
+
+
+#function for the sums of a (days x ...) array over the trailing `window` days ending at each row in `at`
+def _sums_at(a, at, window):
+    edges = _window_edges(at, window, len(a))
+    if 2 * len(edges) > len(a):
+        # nearly every day is an edge: a plain running sum is cheaper
+        return _windows(np.cumsum(a, axis=0), np.arange(len(a)), at, window)
+    return _windows(np.cumsum(np.add.reduceat(a, edges, axis=0), axis=0), edges, at, window)
+
+
+#function for the trailing window sums of x y' (p x stocks) at each row in `at`, one matrix product per segment
+def _cross_at(X, Y, at, window):
+    edges = _window_edges(at, window, len(X))
+    bounds = np.append(edges, len(X))
+    segments = np.array([X[lo:hi].T @ Y[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])])
+    return _windows(np.cumsum(segments, axis=0), edges, at, window)
+
+
+#function to fit the factor model over a trailing window of `window` days, every `step` days
+#(counted back from the last day, which is always included); a window needs min_periods days
+#(default: the whole window) where the stock and every factor have a value; market and exclude
+#work as in factor_regression
+#returns {column: frame of Date x stocks} for alpha, each loading, their t-stats (_t) and resid_vol
+def rolling_factor_regression(stocks_daily_return, factors=None, window=252, market='sp500', rf=None,
+                              min_periods=None, step=1, exclude=()):
+    dates, stocks, x, y = _split(stocks_daily_return, market, exclude)
+    names, F, rf = _design(dates, x, factors, rf)
+    min_periods = window if min_periods is None else min_periods
+    rows = ~np.isnan(F).any(axis=1)
+    X = np.column_stack([np.ones(len(F)), np.where(rows[:, None], F, 0.0)])
+    X[~rows] = 0.0
+    p = X.shape[1]
+    at = np.arange(len(dates) - 1, -1, -step)[::-1]
+    gram = (X[:, :, None] * X[:, None, :]).reshape(len(X), p * p)
+    # one Gram per window, shared by every stock with a value on each of the window's factor days
+    shared = _sums_at(gram, at, window).reshape(-1, p, p)
+    shared_rows = _sums_at(rows.astype(np.float64), at, window)
+    shared_inv = _inverse(shared, shared_rows)
+
+    terms, _, t_labels = _labels(names)
+    out = {label: np.full((len(at), len(stocks)), np.nan) for label in terms + t_labels + ['resid_vol']}
+    for i in range(0, len(stocks), ROLLING_BLOCK):
+        Y = np.asarray(y[:, i:i + ROLLING_BLOCK], dtype=np.float64) - rf[:, None]
+        valid = ~np.isnan(Y) & rows[:, None]
+        Y = np.where(valid, Y, 0.0)
+        n = _sums_at(valid.astype(np.float64), at, window)
+        Xty = _cross_at(X, Y, at, window).transpose(0, 2, 1)
+        yty, sy = _sums_at(Y * Y, at, window), _sums_at(Y, at, window)
+        fit = _solve(np.broadcast_to(shared_inv[:, None], (len(at), Y.shape[1], p, p)), Xty, yty, sy, n)
+        # windows where a stock misses some factor days: take those days' x x' back out of the shared
+        # Gram and refit just those
+        partial = (n < shared_rows[:, None]) & (n >= min_periods)
+        for j in np.flatnonzero(partial.any(axis=0)):
+            windows = np.flatnonzero(partial[:, j])
+            lo = max(at[windows[0]] - window + 1, 0)
+            hi = at[windows[-1]] + 1
+            missing = (rows[lo:hi] & ~valid[lo:hi, j]).astype(np.float64)
+            G = shared[windows] - _sums_at(missing[:, None] * gram[lo:hi], at[windows] - lo, window).reshape(-1, p, p)
+            refit = _solve(_inverse(G, n[windows, j]), Xty[windows, j], yty[windows, j], sy[windows, j],
+                           n[windows, j])
+            for key in ('coef', 't', 'resid_vol'):
+                fit[key][windows, j] = refit[key]
+        enough = n >= max(min_periods, p + 1)
+        for j, label in enumerate(terms):
+            out[label][:, i:i + ROLLING_BLOCK] = np.where(enough, fit['coef'][..., j], np.nan)
+            out[t_labels[j]][:, i:i + ROLLING_BLOCK] = np.where(enough, fit['t'][..., j], np.nan)
+        out['resid_vol'][:, i:i + ROLLING_BLOCK] = np.where(enough, fit['resid_vol'], np.nan)
+
+    if isinstance(stocks_daily_return, PriceView):
+        return {label: PriceView(dates[at], stocks, values) for label, values in out.items()}
+    result = {}
+    for label, values in out.items():
+        frame = pd.DataFrame(values, columns=stocks)
+        frame.insert(0, 'Date', dates[at])
+        result[label] = frame
+    return result
@@ -0,0 +1,273 @@
+import functools
+import numpy as np
+import pandas as pd
+
+# Technical indicators as NumPy kernels: RSI (Wilder), SMA, EMA, MACD, Bollinger bands and ATR.
+# Every function takes one series or a rows x tickers matrix (a DataFrame, a price store view's
+# values, a plain array) and works down the rows of all columns at once, so a screener gets the
+# RSI of the whole universe from one call. Results match pandas_ta run on each column's own
+# history: columns may start and end on different rows (the NaN padding of ragged listings), EMAs
+# are seeded with the SMA of each column's first `length` prices, Wilder smoothing is pandas_ta's
+# rma (an adjusted EWM with alpha 1/length) and a rolling window with a missing price is NaN.
+# An EMA holds its value over missing prices, and the price after a gap is weighted as pandas'
+# EWM without adjustment weights it (as if the skipped rows had decayed the old value).
+# The EWM recursions y = gain * x + decay * y[-1] run a block of rows at a time: inside a block the
+# recursion is one product with a triangular matrix of decay powers, and only the block's last row
+# is carried into the next one, so there is no Python loop over rows.
+
+# rows per block are chosen so one block product touches about this many values
+BLOCK_VALUES = 16384
+MIN_BLOCK, MAX_BLOCK = 16, 128
+# largest log of the rescaling an EMA over gaps runs with before a column is done row by row
+MAX_LOG_SCALE = 600
+
+
+#function to turn a series, frame or array into a float64 rows x columns matrix; gives back the matrix
+#and a function putting results back in the input's form (1-D stays 1-D, pandas keeps its index)
+def _matrix(values):
+    if isinstance(values, pd.DataFrame):
+        return (values.to_numpy(dtype=np.float64),
+                lambda result, name: pd.DataFrame(result, index=values.index, columns=values.columns))
+    if isinstance(values, pd.Series):
+        return (values.to_numpy(dtype=np.float64)[:, None],
+                lambda result, name: pd.Series(result[:, 0], index=values.index, name=name))
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim == 1:
+        return array[:, None], lambda result, name: result[:, 0]
+    return array, lambda result, name: result
+
+
+#function for a block's recursion matrix (weights[i, j] = gain * decay^(i - j) on and below the diagonal)
+#and the decay of the previous block's last row into each of its rows
+@functools.lru_cache(maxsize=64)
+def _block_weights(block, decay, gain):
+    lags = np.arange(block)[:, None] - np.arange(block)[None, :]
+    weights = np.where(lags >= 0, gain * decay ** np.maximum(lags, 0), 0.0)
+    return weights, decay ** np.arange(1, block + 1)[:, None]
+
+
+#function to run y[t] = gain * x[t] + decay * y[t-1] (y[-1] = 0) down every column of x;
+#decay=1 is a running sum (numpy's cumsum down the rows of a wide matrix is several times slower)
+def _recursive(x, decay, gain=1.0):
+    rows, columns = x.shape
+    block = int(np.clip(BLOCK_VALUES // max(columns, 1), MIN_BLOCK, MAX_BLOCK))
+    weights, carried = _block_weights(block, float(decay), float(gain))
+    out = np.empty((rows, columns))
+    last = np.zeros(columns)
+    for start in range(0, rows, block):
+        n = min(block, rows - start)
+        np.matmul(weights[:n, :n], x[start:start + n], out=out[start:start + n])
+        out[start:start + n] += carried[:n] * last
+        last = out[start + n - 1]
+    return out
+
+
+#function for each column's first row with a value (rows when it has none)
+def _first_valid(valid):
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), len(valid))
+
+
+#function to tell whether any column misses a value after its first one (a gap or trailing padding)
+def _has_gaps(valid, first):
+    return int(valid.sum()) != int((len(valid) - first).sum())
+
+
+#function for the row on which each column has had n values (rows when it never does)
+def _nth_valid(valid, n, first, gaps):
+    rows, columns = valid.shape
+    nth = first + n - 1
+    if not gaps:
+        return np.minimum(nth, rows)
+    # only columns missing a value among their first n rows need counting
+    offsets = np.minimum(first[None, :] + np.arange(n)[:, None], rows - 1)
+    whole = valid[offsets, np.arange(columns)].all(axis=0) & (nth < rows)
+    nth = np.where(whole, nth, rows)
+    counted = np.flatnonzero(~whole & (first < rows))
+    if len(counted):
+        counts = _recursive(valid[:, counted].astype(np.float64), 1.0)
+        reached = counts[-1] >= n
+        nth[counted[reached]] = np.argmax(counts[:, reached] >= n, axis=0)
+    return nth
+
+
+#function to blank every column's rows before the given row
+def _blank_before(x, rows):
+    x[np.arange(len(x))[:, None] < rows] = np.nan
+    return x
+
+
+#function to carry each column's last value over the NaN rows after it
+def _ffill(x, valid):
+    rows = np.where(valid, np.arange(len(x))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(x, rows, axis=0)
+
+
+#function for pandas_ta's rma: the adjusted EWM (alpha 1/length) of every column, NaN until a column has
+#had length values; a missing row adds nothing but still decays the rows before it, as in pandas.
+#weights=False leaves out the division by the weight total (for ratios of two rmas, where it cancels)
+def _rma(x, length, weights=True):
+    valid = ~np.isnan(x)
+    first = _first_valid(valid)
+    gaps = _has_gaps(valid, first)
+    decay = 1 - 1 / length
+    out = _recursive(np.where(valid, x, 0.0), decay)
+    if weights:
+        if gaps:
+            total = _recursive(valid.astype(np.float64), decay)
+        else:
+            # 1 + decay + ... + decay^k, k rows after the column's first value
+            total = (1 - decay ** np.maximum(np.arange(len(x))[:, None] - first + 1, 0)) / (1 - decay)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out /= total
+    return _blank_before(out, _nth_valid(valid, length, first, gaps))
+
+
+#function for pandas_ta's ema of every column: the mean of the column's first length rows (skipping
+#missing ones), then an EWM (alpha 2 / (length + 1), no adjustment) of the prices after it
+def _ema(x, length):
+    rows, columns = x.shape
+    alpha = 2 / (length + 1)
+    valid = ~np.isnan(x)
+    first = _first_valid(valid)
+    gaps = _has_gaps(valid, first)
+    seeded = first + length - 1
+    ok = np.flatnonzero(seeded < rows)
+    window = x[first[ok][None, :] + np.arange(length)[:, None], ok]
+    seed = np.where(np.isnan(window), 0.0, window).sum(axis=0) / (~np.isnan(window)).sum(axis=0)
+    after = np.arange(rows)[:, None] > seeded
+    if not gaps:
+        inputs = np.where(after, np.where(valid, x, 0.0), 0.0)
+        # gain * x = seed on the seed row, so the recursion starts from it
+        inputs[seeded[ok], ok] = seed / alpha
+        return _blank_before(_recursive(inputs, 1 - alpha, alpha), seeded)
+    return _ema_gaps(x, valid & after, seeded, ok, seed, alpha)
+
+
+#function for _ema when prices are missing after the seed. pandas gives the price after k missing rows
+#the weight alpha against (1 - alpha)^(k + 1) for the old value, then normalises:
+#y = (D y[-1] + alpha x) / (D + alpha), D = (1 - alpha)^(k + 1). With S the running product of
+#1 / (D + alpha) over those rows, v = y / S follows the plain recursion
+#v = (1 - alpha) v[-1] + alpha x / S[-1] (a missing row adds nothing), so y = S v on every price
+def _ema_gaps(x, observed, seeded, ok, seed, alpha):
+    rows, columns = x.shape
+    decay = 1 - alpha
+    observed = observed.copy()
+    observed[seeded[ok], ok] = True
+    positions = np.arange(rows)[:, None]
+    latest = np.maximum.accumulate(np.where(observed, positions, -1), axis=0)
+    # rows missed since the previous price, on each row with a price
+    skipped = np.zeros((rows, columns))
+    skipped[1:] = np.where(observed[1:], positions[1:] - 1 - latest[:-1], 0)
+    skipped[seeded[ok], ok] = 0
+    log_scale = np.cumsum(np.where(observed & (skipped > 0), -np.log(decay ** (skipped + 1) + alpha), 0.0), axis=0)
+    scale = np.exp(np.minimum(log_scale, MAX_LOG_SCALE))
+    previous = np.ones_like(scale)
+    previous[1:] = scale[:-1]
+    inputs = np.where(observed, x, 0.0) / previous
+    inputs[seeded[ok], ok] = seed / alpha
+    with np.errstate(over='ignore', invalid='ignore'):
+        out = np.where(observed, scale * _recursive(inputs, decay, alpha), np.nan)
+    # S only gets near overflowing after hundreds of long gaps; such columns go row by row
+    for j in np.flatnonzero(log_scale[-1] > MAX_LOG_SCALE):
+        value, weight = seed[np.searchsorted(ok, j)], 1.0
+        out[:, j] = np.nan
+        out[seeded[j], j] = value
+        for t in range(seeded[j] + 1, rows):
+            weight *= decay
+            if observed[t, j]:
+                value = (weight * value + alpha * x[t, j]) / (weight + alpha)
+                weight = 1.0
+                out[t, j] = value
+    # a missing price shows the value before it (trailing padding included)
+    return _ffill(out, ~np.isnan(out))
+
+
+#function for rolling sums of every column over length rows (NaN when the window misses a value), of the
+#values and, with squares, of their squares; values are centred on the column's first price first, so
+#the running totals don't lose precision. Returns (the centre, [sums])
+def _rolling(x, length, squares=False):
+    rows, columns = x.shape
+    valid = ~np.isnan(x)
+    first = _first_valid(valid)
+    gaps = _has_gaps(valid, first)
+    base = np.where(first < rows, x[np.minimum(first, rows - 1), np.arange(columns)], 0.0)
+    centred = np.where(valid, x - base, 0.0)
+    sums = []
+    for values in [centred, centred * centred] if squares else [centred]:
+        total = _recursive(values, 1.0)
+        total[length:] -= total[:-length].copy()
+        sums.append(total)
+    if gaps:
+        count = _recursive(valid.astype(np.float64), 1.0)
+        count[length:] -= count[:-length].copy()
+        for total in sums:
+            total[count < length - 0.5] = np.nan
+    else:
+        for total in sums:
+            _blank_before(total, first + length - 1)
+    return base, sums
+
+
+#function for the simple moving average of length rows
+def sma(close, length=50):
+    x, wrap = _matrix(close)
+    base, (total,) = _rolling(x, length)
+    return wrap(total / length + base, f'SMA_{length}')
+
+
+#function for the exponential moving average of length rows (seeded with the SMA, like pandas_ta)
+def ema(close, length=10):
+    x, wrap = _matrix(close)
+    return wrap(_ema(x, length), f'EMA_{length}')
+
+
+#function for Wilder's RSI: 100 * smoothed gains / (smoothed gains + smoothed losses)
+def rsi(close, length=14):
+    x, wrap = _matrix(close)
+    change = np.full_like(x, np.nan)
+    np.subtract(x[1:], x[:-1], out=change[1:])
+    missing = np.isnan(change)
+    # the two rmas share their weight total, so it cancels out of the ratio
+    up = _rma(np.where(change > 0, change, np.where(missing, np.nan, 0.0)), length, weights=False)
+    down = _rma(np.where(change < 0, -change, np.where(missing, np.nan, 0.0)), length, weights=False)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return wrap(100 * up / (up + down), f'RSI_{length}')
+
+
+#function for MACD: (fast EMA - slow EMA, its signal EMA, and the histogram between the two)
+def macd(close, fast=12, slow=26, signal=9):
+    x, wrap = _matrix(close)
+    line = _ema(x, fast) - _ema(x, slow)
+    # the signal EMA is seeded on the MACD line's own first values
+    trigger = _ema(line, signal)
+    suffix = f'{fast}_{slow}_{signal}'
+    return (wrap(line, f'MACD_{suffix}'), wrap(trigger, f'MACDs_{suffix}'),
+            wrap(line - trigger, f'MACDh_{suffix}'))
+
+
+#function for Bollinger bands: (middle - std * deviation, the SMA, middle + std * deviation) over
+#length rows, with pandas_ta's population deviation (ddof=0)
+def bollinger(close, length=20, std=2.0, ddof=0):
+    x, wrap = _matrix(close)
+    base, (total, squares) = _rolling(x, length, squares=True)
+    mean = total / length
+    deviation = np.sqrt(np.maximum(squares - total * mean, 0.0) / (length - ddof))
+    middle = mean + base
+    suffix = f'{length}_{float(std)}'
+    return (wrap(middle - std * deviation, f'BBL_{suffix}'), wrap(middle, f'BBM_{suffix}'),
+            wrap(middle + std * deviation, f'BBU_{suffix}'))
+
+
+#function for the average true range: Wilder smoothing of max(high - low, |high - previous close|,
+#|low - previous close|); a column's first bar has no true range, and a bar after a gap only has high - low
+def atr(high, low, close, length=14):
+    c, wrap = _matrix(close)
+    h, l = _matrix(high)[0], _matrix(low)[0]
+    previous = np.full_like(c, np.nan)
+    previous[1:] = c[:-1]
+    true_range = np.fmax(h - l, np.fmax(np.abs(h - previous), np.abs(l - previous)))
+    first = _first_valid(~np.isnan(c))
+    ok = first < len(c)
+    true_range[first[ok], np.arange(c.shape[1])[ok]] = np.nan
+    return wrap(_rma(true_range, length), f'ATRr_{length}')
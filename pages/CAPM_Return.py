@@ -1,17 +1,21 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 from datetime import date
-import pandas_datareader.data as web
 import capm_functions
+import portfolio_functions
+import factor_functions
+import simulation_functions
+from pages.utils.capm_graph import default_graph
+from pages.utils.ticker_universe import get_universe
+from pages.utils.instrumentation import begin_page, end_page, stage
 
 # Streamlit UI setup
 st.set_page_config(page_title="CAPM", page_icon="chart_with_upwards_trend", layout='wide')
 st.title("Capital Asset Pricing Model")
+run = begin_page("CAPM")
 
-# Load valid tickers from file
-with open("tickers.txt", "r") as f:
-    valid_tickers = set([line.strip().upper() for line in f])
+# Load valid tickers (sorted, cached for the whole process)
+universe = get_universe()
 
 # Session state for selected stocks
 if "selected_stocks" not in st.session_state:
@@ -21,9 +25,10 @@ if "selected_stocks" not in st.session_state:
 col1, col2, col3 = st.columns([1, 1, 1])
 
 with col1:
+    query = st.text_input("Search stock", "AAPL")
     selected_stock = st.selectbox(
         "Choose a stock",
-        options=valid_tickers,
+        options=universe.search(query) or [query.strip().upper()],
         index=0
     )
     if selected_stock not in st.session_state.selected_stocks:
@@ -41,42 +46,31 @@ with col2:
 
 with col3:
     year = st.number_input("Number of years", 1, 10)
+    rf = st.number_input("Risk-free rate (% per year)", 0.0, 20.0, 0.0, step=0.25)
 
 if not stocks_list:
     st.warning("Please select at least one stock to proceed.")
     st.stop()
 
+# only needed for the charts below, so the inputs above render before it is imported
+import plotly.express as px
+
 # Dates
 end = date.today()
 start = date(end.year - int(year), end.month, end.day)
 
-# Fetch SP500 data
-SP500 = web.DataReader(['sp500'], 'fred', start, end).reset_index()
-
-# Flatten SP500 columns if multiindex
-if isinstance(SP500.columns, pd.MultiIndex):
-    SP500.columns = [col[0] if isinstance(col, tuple) else col for col in SP500.columns]
-
-SP500.columns = ['Date', 'sp500']
-
-# Fetch stock data
-stocks_df = pd.DataFrame()
-for stock in stocks_list:
-    data = yf.download(stock, period=f'{year}y')[['Close']]
-
-    # Flatten columns if multiindex
-    if isinstance(data.columns, pd.MultiIndex):
-        data.columns = [col[0] if isinstance(col, tuple) else col for col in data.columns]
-
-    data = data.rename(columns={'Close': stock}).reset_index()
-
-    if stocks_df.empty:
-        stocks_df = data
-    else:
-        stocks_df = pd.merge(stocks_df, data, on="Date", how="outer")
-
-# Merge with SP500
-stocks_df = pd.merge(stocks_df, SP500, on="Date", how="inner")
+# Prices, returns and betas come from the shared computation graph: only stocks that are new to the
+# selection are downloaded and regressed, the sp500 series and everything else are reused
+graph = default_graph()
+stocks_df, fetch_report = graph.table(stocks_list, start, end)
+failed = fetch_report[fetch_report['Error'].notna()]
+if not failed.empty:
+    st.warning(f"Could not download: {', '.join(failed['Symbol'])}")
+with st.expander("Download report"):
+    st.dataframe(fetch_report.round(3), use_container_width=True)
+if len(stocks_df.columns) < 2:
+    st.error("None of the selected stocks could be downloaded.")
+    st.stop()
 
 # Show head/tail
 col1, col2 = st.columns([1, 1])
@@ -97,19 +91,20 @@ with col2:
     st.plotly_chart(capm_functions.interactive_plot(capm_functions.normalize(stocks_df)))
 
 # Daily returns
-stocks_daily_return = capm_functions.daily_returns(stocks_df)
+stocks_daily_return = graph.returns(stocks_df)
 
-beta, alpha = {}, {}
-for i in stocks_daily_return.columns:
-    if i != 'Date' and i.lower() != 'sp500':
-        b, a = capm_functions.calculate_beta(stocks_daily_return, i)
-        beta[i] = b
-        alpha[i] = a
+# One regression pass for the stocks not seen before, on excess returns when a risk-free rate is set
+regression = graph.regression(stocks_df, rf)
+beta = regression['beta'].to_dict()
+alpha = regression['alpha'].to_dict()
 
 # Beta values
 beta_df = pd.DataFrame({
-    'Stocks': beta.keys(),
-    'Beta Value': beta.values()
+    'Stocks': regression.index,
+    'Beta Value': regression['beta'].to_numpy(),
+    'Alpha': regression['alpha'].to_numpy(),
+    'R²': regression['r2'].to_numpy(),
+    'Beta Std. Error': regression['beta_se'].to_numpy()
 })
 
 with col1:
@@ -117,20 +112,90 @@ with col1:
     st.dataframe(beta_df, use_container_width=True)
 
 # CAPM Return
-rf = 0  # Risk-free rate
 rm = stocks_daily_return['sp500'].mean() * 252
 
-rtrn_value = []
-for stock, value in beta.items():
-    if stock.lower() != 'sp500':
-        capm_return = rf + value * (rm - rf)
-        rtrn_value.append(round(capm_return, 2))
-
 return_df = pd.DataFrame({
-    'Stocks': list(beta.keys()),
-    'Return Value': rtrn_value
+    'Stocks': regression.index,
+    'Return Value': capm_functions.capm_return(regression['beta'], rm, rf).round(2).to_numpy()
 })
 
 with col2:
     st.markdown('### Calculated Results using CAPM')
     st.dataframe(return_df, use_container_width=True)
+
+# Beta over time
+st.markdown('### Rolling Beta')
+window = st.selectbox("Window (trading days)", ("60", "120", "252", "Expanding"), index=2)
+rolling = graph.rolling(stocks_df, None if window == "Expanding" else int(window))
+st.plotly_chart(capm_functions.interactive_plot(rolling.dropna(how='all', subset=rolling.columns[1:])),
+                use_container_width=True)
+
+# Multi-factor regression on the market plus factor returns from a file (e.g. Fama-French SMB, HML, Mom)
+st.markdown('### Factor Model')
+factor_file = st.file_uploader("Factor returns (CSV or Parquet: Date, then one column per factor in %)",
+                               type=['csv', 'parquet']) or factor_functions.DEFAULT_FACTOR_FILE
+if factor_file:
+    factors = factor_functions.load_factors(factor_file)
+    # a file with its own market factor replaces sp500 (which is then left out of the fitted stocks);
+    # its RF column is used unless a rate is set above
+    own_market = 'Mkt-RF' in factors.columns
+    with stage('factor_functions.factor_regression', rows=len(stocks_daily_return)):
+        factor_stats = factor_functions.factor_regression(
+            stocks_daily_return, factors, None if own_market else 'sp500', rf / 252 if rf else None,
+            exclude=('sp500',) if own_market else ())
+    terms = [c for c in factor_stats.columns if c + '_t' in factor_stats.columns]
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.markdown('#### Loadings')
+        st.dataframe(factor_stats[terms + ['r2', 'resid_vol']].round(4), use_container_width=True)
+    with col2:
+        st.markdown('#### t-statistics')
+        st.dataframe(factor_stats[[c + '_t' for c in terms]].round(2), use_container_width=True)
+else:
+    st.caption("Upload factor returns (or set CAPM_FACTOR_FILE) to regress the stocks on the market plus those "
+               "factors. Kenneth French's daily factor CSVs can be used as downloaded.")
+
+# Portfolio analytics for the selected basket
+if len(stocks_list) > 1:
+    st.markdown('### Portfolio')
+    estimator = st.selectbox("Covariance estimator", ("Sample", "Ledoit-Wolf", "Single-index (CAPM)"))
+    method = {"Sample": 'sample', "Ledoit-Wolf": 'ledoit-wolf', "Single-index (CAPM)": 'single-index'}[estimator]
+    weights, portfolio_stats, corr = portfolio_functions.analyze(stocks_daily_return, method, rf)
+
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.markdown('#### Weights')
+        st.dataframe(weights.round(4), use_container_width=True)
+        st.markdown('#### Portfolio statistics (annualized, %)')
+        st.dataframe(portfolio_stats.round(3), use_container_width=True)
+    with col2:
+        st.markdown('#### Correlation')
+        fig = px.imshow(corr, zmin=-1, zmax=1, color_continuous_scale='RdBu_r', text_auto='.2f')
+        fig.update_layout(margin=dict(l=20, r=20, t=20, b=20))
+        st.plotly_chart(fig, use_container_width=True)
+
+# Monte Carlo scenarios for the basket (plus an equal-weight portfolio when more than one stock)
+st.markdown('### Simulated Returns')
+col1, col2, col3 = st.columns([1, 1, 1])
+with col1:
+    horizon = st.number_input("Horizon (trading days)", 1, 252, 21)
+with col2:
+    n_paths = st.selectbox("Paths", (5000, 20000, 100000), index=1)
+with col3:
+    sim_method = st.selectbox("Scenario model", ("Bootstrap (historical days)", "Normal (single-index)"))
+n_stocks = len(stocks_daily_return.columns) - 2
+sims = simulation_functions.simulate_capm(
+    stocks_daily_return, int(horizon), int(n_paths), 'bootstrap' if sim_method.startswith("Bootstrap") else 'normal',
+    weights=[1 / n_stocks] * n_stocks if n_stocks > 1 else None)
+
+col1, col2 = st.columns([1, 1])
+with col1:
+    st.markdown(f'#### Value at Risk over {int(horizon)} days (%)')
+    st.dataframe(simulation_functions.var_cvar(sims).round(3), use_container_width=True)
+with col2:
+    fig = px.histogram(sims.melt(var_name='Stocks', value_name='Return (%)'), x='Return (%)', color='Stocks',
+                       barmode='overlay', nbins=100, opacity=0.5)
+    fig.update_layout(margin=dict(l=20, r=20, t=20, b=20))
+    st.plotly_chart(fig, use_container_width=True)
+
+end_page(run)
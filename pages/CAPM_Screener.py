@@ -0,0 +1,57 @@
+import streamlit as st
+from pages.utils.screener import screen
+from pages.utils.ticker_universe import get_universe
+from pages.utils.price_store import default_store
+from pages.utils.instrumentation import begin_page, end_page
+
+# Streamlit UI setup
+st.set_page_config(page_title="CAPM Screener", page_icon="mag", layout='wide')
+st.title("CAPM Screener")
+run = begin_page("CAPM Screener")
+st.write("Rank every listed stock by beta, alpha and CAPM expected return against the S&P 500.")
+
+universe = get_universe()
+# the memory-mapped price store, when one has been built (python -m pages.utils.price_store), is
+# shared by every session and replaces the per-symbol downloads
+store = default_store()
+
+# UI Inputs
+col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+with col1:
+    year = st.number_input("Number of years", 1, 10, 3)
+with col2:
+    rf = st.number_input("Risk-free rate (% per year)", 0.0, 20.0, 0.0, step=0.25)
+with col3:
+    min_history = st.number_input("Minimum history (days)", 20, 2520, 252)
+with col4:
+    min_r2 = st.slider("Minimum R²", 0.0, 1.0, 0.0, 0.05)
+
+if st.button(f"Screen {len(universe)} stocks"):
+    bar = st.progress(0.0, text="Screening...")
+    table, report = screen(universe.symbols, year, rf, min_history=0, min_r2=0.0, store=store,
+                           progress=lambda done, total: bar.progress(done / total, text=f"{done}/{total} stocks"))
+    bar.empty()
+    st.session_state.screener_table = table
+    st.session_state.screener_report = report
+
+if store is not None:
+    st.caption(f"Prices from the price store: {len(store)} symbols up to {str(store.dates[-1])[:10]}")
+
+if "screener_table" not in st.session_state:
+    st.info("Press the button to screen the whole universe. Cached prices make repeat runs fast.")
+    st.stop()
+
+# filters are applied to the stored result, so changing them doesn't rescreen
+table = st.session_state.screener_table
+table = table[(table['History (days)'] >= min_history) & (table['R²'] >= min_r2)]
+report = st.session_state.screener_report
+
+st.markdown(f'### {len(table)} stocks')
+st.dataframe(table.round(4), use_container_width=True, hide_index=True)
+
+failed = report[report['Error'].notna()] if len(report) else report
+if len(failed):
+    with st.expander(f"{len(failed)} stocks could not be downloaded"):
+        st.dataframe(failed, use_container_width=True, hide_index=True)
+
+end_page(run)
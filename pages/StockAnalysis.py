@@ -1,35 +1,41 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import datetime
 from pages.utils.plotly_figure import plotly_table, close_chart, RSI, MACD, Moving_average, candlestick
+from pages.utils.data_cache import default_cache, ticker_client
+from pages.utils.ticker_universe import get_universe
+from pages.utils.live_quotes import acquire_feed, release_feed, DEFAULT_INTERVAL
+from pages.utils.instrumentation import begin_page, end_page, stage
 
 st.set_page_config(page_title="Stock Analysis", page_icon="📈", layout='wide')
 st.title("Stock Analysis")
+run = begin_page("Stock Analysis")
 
-# --- Load tickers ---
-with open("tickers.txt", "r") as f:
-    valid_tickers = set([line.strip().upper() for line in f])
+# --- Load tickers (sorted, cached for the whole process) ---
+universe = get_universe()
 
 col1, col2, col3 = st.columns(3)
 today = datetime.date.today()
 
 with col1:
-    ticker = st.selectbox("Choose stock ticker:", options=valid_tickers, index=0)
+    query = st.text_input("Search ticker:", "AAPL")
+    matches = universe.search(query) or [query.strip().upper()]
+    ticker = st.selectbox("Choose stock ticker:", options=matches, index=0)
 with col2:
     start_date = st.date_input("Choose Start Date", datetime.date(today.year - 1, today.month, today.day))
 with col3:
     end_date = st.date_input("Choose End Date", today)
 
 st.subheader(ticker)
-stock = yf.Ticker(ticker)
+stock = ticker_client(ticker)
 
 # --- Fetch company info safely ---
 company_info = {}
-try:
-    company_info = stock.get_info()
-except Exception:
-    st.warning("⚠️ Could not fetch detailed company info (rate limit). Limited data will be shown.")
+with stage('yfinance.get_info', symbol=ticker):
+    try:
+        company_info = stock.get_info() or {}
+    except Exception:
+        st.warning("⚠️ Could not fetch detailed company info (rate limit). Limited data will be shown.")
 
 # --- Always fetch fast info (more reliable) ---
 fast_info = stock.fast_info
@@ -68,8 +74,12 @@ with col2:
     ]
     st.plotly_chart(plotly_table(df), use_container_width=True)
 
-# --- Download stock data ---
-data = yf.download(ticker, start=start_date, end=end_date)
+# --- Download stock data (served from the local price cache when possible) ---
+cache = default_cache()
+try:
+    data = cache.get(ticker, 'yahoo', start_date, end_date)[['Open', 'High', 'Low', 'Close', 'Volume']]
+except Exception:
+    data = pd.DataFrame()
 
 col1, col2, col3 = st.columns(3)
 if len(data) > 1:
@@ -96,8 +106,7 @@ with col2:
 
 # --- Preload history safely ---
 try:
-    ticker_ = yf.Ticker(ticker)
-    data1 = ticker_.history(period='max')
+    data1 = cache.get(ticker, 'yahoo')
 except Exception:
     st.error("⚠️ Failed to fetch stock history. Try again later.")
     st.stop()
@@ -121,3 +130,52 @@ if chart_type == 'Line' and indicators == 'Moving Average':
 if chart_type == 'Line' and indicators == 'MACD':
     st.plotly_chart(close_chart(data1, '1y'), use_container_width=True)
     st.plotly_chart(MACD(data1, '1y'), use_container_width=True)
+
+# --- Live mode: a background feed appends quotes to the cached history; only this panel reruns ---
+# the feed is shared with other sessions on the same symbol; it stops itself once nobody reads it
+# (after a closed tab or leaving this page), and is acquired again when that happened
+live = st.toggle("Live mode", value=False)
+feed = st.session_state.get("live_feed")
+if feed is not None and (not live or feed.symbol != ticker or not feed.running):
+    release_feed(feed)
+    st.session_state.pop("live_feed")
+    st.session_state.pop("live_figures", None)
+    feed = None
+if live and feed is None:
+    feed = acquire_feed(ticker, data1, cache=cache)
+    st.session_state["live_feed"] = feed
+
+live_indicator = {'RSI': 'rsi', 'Moving Average': 'sma', 'MACD': 'macd'}[indicators]
+
+@st.fragment(run_every=DEFAULT_INTERVAL)
+def live_panel():
+    feed = st.session_state.get("live_feed")
+    if feed is None:
+        return
+    snapshot = feed.snapshot()
+    bars = snapshot['bars']
+    st.metric("Live Price", str(round(bars['Close'].iloc[-1], 2)),
+              str(round(bars['Close'].iloc[-1] - bars['Close'].iloc[-2], 2)) if len(bars) > 1 else None)
+    st.caption(f"{snapshot['polls']} polls · {snapshot['errors']} errors"
+               + (f" · last error: {snapshot['last_error']}" if snapshot['last_error'] else ""))
+    # figures are rebuilt only when the feed bumped the version of what they show
+    figures = st.session_state.setdefault("live_figures", {})
+    charts = {
+        'bars': (lambda: close_chart(bars, False)) if live_indicator != 'sma' else None,
+        'rsi': lambda: RSI(bars, False, values=snapshot['indicators']['rsi']),
+        'sma': lambda: Moving_average(bars, False, values=snapshot['indicators']['sma']),
+        'macd': lambda: MACD(bars, False, values=snapshot['indicators']['macd']),
+    }
+    for name in ('bars', live_indicator):
+        if charts[name] is None:
+            continue
+        key = (name, snapshot['versions'][name])
+        if figures.get(name, (None,))[0] != key:
+            figures[name] = (key, charts[name]())
+        st.plotly_chart(figures[name][1], use_container_width=True, key=f"live_{name}")
+
+if live:
+    st.write("##### Live")
+    live_panel()
+
+end_page(run)
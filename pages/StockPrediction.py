@@ -1,35 +1,96 @@
 import streamlit as st
-from pages.utils.model_train import get_data, stationary_check, get_rolling_mean, get_differencing_order, fit_model, evaluate_model, scaling, get_forecast, inverse_scaling
-import yfinance as yf
+from pages.utils.model_train import get_data
+from pages.utils.forecast_queue import default_queue, QueueFull
 from pages.utils.plotly_figure import plotly_table,Moving_average_forecast
+from pages.utils.instrumentation import begin_page, end_page
 import pandas as pd
+import time
 
 st.set_page_config(page_title="Stock Prediction", page_icon=":chart_with_downwards_trend:", layout="wide")
 
 st.title("Stock Prediction")
+run = begin_page("Stock Prediction")
 col1,col2,col3 = st.columns(3)
 with col1:
-    ticker = st.text_input("Enter Stock Ticker", "AAPL").upper()
-    
-rmse=0
-st.subheader('Predicting next 30 days stock price for:'+ticker)
-
-close_price = get_data(ticker)
-rolling_price = get_rolling_mean(close_price)
-differencing_order = get_differencing_order(rolling_price)
-scaled_data, scaler = scaling(rolling_price)
-rmse = evaluate_model(scaled_data, differencing_order)
-
-st.write(f"Root Mean Square Error (RMSE): {rmse}")
-
-forecast = get_forecast(scaled_data, differencing_order)
-
-forecast['Close'] = inverse_scaling(scaler, forecast['Close'])
-st.write('##### Forecasted Stock Prices for the Next 30 Days')
-fig_tail = plotly_table(forecast.sort_index(ascending=True).round(3))
-fig_tail.update_layout(height=220)
-st.plotly_chart(fig_tail, use_container_width=True)
-rolling_price['Close'] = inverse_scaling(scaler, rolling_price['Close'])
-forecast = pd.concat([rolling_price, forecast])
-
-st.plotly_chart(Moving_average_forecast(forecast.iloc[150:]), use_container_width=True)
\ No newline at end of file
+    tickers = st.text_input("Enter Stock Tickers (comma separated)", "AAPL").upper()
+with col2:
+    order_mode = st.selectbox("Model order", ("Auto (AIC search)", "Fixed ARIMA(30, d, 30)"))
+
+symbols = list(dict.fromkeys(t.strip() for t in tickers.split(',') if t.strip()))
+
+# Every forecast runs as a background job on the forecast queue's process pool, so this script
+# thread never blocks on a fit; reruns and other sessions asking for the same ticker and prices
+# join the job that is already there
+queue = default_queue()
+jobs = {}
+for symbol in symbols:
+    try:
+        jobs[symbol] = queue.submit(symbol, get_data(symbol), 'auto' if order_mode.startswith("Auto") else 'fixed')
+    except QueueFull as e:
+        st.warning(f"{symbol}: the forecast queue is full ({e}), try again shortly")
+    except Exception as e:
+        st.error(f"{symbol}: could not load prices ({type(e).__name__}: {e})")
+
+def seconds(value):
+    return "-" if pd.isna(value) else f"{value:.2f}s"
+
+def show_forecast(symbol, job):
+    st.subheader('Predicting next 30 days stock price for:'+symbol)
+    if job.state == 'queued':
+        st.info(f"Queued (position {queue.position(job)}) for {job.wait_seconds:.0f}s")
+        return
+    if job.state == 'running':
+        st.info(f"Fitting for {time.time() - job.started_at:.0f}s")
+        return
+    if job.state == 'failed':
+        st.error(f"Forecast failed: {job.error}")
+        return
+    result = job.result
+    st.write(f"Root Mean Square Error (RMSE): {result['rmse']}")
+
+    p, d, q = result['order']
+    model_info = (f"Model: ARIMA({p}, {d}, {q}) · fit time {result['fit_seconds']:.2f}s"
+                  f" · queue wait {job.wait_seconds:.2f}s")
+    search = result['search']
+    if search is not None:
+        model_info += (f" · order search {search['search_seconds']}s over {search['candidates']} candidates"
+                       f" ({search['stopped']}, {search['criterion'].upper()} {search['score']:.1f})")
+    st.caption(model_info)
+
+    st.write('##### Forecasted Stock Prices for the Next 30 Days')
+    fig_tail = plotly_table(result['forecast'].sort_index(ascending=True).round(3))
+    fig_tail.update_layout(height=220)
+    st.plotly_chart(fig_tail, use_container_width=True, key=f"forecast_table_{symbol}")
+    forecast = pd.concat([result['history'], result['forecast']])
+    st.plotly_chart(Moving_average_forecast(forecast.iloc[150:], result['bands']), use_container_width=True,
+                    key=f"forecast_chart_{symbol}")
+
+def show_queue():
+    metrics = queue.metrics()
+    with st.expander("Forecast queue"):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Workers", metrics['workers'])
+        col2.metric("Queued", f"{metrics['queued']}/{metrics['max_queue']}")
+        col3.metric("Running", metrics['running'])
+        col4.metric("Completed", metrics['completed'])
+        st.caption(f"queue wait p50 {seconds(metrics['wait_p50'])} p95 {seconds(metrics['wait_p95'])} · "
+                   f"fit time p50 {seconds(metrics['fit_p50'])} p95 {seconds(metrics['fit_p95'])} · "
+                   f"job p50 {seconds(metrics['run_p50'])} p95 {seconds(metrics['run_p95'])} · "
+                   f"{metrics['deduplicated']} joined a running or finished job · {metrics['failed']} failed · "
+                   f"{metrics['rejected']} turned away")
+
+# Results fill in as jobs finish: while any is outstanding this panel alone reruns every second,
+# and once all are in, one full rerun stops the polling
+pending = any(not job.done for job in jobs.values())
+
+@st.fragment(run_every=1.0 if pending else None)
+def forecasts():
+    for symbol, job in jobs.items():
+        show_forecast(symbol, job)
+    show_queue()
+    if pending and all(job.done for job in jobs.values()):
+        st.rerun()
+
+forecasts()
+
+end_page(run)
@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import time
+import platform
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Walk-forward backtest for the forecasting pipeline in model_train.
+# The rolling mean is taken once per series (it only looks back); everything fitted to data,
+# the differencing order and the scaler, is fitted per fold on its training slice alone, so no
+# fold sees its test window before it is scored. Every fold then fits ARIMA on its scaled
+# training data and scores the next `horizon` points in price units. Folds run in parallel and
+# the report is plain JSON so configurations can be compared on accuracy and wall-clock cost.
+
+
+#function to run the look-back-only preprocessing (the 7-day rolling mean) once for a close price frame
+def prepare(close_price):
+    from pages.utils.model_train import get_rolling_mean
+    rolling_price = get_rolling_mean(close_price)
+    return {'prices': np.asarray(rolling_price, dtype=np.float64).reshape(-1)}
+
+
+#function to lay out fold cut-offs: n_folds test windows of `horizon` points ending at the last bar
+#expanding folds train on everything before the cut-off, a fixed window trains on the last `window` points
+def make_folds(n, horizon=30, n_folds=8, step=None, min_train=120, window=None):
+    step = step or horizon
+    folds = []
+    for k in range(n_folds):
+        train_end = n - horizon - k * step
+        train_start = 0 if window is None else max(0, train_end - window)
+        if train_end - train_start < min_train:
+            break
+        folds.append((train_start, train_end, train_end + horizon))
+    return folds[::-1]
+
+
+#function to fit and score one fold; runs in a worker process. The differencing order and the scaler
+#come from the training slice only
+def run_fold(prices, order, fold, seed=0):
+    from statsmodels.tsa.arima.model import ARIMA
+    from pages.utils.model_train import get_differencing_order, scaling, inverse_scaling
+    np.random.seed(seed)
+    train_start, train_end, test_end = fold
+    train = prices[train_start:train_end]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        differencing_order = get_differencing_order(pd.DataFrame(train))
+        scaled, scaler = scaling(train)
+        started = time.perf_counter()
+        model_fit = ARIMA(scaled, order=(order[0], differencing_order, order[1])).fit()
+        predicted = np.asarray(model_fit.forecast(steps=test_end - train_end))
+    fit_seconds = time.perf_counter() - started
+    actual = prices[train_end:test_end]
+    predicted = inverse_scaling(scaler, predicted).reshape(-1)
+    errors = predicted - actual
+    return {
+        'train_start': int(train_start), 'train_end': int(train_end), 'test_end': int(test_end),
+        'differencing_order': int(differencing_order),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mae': float(np.mean(np.abs(errors))),
+        'mape': float(np.mean(np.abs(errors / actual)) * 100),
+        'fit_seconds': fit_seconds,
+    }
+
+
+#function to backtest one model configuration over walk-forward folds of close_price;
+#raises ValueError when the history is too short for a single fold
+def walk_forward(close_price, order=(30, 30), horizon=30, n_folds=8, step=None, min_train=120,
+                 window=None, max_workers=None, seed=0, prepared=None):
+    started = time.perf_counter()
+    prepared = prepared or prepare(close_price)
+    folds = make_folds(len(prepared['prices']), horizon, n_folds, step, min_train, window)
+    if not folds:
+        raise ValueError(f"not enough history: {len(prepared['prices'])} points, need at least "
+                         f"{min_train + horizon} for one fold")
+    args = (prepared['prices'], tuple(order))
+    if max_workers == 1 or len(folds) <= 1:
+        results = [run_fold(*args, fold, seed + i) for i, fold in enumerate(folds)]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            futures = [pool.submit(run_fold, *args, fold, seed + i) for i, fold in enumerate(folds)]
+            results = [f.result() for f in futures]
+
+    summary = {}
+    for metric in ('rmse', 'mae', 'mape', 'fit_seconds'):
+        values = np.array([r[metric] for r in results])
+        summary[metric] = {'mean': float(values.mean()), 'std': float(values.std())}
+    return {
+        'config': {'order': list(order), 'horizon': horizon, 'n_folds': len(folds), 'step': step or horizon,
+                   'min_train': min_train, 'window': window, 'seed': seed},
+        'summary': summary,
+        'folds': results,
+        'wall_seconds': time.perf_counter() - started,
+        'cpu_fit_seconds': float(sum(r['fit_seconds'] for r in results)),
+        'workers': 1 if max_workers == 1 else (max_workers or os.cpu_count()),
+        'python': platform.python_version(),
+    }
+
+
+#function to backtest several (p, q) orders on the same preprocessed series and write one JSON report
+def compare_orders(close_price, orders, path=None, **kwargs):
+    prepared = prepare(close_price)
+    report = {'runs': [walk_forward(close_price, order=o, prepared=prepared, **kwargs) for o in orders]}
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    # python -m pages.utils.backtest AAPL 30,30 2,2 --folds 8 --out backtest.json
+    import argparse
+    from pages.utils.model_train import get_data
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of ARIMA orders for one ticker")
+    parser.add_argument('ticker')
+    parser.add_argument('orders', nargs='+', help="p,q pairs, e.g. 30,30 2,2")
+    parser.add_argument('--folds', type=int, default=8)
+    parser.add_argument('--horizon', type=int, default=30)
+    parser.add_argument('--window', type=int, default=None, help="fixed training window (default expanding)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+    orders = [tuple(int(v) for v in o.split(',')) for o in args.orders]
+    try:
+        report = compare_orders(get_data(args.ticker.upper()), orders, args.out, horizon=args.horizon,
+                                n_folds=args.folds, window=args.window, max_workers=args.workers, seed=args.seed)
+    except ValueError as error:
+        print(f"{args.ticker.upper()}: {error}", file=sys.stderr)
+        sys.exit(1)
+    for run in report['runs']:
+        s = run['summary']
+        print(f"ARIMA{tuple(run['config']['order'])}: RMSE {s['rmse']['mean']:.3f} ± {s['rmse']['std']:.3f}, "
+              f"MAE {s['mae']['mean']:.3f}, MAPE {s['mape']['mean']:.2f}%, wall {run['wall_seconds']:.1f}s",
+              file=sys.stdout)
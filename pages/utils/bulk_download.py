@@ -0,0 +1,68 @@
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from pages.utils.data_cache import default_cache
+from pages.utils.instrumentation import timed, in_context
+
+# Concurrent bulk fetch for a list of symbols.
+# Symbols are pulled through the price cache on a bounded thread pool, retried with
+# exponential backoff (longer when the provider reports rate limiting), and assembled
+# into one wide Date x symbol price matrix with a single aligned construction.
+
+RATE_LIMIT_HINTS = ('rate limit', 'too many requests', '429')
+
+
+#function to tell a rate-limit error apart from other failures so it can back off harder
+def is_rate_limited(error):
+    text = f"{type(error).__name__} {error}".lower()
+    return 'ratelimit' in text or any(hint in text for hint in RATE_LIMIT_HINTS)
+
+
+#function to fetch one symbol with retry/backoff; returns (frame or None, report row)
+def _fetch_one(cache, symbol, source, start, end, retries, backoff):
+    began = time.perf_counter()
+    error = None
+    for attempt in range(1, retries + 1):
+        try:
+            frame = cache.get(symbol, source, start, end)
+            if len(frame) == 0:
+                raise ValueError("no data returned")
+            return frame, {'Symbol': symbol, 'Rows': len(frame), 'Attempts': attempt,
+                           'Seconds': time.perf_counter() - began, 'Error': None}
+        except KeyError as e:
+            error = e
+            break
+        except Exception as e:
+            error = e
+            if attempt == retries:
+                break
+            delay = backoff * 2 ** (attempt - 1) * (4 if is_rate_limited(e) else 1)
+            time.sleep(delay * (1 + random.random() / 2))
+    return None, {'Symbol': symbol, 'Rows': 0, 'Attempts': attempt,
+                  'Seconds': time.perf_counter() - began, 'Error': str(error) or type(error).__name__}
+
+
+#function to download many symbols at once and return (wide price frame with a Date column, per-symbol report)
+@timed()
+def fetch_many(symbols, source='yahoo', start=None, end=None, column='Close', max_workers=8,
+               retries=3, backoff=1.0, cache=None):
+    cache = cache or default_cache()
+    symbols = list(dict.fromkeys(symbols))
+    columns = {}
+    report = []
+    if symbols:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as pool:
+            futures = [pool.submit(in_context(_fetch_one), cache, s, source, start, end, retries, backoff) for s in symbols]
+            for symbol, future in zip(symbols, futures):
+                frame, row = future.result()
+                report.append(row)
+                if frame is not None:
+                    columns[symbol] = frame[column]
+    if columns:
+        # one aligned construction over the union of dates; lands in a single consolidated block
+        prices = pd.DataFrame(columns).sort_index()
+    else:
+        prices = pd.DataFrame(index=pd.DatetimeIndex([], name='Date'))
+    prices.index.name = 'Date'
+    return prices.reset_index(), pd.DataFrame(report, columns=['Symbol', 'Rows', 'Attempts', 'Seconds', 'Error'])
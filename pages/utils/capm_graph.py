@@ -0,0 +1,247 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import capm_functions
+from pages.utils.data_cache import default_cache
+from pages.utils.bulk_download import fetch_many
+from pages.utils.instrumentation import timed, annotate
+
+# Incremental computation graph for the CAPM page.
+# Every intermediate result is a node memoized by its inputs:
+#   market(start, end)                    the sp500 series
+#   prices(symbol, start, end)            one stock's Close prices (plus its download report row)
+#   table(symbols, start, end)            the merged price table, assembled from the two above
+#   returns(symbol, key)                  one column of daily returns
+#   regression(symbol, key, market, rf)   one row of CAPM statistics
+#   rolling(symbol, key, market, window)  one column of rolling beta
+# where key is a hash of the stock's price column together with the table's dates (market is the
+# same for sp500). Adding a stock to the selection fetches and regresses just that stock; removing
+# one only drops its column. Everything else is a lookup, unless the new stock changes the shared
+# dates or a refresh revises prices, in which case the keys change and the affected nodes are
+# recomputed. Nodes hold plain numpy columns (prices as a dates array plus values), so assembling a
+# table or a result frame is positional stacking rather than pandas aligning one Series per stock,
+# and what is handed out is always a new frame, so a caller changing it can't corrupt what is stored.
+
+FAILURE_TTL = 60.0
+
+
+class Memo:
+    # results of one node keyed by their inputs; least recently used dropped past max_entries
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[1] is not None and entry[1] < time.time()):
+                self._entries.pop(key, None)
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (value, None if ttl is None else time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    #function to look up many keys at once and compute the missing ones in a single compute(missing) call,
+    #which returns {key: value}; gives back (values for every key, number computed)
+    def get_many(self, keys, compute):
+        found = {key: self.get(key) for key in keys}
+        missing = [key for key, value in found.items() if value is None]
+        if missing:
+            computed = compute(missing)
+            for key, value in computed.items():
+                self.put(key, value)
+            found.update(computed)
+        return found, len(missing)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+#function to key every price column of a table: a hash of its values together with the Date column
+def column_keys(table):
+    axis = hashlib.sha1(pd.DatetimeIndex(table['Date']).as_unit('ns').asi8.tobytes())
+    # one conversion for the whole table, column-major so each column is a contiguous buffer
+    values = np.asfortranarray(table.iloc[:, 1:].to_numpy(dtype=np.float64))
+    keys = {}
+    for j, name in enumerate(table.columns[1:]):
+        digest = axis.copy()
+        digest.update(memoryview(values[:, j]))
+        keys[name] = digest.hexdigest()
+    return keys
+
+
+#function to find dates in a sorted axis: (positions, mask of the dates that are on it)
+def _lookup(axis, dates):
+    positions = np.searchsorted(axis, dates)
+    found = positions < len(axis)
+    found[found] = axis[positions[found]] == dates[found]
+    return positions, found
+
+
+#function to stack cached columns into a frame on the table's Date column
+def _frame(table, names, columns):
+    values = np.column_stack(columns) if columns else np.empty((len(table), 0))
+    frame = pd.DataFrame(values, index=table.index, columns=names)
+    frame.insert(0, 'Date', table['Date'].to_numpy())
+    return frame
+
+
+class CapmGraph:
+
+    def __init__(self, cache=None, max_entries=2048, ttl=None):
+        self.cache = cache
+        # prices expire with the price cache, so a refreshed bar reaches the page
+        ttl = ttl if ttl is not None else (cache or default_cache()).ttl
+        self.nodes = {name: Memo(max_entries, ttl if name in ('market', 'prices') else None)
+                      for name in ('market', 'prices', 'returns', 'regression', 'rolling')}
+        # the last few assembled returns frames, since the page and both regressions ask for the same one
+        self.frames = Memo(16)
+
+    @property
+    def stats(self):
+        return {name: dict(memo.stats) for name, memo in self.nodes.items()}
+
+    #function for the sp500 series over start..end (Date index)
+    @timed('graph.market')
+    def market(self, start, end):
+        key = (start, end)
+        series = self.nodes['market'].get(key)
+        annotate(cache='hit' if series is not None else 'miss')
+        if series is None:
+            series = (self.cache or default_cache()).get('sp500', 'fred', start, end)['sp500']
+            self.nodes['market'].put(key, series)
+        return series.copy(deep=False)
+
+    #function for the Close prices of each symbol, downloading only the ones not held (in one concurrent batch);
+    #returns ({symbol: (datetime64 dates, values) or None}, report rows); failed downloads are retried after FAILURE_TTL
+    @timed('graph.prices')
+    def prices(self, symbols, start, end):
+        memo = self.nodes['prices']
+        found = {symbol: memo.get((symbol, start, end)) for symbol in symbols}
+        missing = [symbol for symbol, entry in found.items() if entry is None]
+        if missing:
+            cache = self.cache or default_cache()
+            _, report = fetch_many(missing, 'yahoo', start, end, cache=cache)
+            for row in report.to_dict('records'):
+                symbol = row['Symbol']
+                # the download above left it in the price cache's memory, so this is a lookup
+                series = cache.get(symbol, 'yahoo', start, end)['Close'] if row['Error'] is None else None
+                if series is not None:
+                    series = (series.index.to_numpy(), series.to_numpy())
+                found[symbol] = (series, row)
+                memo.put((symbol, start, end), found[symbol], None if series is not None else FAILURE_TTL)
+        annotate(computed=len(missing), reused=len(symbols) - len(missing))
+        return {s: found[s][0] for s in symbols}, [found[s][1] for s in symbols]
+
+    #function for the CAPM page's price table: Date, one column per stock that downloaded, then sp500
+    #(the same frame as fetch_many + inner merge with sp500), and the download report
+    @timed('graph.table')
+    def table(self, symbols, start, end):
+        symbols = list(dict.fromkeys(symbols))
+        series, report = self.prices(symbols, start, end)
+        columns = {s: v for s, v in series.items() if v is not None}
+        report = pd.DataFrame(report, columns=['Symbol', 'Rows', 'Attempts', 'Seconds', 'Error'])
+        if not columns:
+            return pd.DataFrame(columns=['Date']), report
+        # union of the stocks' dates (what fetch_many's frame has), kept where sp500 has a value too
+        market = self.market(start, end)
+        market_dates = market.index.to_numpy()
+        dates = np.unique(np.concatenate([d for d, _ in columns.values()]))
+        dates = dates[_lookup(market_dates, dates)[1]]
+        values = np.full((len(dates), len(columns) + 1), np.nan)
+        for j, (d, v) in enumerate(columns.values()):
+            rows, keep = _lookup(dates, d)
+            values[rows[keep], j] = v[keep]
+        values[:, -1] = market.to_numpy()[_lookup(market_dates, dates)[0]]
+        table = pd.DataFrame(values, columns=list(columns) + [market.name])
+        table.insert(0, 'Date', pd.DatetimeIndex(dates))
+        return table, report
+
+    #function for the daily returns of a price table, one cached column per (symbol, key)
+    @timed('graph.returns')
+    def returns(self, table, keys=None):
+        keys = keys or column_keys(table)
+        names = list(table.columns[1:])
+        frame = self.frames.get(tuple(keys.items()))
+        if frame is not None:
+            annotate(computed=0, reused=len(names))
+            return frame.copy(deep=False)
+
+        def compute(missing):
+            block = capm_functions.daily_returns(table[['Date'] + [name for name, _ in missing]])
+            return {(name, key): block[name].to_numpy() for name, key in missing}
+
+        found, computed = self.nodes['returns'].get_many([(name, keys[name]) for name in names], compute)
+        annotate(computed=computed, reused=len(names) - computed)
+        frame = _frame(table, names, [found[(name, keys[name])] for name in names])
+        self.frames.put(tuple(keys.items()), frame)
+        return frame.copy(deep=False)
+
+    #function for batch_regression of every stock in the table on sp500, one cached row per (symbol, key, rf)
+    @timed('graph.regression')
+    def regression(self, table, rf=0, market='sp500'):
+        keys = column_keys(table)
+        stocks = [name for name in table.columns[1:] if name != market]
+        returns = self.returns(table, keys)
+        wanted = [(name, keys[name], keys[market], rf) for name in stocks]
+
+        def compute(missing):
+            stats = capm_functions.batch_regression(returns[['Date', market] + [key[0] for key in missing]],
+                                                    market, rf / 252)
+            return {key: {column: stats[column].to_numpy()[i] for column in stats.columns}
+                    for i, key in enumerate(missing)}
+
+        found, computed = self.nodes['regression'].get_many(wanted, compute)
+        annotate(computed=computed, reused=len(stocks) - computed)
+        if not stocks:
+            return capm_functions.batch_regression(returns[['Date', market]], market, rf / 252)
+        rows = [found[key] for key in wanted]
+        # numpy scalars keep each column's dtype (n_obs stays an integer)
+        return pd.DataFrame({column: np.array([row[column] for row in rows]) for column in rows[0]},
+                            index=pd.Index(stocks, name='Stocks'))
+
+    #function for rolling_beta of every stock in the table, one cached column per (symbol, key, window)
+    @timed('graph.rolling')
+    def rolling(self, table, window=None, market='sp500'):
+        keys = column_keys(table)
+        stocks = [name for name in table.columns[1:] if name != market]
+        returns = self.returns(table, keys)
+        wanted = [(name, keys[name], keys[market], window) for name in stocks]
+
+        def compute(missing):
+            block = capm_functions.rolling_beta(returns[['Date', market] + [key[0] for key in missing]], window,
+                                                market)
+            return {key: block[key[0]].to_numpy() for key in missing}
+
+        found, computed = self.nodes['rolling'].get_many(wanted, compute)
+        annotate(computed=computed, reused=len(stocks) - computed)
+        return _frame(table, stocks, [found[key] for key in wanted])
+
+
+_default_graph = None
+_lock = threading.Lock()
+
+#function to get the process-wide graph, so sessions looking at the same stocks share results
+def default_graph():
+    global _default_graph
+    with _lock:
+        if _default_graph is None:
+            _default_graph = CapmGraph()
+        return _default_graph
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+import pandas as pd
+from pages.utils.instrumentation import timed, annotate, tally
+
+# On-disk market data cache shared by all pages.
+# Every (source, symbol) pair is stored as one Parquet file of daily bars indexed by Date,
+# plus a small JSON sidecar recording what range it covers and when it was last refreshed.
+# Repeat requests are served from memory/disk; stale entries only fetch the bars after the
+# last stored one, and requests reaching further back only fetch the missing head.
+# Yahoo prices are split/dividend adjusted, so a split re-bases the whole history: a refresh
+# re-downloads a bar it already holds, and when that bar's close has moved the entry is fetched
+# again in full instead of appending new-basis bars to old-basis ones.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_DIR = os.environ.get("CAPM_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "prices"))
+DEFAULT_TTL = float(os.environ.get("CAPM_CACHE_TTL", 6 * 60 * 60))
+INFO_TTL = float(os.environ.get("CAPM_INFO_TTL", 60 * 60))
+# relative change in a re-downloaded close that means the history was re-adjusted
+REBASE_TOLERANCE = float(os.environ.get("CAPM_REBASE_TOLERANCE", 1e-3))
+
+
+#function to give every provider's output the same shape: tz-naive daily DatetimeIndex named Date, flat columns
+def _tidy(frame):
+    if frame is None or len(frame) == 0:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Date'))
+    frame = frame.copy()
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame.columns = [col[0] if isinstance(col, tuple) else col for col in frame.columns]
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    frame.index = index.normalize().rename('Date')
+    frame = frame[~frame.index.duplicated(keep='last')]
+    return frame.sort_index()
+
+
+#function to tell whether a refreshed tail re-prices a stored bar (a split or dividend re-adjusted the history)
+def _rebased(frame, tail, check, tolerance=REBASE_TOLERANCE):
+    column = 'Close' if 'Close' in frame.columns else frame.columns[0]
+    if check not in frame.index or check not in tail.index or column not in tail.columns:
+        return False
+    old, new = frame.at[check, column], tail.at[check, column]
+    if pd.isna(old) or pd.isna(new):
+        return False
+    return abs(new - old) > tolerance * max(abs(old), abs(new))
+
+
+class YahooProvider:
+    # daily OHLCV (+ dividends/splits) from yfinance, same data as Ticker.history
+    name = 'yahoo'
+
+    def fetch(self, symbol, start=None, end=None):
+        import yfinance as yf
+        if start is None:
+            frame = yf.Ticker(symbol).history(period='max', auto_adjust=True)
+        else:
+            end = end + timedelta(days=1) if end is not None else None
+            frame = yf.Ticker(symbol).history(start=start, end=end, auto_adjust=True)
+        return _tidy(frame)
+
+
+#function for a requests session whose connection pool is sized for concurrent fetches, so repeat
+#requests to the same host reuse open connections instead of a new TLS handshake each time
+def pooled_session(pool_size=16):
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class FredProvider:
+    # FRED series (e.g. sp500) through pandas_datareader; the value column is named after the series
+    name = 'fred'
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def fetch(self, symbol, start=None, end=None):
+        import pandas_datareader.data as web
+        frame = web.DataReader(symbol, 'fred', start or date(1900, 1, 1), end or date.today(), session=self.session)
+        return _tidy(frame)
+
+
+class LocalProvider:
+    # stand-in that reads <directory>/<symbol>.csv (or .parquet) with a Date column; no network
+    name = 'local'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.calls = []
+
+    def fetch(self, symbol, start=None, end=None):
+        self.calls.append((symbol, start, end))
+        path = os.path.join(self.directory, symbol)
+        if os.path.exists(path + '.parquet'):
+            frame = pd.read_parquet(path + '.parquet')
+        elif os.path.exists(path + '.csv'):
+            frame = pd.read_csv(path + '.csv', parse_dates=['Date'])
+        else:
+            raise KeyError(f"no local data for {symbol!r} in {self.directory}")
+        if 'Date' in frame.columns:
+            frame = frame.set_index('Date')
+        frame = _tidy(frame)
+        return frame.loc[start:end]
+
+
+class PriceCache:
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, providers=None, ttl=DEFAULT_TTL, max_bytes=None, memory_entries=256):
+        self.root = root
+        # yfinance already shares one session per process; FRED requests share a pooled one
+        self.providers = providers if providers is not None else {'yahoo': YahooProvider(),
+                                                                   'fred': FredProvider(pooled_session())}
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'fetches': 0, 'rows_fetched': 0, 'bytes_fetched': 0}
+        self.memory_entries = memory_entries
+        # most recently used frames kept in memory; older ones are re-read from disk
+        self._memory = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, source, symbol):
+        name = symbol.replace(os.sep, '_').replace('/', '_')
+        folder = os.path.join(self.root, source)
+        return os.path.join(folder, name + '.parquet'), os.path.join(folder, name + '.json')
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load(self, source, symbol):
+        key = (source, symbol)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        data_path, meta_path = self._paths(source, symbol)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            frame = pd.read_parquet(data_path)
+        except (OSError, ValueError):
+            return None, None
+        self._remember(key, frame, meta)
+        return frame, meta
+
+    def _remember(self, key, frame, meta):
+        with self._lock:
+            self._memory[key] = (frame, meta)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, source, symbol, frame, meta):
+        data_path, meta_path = self._paths(source, symbol)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        # write to temp files and rename so a reader never sees half a file
+        frame.to_parquet(data_path + '.tmp')
+        os.replace(data_path + '.tmp', data_path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        self._remember((source, symbol), frame, meta)
+
+    def _fetch(self, provider, symbol, start, end):
+        frame = _tidy(provider.fetch(symbol, start, end))
+        size = int(frame.memory_usage(deep=True).sum())
+        self.stats['fetches'] += 1
+        self.stats['rows_fetched'] += len(frame)
+        self.stats['bytes_fetched'] += size
+        tally(bytes=size)
+        return frame
+
+    #function to return daily bars for symbol between start and end (inclusive); start=None means full history
+    @timed('cache.get')
+    def get(self, symbol, source='yahoo', start=None, end=None):
+        provider = self.providers[source]
+        start = pd.Timestamp(start).normalize() if start is not None else None
+        end = pd.Timestamp(end).normalize() if end is not None else None
+        today = pd.Timestamp(date.today())
+        annotate(symbol=symbol, source=source)
+
+        with self._key_lock((source, symbol)):
+            frame, meta = self._load(source, symbol)
+            now = time.time()
+            if frame is None:
+                self.stats['misses'] += 1
+                annotate(cache='miss')
+                frame = self._fetch(provider, symbol, start, None)
+                meta = {'start': None if start is None else str(start.date()), 'fetched_at': now}
+                changed = True
+            else:
+                changed = False
+                parts = [frame]
+                covered = None if meta['start'] is None else pd.Timestamp(meta['start'])
+                # missing head: the request reaches further back than what we hold
+                if covered is not None and (start is None or start < covered):
+                    parts.insert(0, self._fetch(provider, symbol, start, covered - pd.Timedelta(days=1)))
+                    meta['start'] = None if start is None else str(start.date())
+                    changed = True
+                # missing tail: refresh from the last stored bar once the entry is older than the ttl
+                last = frame.index[-1] if len(frame) else covered
+                wants_recent = end is None or last is None or end > last
+                if wants_recent and now - meta['fetched_at'] > self.ttl:
+                    # overlap a settled bar: the last one may be a live-mode bar, not the day's final close
+                    check = frame.index[-2] if len(frame) > 1 else last
+                    tail = self._fetch(provider, symbol, check, None)
+                    if check is not None and _rebased(frame, tail, check):
+                        covered = None if meta['start'] is None else pd.Timestamp(meta['start'])
+                        parts = [self._fetch(provider, symbol, covered, None)]
+                        annotate(rebased=True)
+                    else:
+                        parts.append(tail)
+                    meta['fetched_at'] = now
+                    changed = True
+                parts = [p for p in parts if len(p)]
+                if changed and parts:
+                    frame = _tidy(pd.concat(parts))
+                if not changed:
+                    self.stats['hits'] += 1
+                annotate(cache='refresh' if changed else 'hit')
+            if changed:
+                meta['rows'] = len(frame)
+                self._store(source, symbol, frame, meta)
+            meta['accessed_at'] = now
+
+        if changed and self.max_bytes is not None:
+            self.evict()
+        result = frame.loc[start:end if end is not None else today]
+        annotate(rows=len(result))
+        return result
+
+    #function to merge newer bars (e.g. from live mode) into a stored entry; rows for dates already held are replaced
+    def append(self, symbol, bars, source='yahoo'):
+        bars = _tidy(bars)
+        with self._key_lock((source, symbol)):
+            frame, meta = self._load(source, symbol)
+            if frame is None:
+                frame, meta = bars, {'start': None if not len(bars) else str(bars.index[0].date()),
+                                     'fetched_at': time.time()}
+            else:
+                frame = _tidy(pd.concat([frame, bars]))
+            meta['rows'] = len(frame)
+            self._store(source, symbol, frame, meta)
+        return frame
+
+    #function to drop entries not read for max_age seconds, then least recently used ones until under max_bytes
+    def evict(self, max_age=None, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = []
+        if not os.path.isdir(self.root):
+            return []
+        for source in os.listdir(self.root):
+            folder = os.path.join(self.root, source)
+            for name in os.listdir(folder):
+                if not name.endswith('.parquet'):
+                    continue
+                symbol = name[:-len('.parquet')]
+                data_path, meta_path = self._paths(source, symbol)
+                memory = self._memory.get((source, symbol))
+                accessed = memory[1].get('accessed_at', 0) if memory else os.path.getmtime(data_path)
+                size = os.path.getsize(data_path)
+                entries.append((accessed, size, source, symbol, data_path, meta_path))
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        now = time.time()
+        removed = []
+        for accessed, size, source, symbol, data_path, meta_path in entries:
+            too_old = max_age is not None and now - accessed > max_age
+            too_big = max_bytes is not None and total > max_bytes
+            if not (too_old or too_big):
+                continue
+            for path in (data_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._memory.pop((source, symbol), None)
+            total -= size
+            removed.append((source, symbol))
+        return removed
+
+
+_default_cache = None
+
+#function to get the process-wide cache; CAPM_LOCAL_DATA=<dir> serves every source from local files instead
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        local = os.environ.get("CAPM_LOCAL_DATA")
+        providers = None
+        if local:
+            providers = {'yahoo': LocalProvider(local), 'fred': LocalProvider(local)}
+        _default_cache = PriceCache(providers=providers)
+    return _default_cache
+
+
+_tickers = OrderedDict()
+_tickers_lock = threading.Lock()
+
+#function to get a process-wide yfinance Ticker for symbol; its company info and fast info are fetched
+#once and then shared by every session until the entry is ttl seconds old
+def ticker_client(symbol, ttl=INFO_TTL, max_entries=256):
+    import yfinance as yf
+    now = time.time()
+    with _tickers_lock:
+        entry = _tickers.get(symbol)
+        if entry is None or now - entry[1] > ttl:
+            entry = (yf.Ticker(symbol), now)
+            _tickers[symbol] = entry
+        _tickers.move_to_end(symbol)
+        while len(_tickers) > max_entries:
+            _tickers.popitem(last=False)
+    return entry[0]
@@ -0,0 +1,214 @@
+import os
+import time
+import threading
+import functools
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from pages.utils.model_cache import fingerprint
+from pages.utils.instrumentation import log
+
+# Background forecast jobs for the Stock Prediction page.
+# ARIMA fits run on a process pool, never on a Streamlit script thread. A small scheduler sits in
+# front of it: jobs wait in a bounded queue (CAPM_FORECAST_QUEUE) and are handed to the pool only
+# while fewer than CAPM_FORECAST_WORKERS are running, so the queue depth and each job's queue wait
+# are real numbers, and a full queue turns new requests away instead of piling up. A job is keyed
+# by ticker, the fingerprint of the prices it fits (the data version), order mode and bands, so
+# every session asking for the same forecast shares one job and its result. Finished jobs are
+# kept (least recently used dropped) for the next rerun; failed ones are retried after FAILURE_TTL.
+
+DEFAULT_WORKERS = int(os.environ.get("CAPM_FORECAST_WORKERS", min(4, os.cpu_count() or 1)))
+DEFAULT_QUEUE = int(os.environ.get("CAPM_FORECAST_QUEUE", 64))
+# fork is unsafe from a server thread, so workers are spawned fresh by default
+START_METHOD = os.environ.get("CAPM_FORECAST_START", "spawn")
+FAILURE_TTL = 60.0
+# finished jobs whose waits and fit times make up the metrics
+METRICS_WINDOW = 200
+
+
+class QueueFull(Exception):
+    pass
+
+
+#function run in a worker process: the whole prediction pipeline for one ticker's prices
+def run_forecast(symbol, close_price, order_mode, bands):
+    import warnings
+    from pages.utils.model_train import forecast_pipeline
+    # statsmodels switches its convergence warnings back on when it is imported, so load it first
+    import statsmodels.tsa.arima.model
+    started = time.time()
+    warnings.simplefilter('ignore')
+    result = forecast_pipeline(close_price, ticker=symbol, order_mode=order_mode, bands=bands)
+    result['started_at'] = started
+    result['worker'] = os.getpid()
+    return result
+
+
+class Job:
+
+    def __init__(self, key, symbol):
+        self.key = key
+        self.symbol = symbol
+        self.state = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    @property
+    def done(self):
+        return self.state in ('done', 'failed')
+
+    #function for the seconds spent waiting for a worker (so far, while still queued)
+    @property
+    def wait_seconds(self):
+        return (self.started_at or time.time()) - self.submitted_at
+
+
+class ForecastQueue:
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_queue=DEFAULT_QUEUE, max_finished=256,
+                 start_method=START_METHOD):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self.start_method = start_method
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self._jobs = OrderedDict()
+        self._pending = deque()
+        self._running = 0
+        self._finished = deque(maxlen=METRICS_WINDOW)
+        self._pool = None
+        # re-entrant: a future that is already done runs its callback inside submit()
+        self._lock = threading.RLock()
+
+    def _executor(self):
+        if self._pool is None:
+            context = multiprocessing.get_context(self.start_method) if self.start_method else None
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._pool
+
+    #function to queue a forecast of close_price (a Close frame) for symbol, or join the job already
+    #queued, running or finished for the same data; raises QueueFull when max_queue jobs are waiting
+    def submit(self, symbol, close_price, order_mode='auto', bands=True):
+        key = (symbol, fingerprint(close_price), order_mode, bands)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not (job.state == 'failed' and time.time() - job.finished_at > FAILURE_TTL):
+                self._jobs.move_to_end(key)
+                self.stats['deduplicated'] += 1
+                return job
+            if len(self._pending) >= self.max_queue:
+                self.stats['rejected'] += 1
+                raise QueueFull(f"{len(self._pending)} forecasts are already waiting")
+            job = Job(key, symbol)
+            self._jobs[key] = job
+            self._pending.append((job, close_price, order_mode, bands))
+            self.stats['submitted'] += 1
+            self._dispatch()
+            self._trim()
+        return job
+
+    #function to hand queued jobs to the pool while a worker is free (lock held)
+    def _dispatch(self):
+        while self._pending and self._running < self.max_workers:
+            job, close_price, order_mode, bands = self._pending.popleft()
+            job.state = 'running'
+            job.started_at = time.time()
+            self._running += 1
+            pool = self._executor()
+            try:
+                future = pool.submit(run_forecast, job.symbol, close_price, order_mode, bands)
+            except (BrokenProcessPool, RuntimeError) as error:
+                self._discard(pool)
+                self._finish(job, None, error)
+                continue
+            future.add_done_callback(functools.partial(self._done, job, pool))
+
+    #function to drop a broken pool (lock held); every future it still had fails with BrokenProcessPool, so
+    #only the first of their callbacks finds it current, and later ones leave the fresh pool alone
+    def _discard(self, pool):
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _done(self, job, pool, future):
+        try:
+            result, error = future.result(), None
+        except BaseException as e:
+            result, error = None, e
+        with self._lock:
+            if isinstance(error, BrokenProcessPool):
+                # a worker died (e.g. killed for memory); start a fresh pool for the jobs after this one
+                self._discard(pool)
+            self._finish(job, result, error)
+            self._dispatch()
+
+    #function to record a finished job (lock held)
+    def _finish(self, job, result, error):
+        self._running -= 1
+        job.finished_at = time.time()
+        if error is None:
+            # queue wait runs until the worker actually started on it
+            job.started_at = result.pop('started_at', job.started_at)
+            job.result = result
+            job.state = 'done'
+            self.stats['completed'] += 1
+            self._finished.append((job.wait_seconds, result['fit_seconds'], job.finished_at - job.started_at))
+        else:
+            job.error = f"{type(error).__name__}: {error}"
+            job.state = 'failed'
+            self.stats['failed'] += 1
+        log('forecast_job', symbol=job.symbol, state=job.state, wait=round(job.wait_seconds, 3),
+            seconds=round(job.finished_at - job.started_at, 3), error=job.error)
+
+    #function to drop the least recently used finished jobs beyond max_finished (lock held)
+    def _trim(self):
+        finished = [key for key, job in self._jobs.items() if job.done]
+        for key in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[key]
+
+    #function for a job's place in the queue (1 = next to start), or None once it has started
+    def position(self, job):
+        with self._lock:
+            for i, (queued, _, _, _) in enumerate(self._pending):
+                if queued is job:
+                    return i + 1
+        return None
+
+    #function for the queue's current load and percentiles (seconds) of the queue wait, the ARIMA fit
+    #time and the whole run in the worker (order search and bands included)
+    def metrics(self):
+        with self._lock:
+            finished = list(self._finished)
+            metrics = {'workers': self.max_workers, 'max_queue': self.max_queue, 'queued': len(self._pending),
+                       'running': self._running, **self.stats}
+        waits, fits, totals = (np.array(column) for column in zip(*finished)) if finished else ([], [], [])
+        for name, values in (('wait', waits), ('fit', fits), ('run', totals)):
+            p50, p95 = np.percentile(values, [50, 95]) if len(values) else (np.nan, np.nan)
+            metrics[f'{name}_p50'], metrics[f'{name}_p95'] = float(p50), float(p95)
+        return metrics
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            for job, _, _, _ in self._pending:
+                job.state, job.error, job.finished_at = 'failed', "queue shut down", time.time()
+            self._pending.clear()
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_queue = None
+_lock = threading.Lock()
+
+#function to get the process-wide forecast queue, shared by every session on this server
+def default_queue():
+    global _default_queue
+    with _lock:
+        if _default_queue is None:
+            _default_queue = ForecastQueue()
+        return _default_queue
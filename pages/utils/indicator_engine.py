@@ -0,0 +1,166 @@
+from collections import OrderedDict, deque
+import copy
+import math
+import threading
+import pandas as pd
+import indicator_functions
+from pages.utils.model_cache import fingerprint
+from pages.utils.instrumentation import timed, annotate
+from pages.utils.timeseries import period_position
+
+# Indicator engine for the Stock Analysis charts.
+# Each indicator is computed once per (symbol, indicator, params, period, data version) and
+# only over the displayed period plus enough warm-up bars for it to settle, instead of over the
+# whole period='max' history. Results are new frames (the caller's data is never mutated) kept
+# in a small LRU, so switching chart type or indicator reuses them. The batch values come from
+# the NumPy kernels in indicator_functions (same definitions as pandas_ta, without importing it).
+
+MAX_ENTRIES = 64
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+stats = {'hits': 0, 'misses': 0}
+
+
+def _rsi(close, length=14):
+    return pd.DataFrame({'RSI': indicator_functions.rsi(close, length)})
+
+
+def _sma(close, length=50):
+    return pd.DataFrame({f'SMA_{length}': indicator_functions.sma(close, length)})
+
+
+def _macd(close, fast=12, slow=26, signal=9):
+    macd, signal_line, hist = indicator_functions.macd(close, fast, slow, signal)
+    return pd.DataFrame({'MACD': macd, 'MACD Signal': signal_line, 'MACD Hist': hist})
+
+
+# name -> (function, bars of history needed before the first displayed bar)
+INDICATORS = {
+    'rsi': (_rsi, lambda length=14: 10 * length),
+    'sma': (_sma, lambda length=50: length),
+    'macd': (_macd, lambda fast=12, slow=26, signal=9: 10 * (slow + signal)),
+}
+
+
+#function to return indicator columns for the rows of dataframe shown in num_period
+@timed()
+def compute(dataframe, name, num_period, symbol=None, **params):
+    function, warmup = INDICATORS[name]
+    close = dataframe['Close']
+    key = (symbol, name, tuple(sorted(params.items())), num_period, len(close), fingerprint(close))
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            stats['hits'] += 1
+            annotate(cache='hit', indicator=name)
+            return _cache[key]
+    stats['misses'] += 1
+    annotate(cache='miss', indicator=name)
+
+    first_shown = period_position(close.index, num_period)
+    begin = max(0, first_shown - warmup(**params))
+    result = function(close.iloc[begin:], **params).iloc[first_shown - begin:]
+
+    with _lock:
+        _cache[key] = result
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return result
+
+
+# Streaming versions of the same indicators for live mode: each keeps just enough state to turn
+# one more close into the next value in O(1), matching the indicator_functions definitions used above
+# (Wilder RSI as an adjusted EWM, SMA-seeded EMAs for MACD).
+
+class SMAState:
+
+    def __init__(self, length=50):
+        self.length = length
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, close):
+        self.window.append(close)
+        self.total += close
+        if len(self.window) > self.length:
+            self.total -= self.window.popleft()
+        return self.total / self.length if len(self.window) == self.length else math.nan
+
+
+class EMAState:
+
+    def __init__(self, length=10):
+        self.length = length
+        self.alpha = 2 / (length + 1)
+        self.count = 0
+        self.value = 0.0
+
+    def update(self, close):
+        self.count += 1
+        if self.count <= self.length:
+            # the EMA is seeded with the SMA of the first `length` values, as in pandas_ta
+            self.value += close / self.length
+            return self.value if self.count == self.length else math.nan
+        self.value = self.alpha * close + (1 - self.alpha) * self.value
+        return self.value
+
+
+class RSIState:
+
+    def __init__(self, length=14):
+        self.length = length
+        self.decay = 1 - 1 / length
+        self.previous = None
+        self.count = 0
+        # numerators of the adjusted EWMs of gains and losses (their shared denominator cancels)
+        self.gain = self.loss = 0.0
+
+    def update(self, close):
+        previous, self.previous = self.previous, close
+        if previous is None:
+            return math.nan
+        change = close - previous
+        self.count += 1
+        self.gain = max(change, 0.0) + self.decay * self.gain
+        self.loss = max(-change, 0.0) + self.decay * self.loss
+        if self.count < self.length or self.gain + self.loss == 0:
+            return math.nan
+        return 100 * self.gain / (self.gain + self.loss)
+
+
+class MACDState:
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = EMAState(fast), EMAState(slow), EMAState(signal)
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        if math.isnan(macd):
+            return (math.nan, math.nan, math.nan)
+        signal = self.signal.update(macd)
+        return (macd, signal, macd - signal)
+
+
+# name -> (state class, output columns for the given params); outputs match compute()
+STATES = {
+    'rsi': (RSIState, lambda length=14: ['RSI']),
+    'sma': (SMAState, lambda length=50: [f'SMA_{length}']),
+    'macd': (MACDState, lambda fast=12, slow=26, signal=9: ['MACD', 'MACD Signal', 'MACD Hist']),
+}
+
+
+#function to build a streaming state for an indicator; returns (state, output column names)
+def new_state(name, **params):
+    cls, columns = STATES[name]
+    return cls(**params), columns(**params)
+
+
+#function to feed closes through a state, returning the value after each one
+def replay(state, closes):
+    return [state.update(float(c)) for c in closes]
+
+
+#function to evaluate a tentative close for the still-open bar without committing it to the state
+def peek(state, close):
+    return copy.deepcopy(state).update(close)
@@ -0,0 +1,242 @@
+import os
+import io
+import json
+import time
+import uuid
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Per-stage timing for page reruns.
+# Code marks its stages with the `stage` context manager or the `timed` decorator. Stages are only
+# recorded inside a page rerun started with `begin_page`: each finished one is collected for that
+# run, so `end_page` can show the breakdown in an opt-in panel, and written to the log
+# (.cache/app.log, or CAPM_LOG_FILE) as one JSON line (wall time, rows, cache hit/miss, bytes
+# fetched). Outside a run (the API, batch jobs, scripts) they cost one context lookup and write
+# nothing. The current run and the innermost open stage live in context variables, so concurrent
+# sessions (one script thread each) don't mix, and worker threads that are handed a copy of the
+# context report into the same run.
+# Profiling: CAPM_PROFILE=cprofile|pyinstrument (or the sidebar checkbox) wraps every rerun in
+# that profiler and saves the capture under CAPM_PROFILE_DIR.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LOG_PATH = os.environ.get("CAPM_LOG_FILE", os.path.join(BASE_DIR, ".cache", "app.log"))
+ENABLED = os.environ.get("CAPM_INSTRUMENT", "1") != "0"
+PROFILE_MODE = os.environ.get("CAPM_PROFILE", "")
+PROFILE_DIR = os.environ.get("CAPM_PROFILE_DIR", os.path.join(BASE_DIR, ".cache", "profiles"))
+SHOW_PANEL = os.environ.get("CAPM_TIMINGS", "0") == "1"
+
+_current_run = contextvars.ContextVar('capm_run', default=None)
+_open_stage = contextvars.ContextVar('capm_stage', default=None)
+_logger = None
+
+
+#function to get the JSON-lines logger writing to LOG_PATH (configured on first use)
+def get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger('capm')
+        if not logger.handlers:
+            os.makedirs(os.path.dirname(os.path.abspath(LOG_PATH)), exist_ok=True)
+            handler = logging.FileHandler(LOG_PATH, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(os.environ.get("CAPM_LOG_LEVEL", "INFO"))
+            logger.propagate = False
+        _logger = logger
+    return _logger
+
+
+def log(event, **fields):
+    if ENABLED:
+        get_logger().info(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, default=str))
+
+
+class Run:
+
+    def __init__(self, page):
+        self.id = uuid.uuid4().hex[:12]
+        self.page = page
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.stages = []
+        self.profiler = None
+        self.profile_path = None
+        self.profile_text = None
+
+    #function to summarise the stages per name: calls, wall time, rows, cache hits/misses, bytes
+    def table(self):
+        import pandas as pd
+        columns = ['Stage', 'Calls', 'Seconds', 'Max', 'Rows', 'Hits', 'Misses', 'Bytes', 'Start']
+        if not self.stages:
+            return pd.DataFrame(columns=columns)
+        frame = pd.DataFrame(self.stages)
+        for column in ('rows', 'bytes'):
+            if column not in frame:
+                frame[column] = 0
+        cache = frame['cache'] if 'cache' in frame else pd.Series(None, index=frame.index)
+        frame['hit'] = (cache == 'hit').astype(int)
+        frame['miss'] = cache.isin(['miss', 'refresh']).astype(int)
+        table = frame.groupby('stage', sort=False).agg(
+            Calls=('seconds', 'size'), Seconds=('seconds', 'sum'), Max=('seconds', 'max'),
+            Rows=('rows', 'sum'), Hits=('hit', 'sum'), Misses=('miss', 'sum'), Bytes=('bytes', 'sum'),
+            Start=('start', 'min'), Depth=('depth', 'min'))
+        table = table.sort_values('Start').reset_index()
+        table['Stage'] = ['  ' * int(d) + s for d, s in zip(table['Depth'], table['stage'])]
+        return table[columns]
+
+
+#function to time a block as a named stage of the current run; the yielded dict takes extra fields
+#(rows, cache, bytes, ...); without a run nothing is recorded
+@contextmanager
+def stage(name, **fields):
+    run = _current_run.get()
+    if not ENABLED or run is None:
+        yield {}
+        return
+    parent = _open_stage.get()
+    started = time.perf_counter()
+    record = {'stage': name, 'depth': 0 if parent is None else parent['depth'] + 1,
+              'start': started - run.started, **fields}
+    token = _open_stage.set(record)
+    try:
+        yield record
+    except BaseException as error:
+        record['error'] = type(error).__name__
+        raise
+    finally:
+        record['seconds'] = time.perf_counter() - started
+        _open_stage.reset(token)
+        run.stages.append(record)
+        log('stage', run=run.id, page=run.page, **{k: v for k, v in record.items() if k not in ('depth', 'start')})
+
+
+#function to add fields (e.g. cache='hit', bytes=...) to the innermost open stage, if any
+def annotate(**fields):
+    record = _open_stage.get()
+    if record is not None:
+        record.update(fields)
+
+
+#function to add to numeric fields (e.g. bytes=...) of the innermost open stage, if any
+def tally(**fields):
+    record = _open_stage.get()
+    if record is not None:
+        for key, value in fields.items():
+            record[key] = record.get(key, 0) + value
+
+
+def _rows(args):
+    if args and hasattr(args[0], '__len__') and not isinstance(args[0], (str, bytes, dict)):
+        return len(args[0])
+    return None
+
+
+#decorator to time every call of a function made during a page run as a stage named module.function;
+#rows = len(first argument)
+def timed(name=None):
+    def wrap(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not ENABLED or _current_run.get() is None:
+                return fn(*args, **kwargs)
+            rows = _rows(args)
+            with stage(label, **({'rows': rows} if rows is not None else {})):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+#function to run fn in a worker thread with a copy of the caller's context, so its stages join the caller's run
+def in_context(fn):
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def _start_profile(run, mode):
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            run.profiler = ('pyinstrument', profiler)
+            return
+        except ImportError:
+            log('profile', run=run.id, warning="pyinstrument is not installed; using cProfile")
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is already active in this thread
+        return
+    run.profiler = ('cprofile', profiler)
+
+
+def _stop_profile(run):
+    kind, profiler = run.profiler
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{run.page}-{time.strftime('%Y%m%d-%H%M%S')}-{run.id}".replace(' ', '_')
+    if kind == 'pyinstrument':
+        profiler.stop()
+        run.profile_path = os.path.join(PROFILE_DIR, name + '.html')
+        with open(run.profile_path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+        run.profile_text = profiler.output_text(unicode=False, color=False)
+    else:
+        import pstats
+        profiler.disable()
+        run.profile_path = os.path.join(PROFILE_DIR, name + '.prof')
+        profiler.dump_stats(run.profile_path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(30)
+        run.profile_text = text.getvalue()
+
+
+#function to start collecting stages for one rerun of a page (optionally under a profiler)
+def start_run(page, profile=None):
+    # a rerun cut short by st.stop never reached end_page; close it out first
+    finish_run()
+    run = Run(page)
+    _current_run.set(run)
+    mode = PROFILE_MODE if profile is None else profile
+    if mode and ENABLED:
+        _start_profile(run, mode)
+    return run
+
+
+#function to close the current run: stop the profiler and log a summary line
+def finish_run(run=None):
+    run = run or _current_run.get()
+    if run is None or run.seconds is not None:
+        return run
+    run.seconds = time.perf_counter() - run.started
+    if run.profiler is not None:
+        _stop_profile(run)
+    log('run', run=run.id, page=run.page, seconds=run.seconds, stages=len(run.stages), profile=run.profile_path)
+    return run
+
+
+#function for the top of a page: sidebar switches for the timings panel and profiling, then start the run
+def begin_page(page):
+    import streamlit as st
+    with st.sidebar:
+        st.checkbox("Show timings", value=SHOW_PANEL, key='show_timings')
+        profile = st.checkbox("Profile this rerun", value=bool(PROFILE_MODE), key='profile_rerun')
+    return start_run(page, (PROFILE_MODE or 'cprofile') if profile else '')
+
+
+#function for the bottom of a page: finish the run and, if switched on, show its stage breakdown
+def end_page(run=None):
+    import streamlit as st
+    run = finish_run(run)
+    if run is None or not st.session_state.get('show_timings', SHOW_PANEL):
+        return run
+    with st.expander(f"Timings: {run.seconds:.2f}s this rerun, {len(run.stages)} stages", expanded=True):
+        st.dataframe(run.table().round(4), use_container_width=True, hide_index=True)
+        if run.profile_text:
+            st.caption(f"Profile saved to {run.profile_path}")
+            st.code(run.profile_text)
+    return run
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+from collections import deque
+import pandas as pd
+from pages.utils import indicator_engine
+
+# Live quotes for the Stock Analysis page.
+# A LiveFeed polls a pluggable quote source on a background thread and folds the intraday bars
+# it returns into the daily bar for that date. Indicators advance through the streaming states
+# in indicator_engine: the still-open bar is evaluated on a copy of the committed state, and the
+# state only takes the bar in for good once the next day starts, so a poll costs O(1) however
+# long the history is. Finished days (and the open bar, on stop) are appended to the price cache.
+# Feeds are shared per symbol (acquire_feed / release_feed count the sessions using one), and a
+# feed that nobody has read for `idle` seconds stops itself, so a closed tab or a session that
+# left the page does not keep a polling thread alive.
+
+DEFAULT_INTERVAL = float(os.environ.get("CAPM_LIVE_INTERVAL", 5))
+# seconds without a snapshot after which a feed stops polling
+IDLE_TIMEOUT = float(os.environ.get("CAPM_LIVE_IDLE", 60))
+# daily bars kept for the live charts
+WINDOW = 250
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_INDICATORS = {'rsi': {}, 'sma': {'length': 50}, 'macd': {}}
+
+
+#function to give quote bars a sorted, tz-naive (exchange wall-clock) DatetimeIndex
+def _bars(frame):
+    if frame is None or len(frame) == 0:
+        return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+    if 'Date' in frame.columns:
+        frame = frame.set_index('Date')
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    frame = frame[BAR_COLUMNS].set_axis(index.rename('Date'))
+    return frame.sort_index()
+
+
+class YahooQuoteSource:
+    # today's intraday bars from yfinance; the newest bar is returned again while it is still forming
+
+    def __init__(self, interval='1m'):
+        self.interval = interval
+        self._last = {}
+
+    def poll(self, symbol):
+        import yfinance as yf
+        bars = _bars(yf.Ticker(symbol).history(period='1d', interval=self.interval))
+        last = self._last.get(symbol)
+        if last is not None:
+            bars = bars[bars.index >= last]
+        if len(bars):
+            self._last[symbol] = bars.index[-1]
+        return bars
+
+
+class ReplaySource:
+    # replays a .csv/.parquet of bars (Date + OHLCV, optionally Symbol), `batch` bars per poll; no network
+
+    def __init__(self, path, batch=1):
+        frame = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path, parse_dates=['Date'])
+        self.frame = frame
+        self.batch = batch
+        self._position = {}
+
+    def poll(self, symbol):
+        frame = self.frame
+        if 'Symbol' in frame.columns:
+            frame = frame[frame['Symbol'] == symbol]
+        position = self._position.get(symbol, 0)
+        self._position[symbol] = position + self.batch
+        return _bars(frame.iloc[position:position + self.batch])
+
+
+#function to pick the quote source: CAPM_LIVE_REPLAY=<file> replays bars from disk, otherwise Yahoo
+def default_source():
+    replay = os.environ.get("CAPM_LIVE_REPLAY")
+    return ReplaySource(replay) if replay else YahooQuoteSource()
+
+
+class LiveFeed:
+
+    def __init__(self, symbol, history, source=None, cache=None, indicators=None,
+                 interval=DEFAULT_INTERVAL, window=WINDOW, idle=IDLE_TIMEOUT):
+        self.symbol = symbol
+        self.source = source if source is not None else default_source()
+        self.cache = cache
+        self.indicators = indicators if indicators is not None else DEFAULT_INDICATORS
+        self.interval = interval
+        self.window = window
+        self.idle = idle
+        # sessions sharing the feed (see acquire_feed)
+        self.users = 0
+        self.read_at = time.time()
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+        self.updated_at = None
+        # bumped whenever the bar or an indicator's latest value changes, so the page redraws only those traces
+        self.versions = {name: 0 for name in ['bars', *self.indicators]}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = []
+        self._seed(_bars(history))
+
+    def _seed(self, history):
+        history = history.dropna(subset=['Close'])
+        rows = list(history.itertuples())
+        self._rows = deque(((r.Index, r.Open, r.High, r.Low, r.Close, r.Volume) for r in rows[-self.window - 1:-1]),
+                           maxlen=self.window)
+        self._open = (rows[-1].Index, rows[-1].Open, rows[-1].High, rows[-1].Low, rows[-1].Close, rows[-1].Volume)
+        # the stored bar for the open day, which live bars are merged on top of
+        self._base = self._open
+        # aggregate of the day's finished intraday bars (open, high, low, volume) and the bar still forming
+        self._done = self._forming = None
+        self._states, self._series, self._current, self._columns = {}, {}, {}, {}
+        closes = history['Close'].to_numpy()
+        for name, params in self.indicators.items():
+            state, columns = indicator_engine.new_state(name, **params)
+            warmup = indicator_engine.INDICATORS[name][1](**params)
+            values = indicator_engine.replay(state, closes[-(self.window + warmup + 1):-1])
+            self._states[name] = state
+            self._series[name] = deque(values[-self.window:], maxlen=self.window)
+            self._current[name] = indicator_engine.peek(state, float(self._open[4]))
+            self._columns[name] = columns
+
+    #function to close the open bar: the states take its close for good and a fresh day starts
+    def _roll(self, day):
+        for name, state in self._states.items():
+            self._series[name].append(state.update(float(self._open[4])))
+        self._rows.append(self._open)
+        self._pending.append(self._open)
+        self._open = self._base = (day, None, None, None, None, None)
+        self._done = self._forming = None
+
+    #function to fold one intraday bar into the open daily bar; a bar repeating the newest stamp replaces it
+    def _fold(self, stamp, row):
+        if self._forming is not None and stamp > self._forming[0]:
+            _, o, h, l, c, v = self._forming
+            done = self._done
+            self._done = (o, h, l, v) if done is None else (done[0], max(done[1], h), min(done[2], l), done[3] + v)
+        if self._forming is None or stamp >= self._forming[0]:
+            self._forming = (stamp, row['Open'], row['High'], row['Low'], row['Close'], row['Volume'])
+
+    #function to apply a batch of intraday bars and refresh the indicator values of the open bar
+    def _apply(self, bars):
+        received = 0
+        for stamp, row in bars.iterrows():
+            day = stamp.normalize()
+            if day < self._open[0]:
+                continue
+            if day > self._open[0]:
+                self._roll(day)
+            self._fold(stamp, row)
+            received += 1
+        if not received:
+            return 0
+        _, o, h, l, c, v = self._forming
+        if self._done is not None:
+            o, h, l, v = self._done[0], max(self._done[1], h), min(self._done[2], l), self._done[3] + v
+        day, base_open, base_high, base_low, _, base_volume = self._base
+        self._open = (day,
+                      o if base_open is None else base_open,
+                      h if base_high is None else max(base_high, h),
+                      l if base_low is None else min(base_low, l),
+                      c,
+                      v if base_volume is None else max(base_volume, v))
+        self.versions['bars'] += 1
+        for name, state in self._states.items():
+            value = indicator_engine.peek(state, float(c))
+            if value != self._current[name]:
+                self._current[name] = value
+                self.versions[name] += 1
+        self.updated_at = time.time()
+        return received
+
+    #function to persist finished days (and optionally the open bar) to the price cache
+    def _flush(self, include_open=False):
+        rows = self._pending + ([self._open] if include_open and self._open[4] is not None else [])
+        self._pending = []
+        if self.cache is not None and rows:
+            frame = pd.DataFrame(rows, columns=['Date'] + BAR_COLUMNS).set_index('Date')
+            self.cache.append(self.symbol, frame)
+
+    #function to poll the source once; returns the number of bars received
+    def step(self):
+        try:
+            bars = self.source.poll(self.symbol)
+        except Exception as error:
+            with self._lock:
+                self.errors += 1
+                self.last_error = str(error)
+            return 0
+        with self._lock:
+            self.polls += 1
+            received = self._apply(bars)
+            pending = bool(self._pending)
+        if pending:
+            self._flush()
+        return received
+
+    #function to poll until stopped or unread for idle seconds, then keep what was received
+    def _loop(self):
+        while not self._stop.is_set():
+            if self.idle and time.time() - self.read_at > self.idle:
+                self._stop.set()
+                break
+            self.step()
+            self._stop.wait(self.interval)
+        with self._lock:
+            self._flush(include_open=True)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self.read_at = time.time()
+            self._thread = threading.Thread(target=self._loop, name=f"live-{self.symbol}", daemon=True)
+            self._thread.start()
+        return self
+
+    #function to stop polling; the thread writes the open bar to the cache on its way out
+    def stop(self):
+        self._stop.set()
+        if self._thread is None:
+            with self._lock:
+                self._flush(include_open=True)
+        else:
+            self._thread.join(timeout=self.interval + 5)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    #function to copy out the current window: daily bars (Date index) and one frame per indicator
+    def snapshot(self):
+        with self._lock:
+            self.read_at = time.time()
+            rows = list(self._rows) + ([self._open] if self._open[4] is not None else [])
+            bars = pd.DataFrame(rows, columns=['Date'] + BAR_COLUMNS).set_index('Date')
+            indicators = {}
+            for name, columns in self._columns.items():
+                values = list(self._series[name])
+                if self._open[4] is not None:
+                    values.append(self._current[name])
+                values = [v if isinstance(v, tuple) else (v,) for v in values]
+                indicators[name] = pd.DataFrame(values, columns=columns, index=bars.index[-len(values):])
+            return {'bars': bars, 'indicators': indicators, 'versions': dict(self.versions),
+                    'polls': self.polls, 'errors': self.errors, 'last_error': self.last_error,
+                    'updated_at': self.updated_at}
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+#function to get the running feed for a symbol, started from this history if there is none, and count
+#one more session using it; every acquire_feed is paired with a release_feed
+def acquire_feed(symbol, history, cache=None, **kwargs):
+    with _feeds_lock:
+        feed = _feeds.get(symbol)
+        if feed is None or not feed.running:
+            feed = _feeds[symbol] = LiveFeed(symbol, history, cache=cache, **kwargs).start()
+        feed.users += 1
+        return feed
+
+
+#function to drop one session from a feed; the last one stops it
+def release_feed(feed):
+    with _feeds_lock:
+        feed.users = max(feed.users - 1, 0)
+        if feed.users:
+            return
+        if _feeds.get(feed.symbol) is feed:
+            del _feeds[feed.symbol]
+    feed.stop()
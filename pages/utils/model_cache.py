@@ -0,0 +1,89 @@
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# LRU cache of fitted models keyed by (ticker, data fingerprint, order).
+# Besides exact hits it hands out an earlier fit of the same ticker and order, preferring one
+# fitted on a prefix of the new series (the holdout fit from evaluate_model, or yesterday's
+# series before a new bar arrived), so the next fit can start from already fitted parameters.
+
+
+#function to hash a price series (array, Series or DataFrame) by its float64 bytes and shape
+def fingerprint(data):
+    values = np.ascontiguousarray(np.asarray(data, dtype=np.float64))
+    digest = hashlib.sha1(values.tobytes())
+    digest.update(str(values.shape).encode())
+    return digest.hexdigest()
+
+
+class ModelCache:
+
+    def __init__(self, max_entries=32, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.stats = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'warm_starts': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, name + '.pkl')
+
+    #function to return the cached fit for key, from memory or (if enabled) disk
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key][1]
+        if self.directory is not None and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), 'rb') as f:
+                    length, value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                self.stats['disk_hits'] += 1
+                self._remember(key, length, value)
+                return value
+        self.stats['misses'] += 1
+        return None
+
+    def _remember(self, key, length, value):
+        with self._lock:
+            self._entries[key] = (length, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    #function to store a fit; length is the number of observations it was fitted on
+    def put(self, key, length, value):
+        self._remember(key, length, value)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump((length, value), f)
+            os.replace(path + '.tmp', path)
+
+    #function to pick a fit to warm-start from: the longest cached fit for (ticker, order) whose
+    #data is a prefix of data, else the most recent fit for the same ticker and order
+    def warm_start(self, ticker, order, data):
+        with self._lock:
+            candidates = [(length, key, value) for key, (length, value) in self._entries.items()
+                          if key[0] == ticker and key[2:] == order]
+        for length, key, value in sorted(candidates, key=lambda c: -c[0]):
+            if length < len(data) and fingerprint(data[:length]) == key[1]:
+                self.stats['warm_starts'] += 1
+                return value
+        if ticker is not None and candidates:
+            self.stats['warm_starts'] += 1
+            return candidates[-1][2]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
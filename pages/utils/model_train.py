@@ -1,17 +1,62 @@
-import yfinance as yf
-from statsmodels.tsa.stattools import adfuller
-from sklearn.metrics import mean_squared_error, r2_score
-from statsmodels.tsa.arima.model import ARIMA
 import numpy as np
-from sklearn.preprocessing import StandardScaler
 from datetime import datetime, timedelta
 import pandas as pd
+import os
+import time
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pages.utils.data_cache import default_cache
+from pages.utils.model_cache import ModelCache, fingerprint
+from pages.utils.instrumentation import timed, annotate
+import simulation_functions
 
+# fitted ARIMA results shared across reruns; CAPM_MODEL_CACHE_DIR also pickles them to disk
+MODEL_CACHE = ModelCache(max_entries=int(os.environ.get('CAPM_MODEL_CACHE_SIZE', 32)),
+                         directory=os.environ.get('CAPM_MODEL_CACHE_DIR'))
+ARIMA_ORDER = (30, 30)
+FORECAST_STEPS = 30
+# differencing orders and selected (p, q) orders by data fingerprint, least recently used dropped past
+# ORDER_CACHE_SIZE, so a long-running server or batch run doesn't keep one per series it ever saw
+ORDER_CACHE_SIZE = int(os.environ.get('CAPM_ORDER_CACHE_SIZE', 1024))
+_differencing_orders = OrderedDict()
+_selected_orders = OrderedDict()
+_orders_lock = threading.Lock()
+# process pool shared by every order search, created on first use
+_search_pool = None
+_search_workers = None
+_pool_lock = threading.Lock()
+
+# candidate (p, q) grid for the automatic order search, smallest models first
+ORDER_GRID = [(p, q) for p in range(6) for q in range(6)]
+
+# statsmodels and sklearn take a couple of seconds to import, so they are only loaded on first
+# use (inside the functions below) and the page can draw its inputs before they are needed
+
+#function to look up key in one of the order caches above (None when it isn't there)
+def _cached_order(cache, key):
+    with _orders_lock:
+        if key not in cache:
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+
+def _remember_order(cache, key, value):
+    with _orders_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > ORDER_CACHE_SIZE:
+            cache.popitem(last=False)
+
+@timed()
 def get_data(ticker):
-    stock_data = yf.download(ticker, start='2024-01-01')
+    stock_data = default_cache().get(ticker, 'yahoo', start='2024-01-01')
     return stock_data[['Close']]
 
 def stationary_check(close_price):
+    from statsmodels.tsa.stattools import adfuller
     adf_test = adfuller(close_price)
     p_value = round(adf_test[1], 3)
     return p_value
@@ -20,7 +65,17 @@ def get_rolling_mean(close_price):
     rolling_price = close_price.rolling(window=7).mean().dropna()
     return rolling_price
 
+@timed()
 def get_differencing_order(close_price):
+    key = fingerprint(close_price)
+    d = _cached_order(_differencing_orders, key)
+    annotate(cache='hit' if d is not None else 'miss')
+    if d is None:
+        d = _search_differencing_order(close_price)
+        _remember_order(_differencing_orders, key, d)
+    return d
+
+def _search_differencing_order(close_price):
     p_value = stationary_check(close_price)
     d = 0
     while True:
@@ -32,35 +87,206 @@ def get_differencing_order(close_price):
             break
     return d
 
-def fit_model(data, differencing_order):
-    model = ARIMA(data, order=(30, differencing_order, 30))
-    model_fit = model.fit()
+# fit ARIMA(p, d, q) on data, reusing a cached fit for the same ticker/data/order and
+# otherwise warm-starting from the closest earlier fit of that ticker
+@timed()
+def fit_arima(data, differencing_order, order=ARIMA_ORDER, ticker=None):
+    full_order = (order[0], differencing_order, order[1])
+    key = (ticker, fingerprint(data)) + full_order
+    model_fit = MODEL_CACHE.get(key)
+    annotate(cache='hit' if model_fit is not None else 'miss', order=str(full_order))
+    if model_fit is not None:
+        return model_fit
+
+    from statsmodels.tsa.arima.model import ARIMA
+    previous = MODEL_CACHE.warm_start(ticker, full_order, data)
+    model = ARIMA(data, order=full_order)
+    if previous is not None:
+        annotate(warm_start=True)
+        model_fit = model.fit(start_params=previous.params)
+    else:
+        model_fit = model.fit()
+    MODEL_CACHE.put(key, len(data), model_fit)
+    return model_fit
 
-    forecast_steps = 30
-    forecast = model_fit.get_forecast(steps=forecast_steps)
+@timed()
+def fit_model(data, differencing_order, ticker=None, order=ARIMA_ORDER):
+    model_fit = fit_arima(data, differencing_order, order=order, ticker=ticker)
+
+    forecast = model_fit.get_forecast(steps=FORECAST_STEPS)
 
     predictions = forecast.predicted_mean
     return predictions
 
-def evaluate_model(original_price, differencing_order):
+# score one ARIMA(p, d, q) candidate by information criterion; runs in a worker process
+def _score_order(data, p, d, q, criterion):
+    from statsmodels.tsa.arima.model import ARIMA
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            model_fit = ARIMA(data, order=(p, d, q)).fit()
+            score = getattr(model_fit, criterion)
+        except Exception:
+            score = np.inf
+    return p, q, float(score) if np.isfinite(score) else np.inf, time.perf_counter() - started
+
+#function to get the shared order-search pool, replacing it when a different size is asked for or
+#after a worker died
+def _order_pool(max_workers, broken=None):
+    global _search_pool, _search_workers
+    with _pool_lock:
+        if broken is not None and broken is _search_pool:
+            _search_pool = None
+        if _search_pool is None or _search_workers != max_workers:
+            if _search_pool is not None:
+                # searches still using the old pool finish on it
+                _search_pool.shutdown(wait=False)
+            _search_pool = ProcessPoolExecutor(max_workers=max_workers)
+            _search_workers = max_workers
+        return _search_pool
+
+# search ORDER_GRID for the (p, q) with the lowest aic/bic across a process pool; stops early once
+# `patience` candidates in a row fail to improve, or when time_budget (seconds) runs out.
+# Results are counted in grid order whichever worker finishes first, so the same data always
+# picks the same order, and only one candidate per worker is in flight, which the search waits
+# for before it returns. max_workers=1 searches in-process, for callers already inside a worker pool
+@timed()
+def select_order(data, differencing_order, ticker=None, criterion='aic', grid=ORDER_GRID,
+                 time_budget=20.0, patience=8, max_workers=None):
+    key = (ticker, fingerprint(data), differencing_order, criterion, tuple(grid))
+    cached = _cached_order(_selected_orders, key)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    data = np.asarray(data, dtype=np.float64).reshape(-1)
+    search = {'best': None, 'score': np.inf, 'tried': 0, 'stale': 0, 'stopped': None}
+
+    def record(p, q, score):
+        search['tried'] += 1
+        if score < search['score']:
+            search.update(best=(p, q), score=score, stale=0)
+        else:
+            search['stale'] += 1
+        if search['stale'] >= patience:
+            search['stopped'] = 'early stop'
+
+    if max_workers == 1:
+        for p, q in grid:
+            if time.perf_counter() - started > time_budget:
+                search['stopped'] = 'time budget'
+            if search['stopped']:
+                break
+            record(*_score_order(data, p, differencing_order, q, criterion)[:3])
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        pool = _order_pool(workers)
+        grid = list(grid)
+        running, finished = {}, {}
+        submitted = counted = 0
+        try:
+            while counted < len(grid) and search['stopped'] is None:
+                while submitted < len(grid) and len(running) < workers:
+                    p, q = grid[submitted]
+                    running[pool.submit(_score_order, data, p, differencing_order, q, criterion)] = submitted
+                    submitted += 1
+                remaining = time_budget - (time.perf_counter() - started)
+                if remaining <= 0:
+                    search['stopped'] = 'time budget'
+                    break
+                done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[running.pop(future)] = future.result()
+                while counted in finished and search['stopped'] is None:
+                    record(*finished.pop(counted)[:3])
+                    counted += 1
+        except BrokenProcessPool:
+            _order_pool(workers, broken=pool)
+            raise
+        finally:
+            # no fit outlives the search
+            wait(running)
+
+    result = {
+        'order': search['best'] if search['best'] is not None else ARIMA_ORDER,
+        'criterion': criterion,
+        'score': search['score'],
+        'candidates': search['tried'],
+        'search_seconds': round(time.perf_counter() - started, 2),
+        'stopped': search['stopped'] or 'grid exhausted',
+    }
+    if search['best'] is not None:
+        _remember_order(_selected_orders, key, result)
+    return result
+
+@timed()
+def evaluate_model(original_price, differencing_order, ticker=None, order=ARIMA_ORDER):
     train_data, test_data = original_price[:-30], original_price[-30:]
-    predictions = fit_model(train_data, differencing_order)
-    rmse = np.sqrt(mean_squared_error(test_data, predictions))
+    predictions = fit_model(train_data, differencing_order, ticker=ticker, order=order)
+    errors = np.asarray(test_data, dtype=np.float64).reshape(-1) - np.asarray(predictions, dtype=np.float64).reshape(-1)
+    rmse = np.sqrt(np.mean(errors ** 2))
     return round(rmse, 2)
 
 def scaling(close_price):
+    from sklearn.preprocessing import StandardScaler
     scaler = StandardScaler()
     scaled_data = scaler.fit_transform(np.array(close_price).reshape(-1,1))
     return scaled_data, scaler
 
-def get_forecast(original_price, differencing_order):
-    predictions = fit_model(original_price, differencing_order)
+@timed()
+def get_forecast(original_price, differencing_order, ticker=None, order=ARIMA_ORDER):
+    predictions = fit_model(original_price, differencing_order, ticker=ticker, order=order)
     start_date = datetime.now().strftime('%Y-%m-%d')
     end_date = (datetime.now() + timedelta(days=29)).strftime('%Y-%m-%d')
     forecast_index = pd.date_range(start=start_date, end=end_date, freq='D')
     forecast_df = pd.DataFrame(predictions, index=forecast_index, columns=['Close'])
     return forecast_df
 
+# Monte Carlo percentile bands for the forecast, in the same (scaled) units as get_forecast;
+# bootstraps the model's residuals through its impulse responses unless method='normal'
+@timed()
+def get_forecast_bands(original_price, differencing_order, ticker=None, order=ARIMA_ORDER,
+                       n_paths=10000, method='bootstrap', seed=0, processes=None):
+    model_fit = fit_arima(original_price, differencing_order, order=order, ticker=ticker)
+    mean = np.asarray(model_fit.get_forecast(steps=FORECAST_STEPS).predicted_mean).reshape(-1)
+    psi = np.asarray(model_fit.impulse_responses(FORECAST_STEPS - 1)).reshape(-1)
+    # the first residuals soak up the diffuse initialisation of the differenced state
+    resid = np.asarray(model_fit.resid).reshape(-1)[differencing_order + order[0]:]
+    resid = resid - resid.mean()
+    sigma = float(np.sqrt(model_fit.params[-1]))
+    paths = simulation_functions.linear_paths(mean, psi, sigma=sigma,
+                                              residuals=resid if method == 'bootstrap' else None,
+                                              n_paths=n_paths, seed=seed, processes=processes)
+    return simulation_functions.percentile_bands(paths)
+
 def inverse_scaling(scaler,scaled_data):
     close_price = scaler.inverse_transform(np.array(scaled_data).reshape(-1,1))
     return close_price
+
+# the Stock Prediction pipeline for one Close series: rolling mean -> differencing order -> scaling ->
+# order (AIC search on the training split, or the fixed order) -> holdout RMSE -> 30-day forecast and
+# Monte Carlo bands, all in price units; search_workers=1 keeps the order search in-process
+@timed()
+def forecast_pipeline(close_price, ticker=None, order_mode='auto', bands=True, search_workers=1):
+    rolling_price = get_rolling_mean(close_price)
+    differencing_order = get_differencing_order(rolling_price)
+    scaled_data, scaler = scaling(rolling_price)
+    if order_mode == 'auto':
+        search = select_order(scaled_data[:-30], differencing_order, ticker=ticker, max_workers=search_workers)
+        order = search['order']
+    else:
+        search = None
+        order = ARIMA_ORDER
+    fit_start = time.perf_counter()
+    rmse = evaluate_model(scaled_data, differencing_order, ticker=ticker, order=order)
+    forecast = get_forecast(scaled_data, differencing_order, ticker=ticker, order=order)
+    fit_seconds = time.perf_counter() - fit_start
+    forecast['Close'] = inverse_scaling(scaler, forecast['Close']).reshape(-1)
+    result = {'order': (order[0], differencing_order, order[1]), 'rmse': rmse, 'search': search,
+              'fit_seconds': fit_seconds, 'history': rolling_price, 'forecast': forecast, 'bands': None}
+    if bands:
+        percentiles = get_forecast_bands(scaled_data, differencing_order, ticker=ticker, order=order)
+        result['bands'] = pd.DataFrame({c: inverse_scaling(scaler, percentiles[c]).reshape(-1)
+                                        for c in percentiles.columns}, index=forecast.index)
+    return result
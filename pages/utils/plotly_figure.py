@@ -1,11 +1,13 @@
 import plotly.graph_objects as go
-#notes: pandas_ta is not part of the official pandas library — it’s a third-party add-on.
-# pandas → general-purpose data analysis library.
-# pandas_ta → a separate Python library built on top of pandas, designed specifically for technical analysis of financial time series (stock prices, crypto, forex, etc.).
-import pandas_ta as pta
-import dateutil
+#notes: RSI, moving average and MACD values come from indicator_engine, which computes them with the
+# NumPy kernels in indicator_functions.py (the pandas_ta definitions, without the pandas_ta dependency).
 from datetime import datetime
+from pages.utils import indicator_engine
+from pages.utils.instrumentation import timed
+from pages.utils.timeseries import slice_period, downsample_line, ohlc_buckets, MAX_POINTS
+from pages.utils.price_store import as_frame
 
+@timed()
 def plotly_table(dataframe):
     headerColor = 'grey'
     rowEvenColor = '#f8fafd'
@@ -28,49 +30,40 @@ def plotly_table(dataframe):
     fig.update_layout(height=400, margin=dict(l=0, r=0, t=0, b=0))
     return fig
 
+# the chart builders also take a price_store.PriceView of one symbol's bars (PriceStore.bars),
+# wrapped as a read-only frame over the same memory
 def filter_data(dataframe, num_period):
-    if num_period == '1mo':
-        date = dataframe.index[-1] + dateutil.relativedelta.relativedelta(months=-1)
-    elif num_period == '5d':
-        date = dataframe.index[-1] + dateutil.relativedelta.relativedelta(days=-5)
-    elif num_period == '6mo':
-        date = dataframe.index[-1] + dateutil.relativedelta.relativedelta(months=-6)
-    elif num_period == '1y':
-        date = dataframe.index[-1] + dateutil.relativedelta.relativedelta(years=-1)
-    elif num_period == '5y':
-        date = dataframe.index[-1] + dateutil.relativedelta.relativedelta(years=-5)
-    elif num_period == 'ytd':
-        date = datetime.datetime(dataframe.index[-1].year, 1, 1).strftime('%Y-%m-%d')
-    else:
-        date = dataframe.index[0]
-
-    return dataframe.reset_index()[dataframe.reset_index()['Date'] > date]
-
-def close_chart(dataframe, num_period=False):
+    # positional slice of the sorted Date index; no reset_index copies or boolean scan
+    return slice_period(as_frame(dataframe), num_period)
+
+def _line(x, y, name, max_points, **kwargs):
+    x, y = downsample_line(x, y, max_points)
+    return go.Scatter(x=x, y=y, name=name, **kwargs)
+
+@timed()
+def close_chart(dataframe, num_period=False, max_points=MAX_POINTS):
+    dataframe = as_frame(dataframe)
     if num_period:
         dataframe = filter_data(dataframe, num_period)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=dataframe["Date"], y=dataframe['Open'],
-                             mode='lines',
-                             name='open', line=dict(width=2, color='#5a87ff')))
-    fig.add_trace(go.Scatter(x=dataframe["Date"], y=dataframe['Close'],
-                             mode='lines',
-                             name='close', line=dict(width=2, color='black')))
-    fig.add_trace(go.Scatter(x=dataframe["Date"], y=dataframe['High'],
-                             mode='lines',
-                             name='High', line=dict(width=2, color='#0078ff')))
-    fig.add_trace(go.Scatter(x=dataframe["Date"], y=dataframe['Low'],
-                             mode='lines',
-                             name='Low', line=dict(width=2, color='red')))
+    fig.add_trace(_line(dataframe.index, dataframe['Open'], 'open', max_points,
+                        mode='lines', line=dict(width=2, color='#5a87ff')))
+    fig.add_trace(_line(dataframe.index, dataframe['Close'], 'close', max_points,
+                        mode='lines', line=dict(width=2, color='black')))
+    fig.add_trace(_line(dataframe.index, dataframe['High'], 'High', max_points,
+                        mode='lines', line=dict(width=2, color='#0078ff')))
+    fig.add_trace(_line(dataframe.index, dataframe['Low'], 'Low', max_points,
+                        mode='lines', line=dict(width=2, color='red')))
     
     fig.update_xaxes(rangeslider_visible=True)
     fig.update_layout(height=500, margin=dict(l=0, r=20, t=20, b=0),
                       legend=dict(yanchor="top", xanchor="right"))
     return fig
-def candlestick(dataframe, num_period):
-    dataframe = filter_data(dataframe, num_period)
+@timed()
+def candlestick(dataframe, num_period, max_points=MAX_POINTS):
+    dataframe = ohlc_buckets(filter_data(dataframe, num_period), max_points)
     fig = go.Figure()
-    fig.add_trace(go.Candlestick(x=dataframe["Date"],
+    fig.add_trace(go.Candlestick(x=dataframe.index,
                                  open=dataframe['Open'],
                                  high=dataframe['High'],
                                  low=dataframe['Low'],
@@ -82,34 +75,28 @@ def candlestick(dataframe, num_period):
                      )
     return fig
 
-def RSI(dataframe, num_period):
-    dataframe['RSI'] = pta.rsi(dataframe['Close'])
-    dataframe = filter_data(dataframe, num_period)
+#values (optional): precomputed indicator columns, e.g. from the live feed, instead of the engine
+@timed()
+def RSI(dataframe, num_period, max_points=MAX_POINTS, values=None):
+    dataframe = as_frame(dataframe)
+    rsi = values if values is not None else indicator_engine.compute(dataframe, 'rsi', num_period)
     fig = go.Figure()
 
-    # Check if Date is a column or index
-    if 'Date' in dataframe.columns:
-        x_vals = dataframe['Date']
-    else:
-        x_vals = dataframe.index
-
-    fig.add_trace(go.Scatter(
-        x=x_vals,
-        y=dataframe['RSI'],
-        name='RSI',
-        line=dict(width=2, color='orange')
-    ))
+    fig.add_trace(_line(rsi.index, rsi['RSI'], 'RSI', max_points,
+                        line=dict(width=2, color='orange')))
 
+    # the threshold lines only need their two end points
+    x_ends = rsi.index[[0, -1]] if len(rsi) else rsi.index
     fig.add_trace(go.Scatter(
-        x=x_vals,
-        y=[70] * len(dataframe),
+        x=x_ends,
+        y=[70] * len(x_ends),
         name='Overbought',
         line=dict(width=2, color='red', dash='dash')
     ))
 
     fig.add_trace(go.Scatter(
-        x=x_vals,
-        y=[30] * len(dataframe),
+        x=x_ends,
+        y=[30] * len(x_ends),
         fill='tonexty',
         name='Oversold',
         line=dict(width=2, color='#79da84', dash='dash')
@@ -124,33 +111,21 @@ def RSI(dataframe, num_period):
 
     return fig
 
-def MACD(dataframe, num_period):
-    macd = pta.macd(dataframe['Close']).iloc[:, 0]
-    macd_signal = pta.macd(dataframe['Close']).iloc[:, 1]
-    macd_hist = pta.macd(dataframe['Close']).iloc[:, 2]
-
-    dataframe['MACD'] = macd
-    dataframe['MACD Signal'] = macd_signal
-    dataframe['MACD Hist'] = macd_hist
-    dataframe = filter_data(dataframe, num_period)
+@timed()
+def MACD(dataframe, num_period, max_points=MAX_POINTS, values=None):
+    dataframe = as_frame(dataframe)
+    macd = values if values is not None else indicator_engine.compute(dataframe, 'macd', num_period)
+    macd_hist = macd['MACD Hist']
 
     fig = go.Figure()
 
-    fig.add_trace(go.Scatter(
-        x=dataframe['Date'],
-        y=dataframe['MACD'],
-        name='MACD',
-        marker_color='orange',
-        line=dict(width=2, color='orange')
-    ))
+    fig.add_trace(_line(macd.index, macd['MACD'], 'MACD', max_points,
+                        marker_color='orange',
+                        line=dict(width=2, color='orange')))
 
-    fig.add_trace(go.Scatter(
-        x=dataframe['Date'],
-        y=dataframe['MACD Signal'],
-        name='Signal',
-        marker_color='red',
-        line=dict(width=2, color='red', dash='dash')
-    ))
+    fig.add_trace(_line(macd.index, macd['MACD Signal'], 'Signal', max_points,
+                        marker_color='red',
+                        line=dict(width=2, color='red', dash='dash')))
 
     c = ['red' if cl < 0 else 'green' for cl in macd_hist]
 
@@ -162,41 +137,29 @@ def MACD(dataframe, num_period):
 
     return fig
 
-def Moving_average(dataframe, num_period):
+@timed()
+def Moving_average(dataframe, num_period, max_points=MAX_POINTS, values=None):
+    dataframe = as_frame(dataframe)
 
-    dataframe['SMA_50'] = pta.sma(dataframe['Close'], 50)
-    dataframe = filter_data(dataframe, num_period)
+    sma = values if values is not None else indicator_engine.compute(dataframe, 'sma', num_period, length=50)
+    if num_period:
+        dataframe = filter_data(dataframe, num_period)
     fig = go.Figure()
 
-    fig.add_trace(go.Scatter(
-        x=dataframe['Date'], y=dataframe['Open'],
-        mode='lines',
-        name='Open', line=dict(width=2, color='#5ab7ff')
-    ))
+    fig.add_trace(_line(dataframe.index, dataframe['Open'], 'Open', max_points,
+                        mode='lines', line=dict(width=2, color='#5ab7ff')))
 
-    fig.add_trace(go.Scatter(
-        x=dataframe['Date'], y=dataframe['Close'],
-        mode='lines',
-        name='Close', line=dict(width=2, color='black')
-    ))
+    fig.add_trace(_line(dataframe.index, dataframe['Close'], 'Close', max_points,
+                        mode='lines', line=dict(width=2, color='black')))
 
-    fig.add_trace(go.Scatter(
-        x=dataframe['Date'], y=dataframe['High'],
-        mode='lines',
-        name='High', line=dict(width=2, color='#0078ff')
-    ))
+    fig.add_trace(_line(dataframe.index, dataframe['High'], 'High', max_points,
+                        mode='lines', line=dict(width=2, color='#0078ff')))
 
-    fig.add_trace(go.Scatter(
-        x=dataframe['Date'], y=dataframe['Low'],
-        mode='lines',
-        name='Low', line=dict(width=2, color='red')
-    ))
+    fig.add_trace(_line(dataframe.index, dataframe['Low'], 'Low', max_points,
+                        mode='lines', line=dict(width=2, color='red')))
 
-    fig.add_trace(go.Scatter(
-        x=dataframe['Date'], y=dataframe['SMA_50'],
-        mode='lines',
-        name='SMA 50', line=dict(width=2, color='purple')
-    ))
+    fig.add_trace(_line(sma.index, sma['SMA_50'], 'SMA 50', max_points,
+                        mode='lines', line=dict(width=2, color='purple')))
 
     fig.update_xaxes(rangeslider_visible=True)
 
@@ -208,9 +171,19 @@ def Moving_average(dataframe, num_period):
     return fig
 
 
-def Moving_average_forecast(forecast):
+#bands (optional): Monte Carlo percentile columns p5/p25/p75/p95 indexed by the forecast dates
+@timed()
+def Moving_average_forecast(forecast, bands=None):
     fig = go.Figure()
 
+    if bands is not None:
+        for low, high, opacity in (('p5', 'p95', 0.15), ('p25', 'p75', 0.3)):
+            fig.add_trace(go.Scatter(x=bands.index, y=bands[high], mode='lines', line=dict(width=0),
+                                     showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=bands.index, y=bands[low], mode='lines', line=dict(width=0),
+                                     fill='tonexty', fillcolor=f'rgba(255, 0, 0, {opacity})',
+                                     name=f'{low[1:]}-{high[1:]}% band'))
+
     fig.add_trace(go.Scatter(x=forecast.index[:-30], y=forecast['Close'].iloc[:-30],
                              mode='lines',
                              name='Close Price', line=dict(width=2, color='yellow')))
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from pages.utils.data_cache import default_cache
+from pages.utils.instrumentation import timed
+from price_view import PriceView, as_frame, _take, _row_slice
+
+# Columnar, memory-mapped price store for the whole ticker universe.
+# One shared Date axis (int64 nanoseconds) plus one rows x symbols x fields price array kept
+# column-major, so one field for the whole universe (say Close) is a single contiguous block and
+# each symbol's history is a contiguous run inside it. Both are plain .npy files opened with
+# mmap_mode='r': every session and worker process maps the same read-only pages, and a date
+# range, a run of symbols or one symbol's bars is a zero-copy view. Prices are float32 by default, half of float64 and plenty
+# for daily returns; pass dtype='float64' when building for full precision.
+#
+#   python -m pages.utils.price_store --limit 500          # build from the price cache
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_STORE_DIR = os.environ.get("CAPM_PRICE_STORE", os.path.join(BASE_DIR, ".cache", "store"))
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+MARKET = 'sp500'
+
+
+class PriceStore:
+
+    def __init__(self, path=DEFAULT_STORE_DIR, mmap=True):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.symbols = meta['symbols']
+        self.fields = meta['fields']
+        self.built_at = meta.get('built_at')
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._fields = {field: i for i, field in enumerate(self.fields)}
+        self.dates = np.load(os.path.join(path, 'dates.npy')).view('datetime64[ns]')
+        # first and last row each symbol has a price on, so its bars can skip the padding around them
+        self.spans = np.load(os.path.join(path, 'spans.npy'))
+        self.prices = np.load(os.path.join(path, 'prices.npy'), mmap_mode='r' if mmap else None)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._positions
+
+    @property
+    def nbytes(self):
+        return self.prices.nbytes + self.dates.nbytes
+
+    #function to view one field (default Close) for a list of symbols, aligned on the shared axis;
+    #zero-copy when the symbols are a contiguous run of the (sorted) store, else a copy of just those columns
+    def view(self, symbols, field='Close', start=None, end=None):
+        rows = _row_slice(self.dates, start, end)
+        positions = [self._positions[symbol] for symbol in symbols]
+        values = _take(self.prices[rows, :, self._fields[field]], positions)
+        return PriceView(self.dates[rows], symbols, values)
+
+    #function to view one symbol's bars (Open/High/Low/Close/Volume columns) over its own history
+    def bars(self, symbol, start=None, end=None, fields=None):
+        j = self._positions[symbol]
+        first, last = self.spans[j]
+        window = _row_slice(self.dates[first:last + 1], start, end)
+        rows = slice(first + window.start, first + window.stop)
+        view = PriceView(self.dates[rows], self.fields, self.prices[rows, j, :])
+        return view.select(fields) if fields is not None else view
+
+
+#function to pull one symbol's fields out of a cached frame (FRED series have a single column named after it)
+def _columns(frame, symbol, fields):
+    if symbol in frame.columns and 'Close' not in frame.columns:
+        frame = frame.rename(columns={symbol: 'Close'})
+    return {field: frame[field].to_numpy(dtype=np.float64) for field in fields if field in frame.columns}
+
+
+#function to write a store from load(symbol) -> Date-indexed frame (or None); symbols are stored sorted.
+#a first pass (on a thread pool, so downloads overlap) collects the union of dates, a second fills the
+#memory-mapped array one symbol at a time, so only one symbol's history is ever held in memory
+@timed()
+def write_store(path, symbols, load, fields=FIELDS, dtype='float32', max_workers=8):
+    symbols = sorted(dict.fromkeys(symbols))
+
+    def dates(symbol):
+        frame = load(symbol)
+        return None if frame is None or len(frame) == 0 else pd.DatetimeIndex(frame.index).as_unit('ns').asi8
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        found = list(pool.map(dates, symbols))
+    kept = [symbol for symbol, d in zip(symbols, found) if d is not None]
+    axis = np.unique(np.concatenate([d for d in found if d is not None] or [np.array([], dtype=np.int64)]))
+    del found
+
+    tmp = path + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    prices = np.lib.format.open_memmap(os.path.join(tmp, 'prices.npy'), mode='w+', dtype=dtype,
+                                       shape=(len(axis), len(kept), len(fields)), fortran_order=True)
+    spans = np.zeros((len(kept), 2), dtype=np.int64)
+    for j, symbol in enumerate(kept):
+        frame = load(symbol)
+        positions = np.searchsorted(axis, pd.DatetimeIndex(frame.index).as_unit('ns').asi8)
+        block = np.full((len(axis), len(fields)), np.nan)
+        for i, field in enumerate(fields):
+            values = _columns(frame, symbol, [field]).get(field)
+            if values is not None:
+                block[positions, i] = values
+        prices[:, j, :] = block
+        spans[j] = positions[0], positions[-1]
+    prices.flush()
+    del prices
+    np.save(os.path.join(tmp, 'dates.npy'), axis)
+    np.save(os.path.join(tmp, 'spans.npy'), spans)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'symbols': kept, 'fields': list(fields), 'dtype': str(np.dtype(dtype)), 'rows': len(axis),
+                   'built_at': time.time()}, f)
+    # swap directories; sessions that still map the old files keep reading them until they reopen
+    if os.path.exists(path):
+        shutil.rmtree(path + '.old', ignore_errors=True)
+        os.replace(path, path + '.old')
+    os.replace(tmp, path)
+    shutil.rmtree(path + '.old', ignore_errors=True)
+    return PriceStore(path)
+
+
+#function to build the store from the price cache: full history of every symbol plus the market series
+def build_store(symbols, path=DEFAULT_STORE_DIR, source='yahoo', fields=FIELDS, dtype='float32',
+                cache=None, max_workers=8):
+    cache = cache or default_cache()
+
+    def load(symbol):
+        try:
+            return cache.get(symbol, 'fred' if symbol == MARKET else source)
+        except Exception:
+            return None
+
+    return write_store(path, list(symbols) + [MARKET], load, fields, dtype, max_workers)
+
+
+_stores = {}
+_lock = threading.Lock()
+
+#function to get the process-wide store (shared by every session), reopened when it is rebuilt;
+#None when no store has been built at path
+def default_store(path=DEFAULT_STORE_DIR):
+    meta = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta):
+        return None
+    stamp = os.path.getmtime(meta)
+    with _lock:
+        cached = _stores.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, PriceStore(path))
+            _stores[path] = cached
+        return cached[1]
+
+
+if __name__ == '__main__':
+    import argparse
+    from pages.utils.ticker_universe import get_universe
+    parser = argparse.ArgumentParser(description="Build the memory-mapped price store from the price cache")
+    parser.add_argument('--out', default=DEFAULT_STORE_DIR)
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    store = build_store(list(get_universe().symbols)[:args.limit], args.out, dtype=args.dtype,
+                        max_workers=args.workers)
+    print(f"{len(store)} symbols x {len(store.dates)} dates, {store.nbytes / 2 ** 20:.1f} MiB, "
+          f"{time.perf_counter() - started:.1f}s -> {args.out}")
@@ -0,0 +1,147 @@
+import sys
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+import capm_functions
+import indicator_functions
+from pages.utils.data_cache import default_cache
+from pages.utils.bulk_download import fetch_many
+from pages.utils.ticker_universe import get_universe
+from pages.utils.price_store import MARKET, default_store
+from pages.utils.instrumentation import timed
+
+# Full-universe CAPM screener.
+# The market series is fetched once; symbols are then streamed in chunks through the bulk
+# downloader, and each chunk's returns and regressions are computed as one vectorized block
+# against that shared series. Only the per-symbol statistics are kept between chunks, so memory
+# stays bounded by the chunk size rather than the universe size.
+# With a price store (see price_store.py) chunks are read as views of its memory-mapped Close
+# prices instead of being downloaded, and the returns stay float32.
+# Each chunk's latest RSI comes from one indicator_functions.rsi call over its whole price matrix.
+
+COLUMNS = ['Stocks', 'Beta', 'Alpha', 'R²', 'Residual Vol', 'Beta Std. Error', 'History (days)', 'RSI (14)',
+           'Expected Return']
+
+
+#function to fetch the shared market series (sp500 from FRED) for the screening window, without gaps
+@timed()
+def market_series(start, end, cache=None):
+    cache = cache or default_cache()
+    return cache.get('sp500', 'fred', start, end)['sp500'].dropna()
+
+
+#function to compute regression statistics for one chunk of symbols against the market series
+@timed()
+def screen_chunk(symbols, market, start, end, rf=0, cache=None, max_workers=16):
+    prices, report = fetch_many(symbols, 'yahoo', start, end, cache=cache, max_workers=max_workers)
+    if len(prices.columns) < 2:
+        return pd.DataFrame(columns=COLUMNS[:-1]), report
+    prices = prices.set_index('Date').reindex(market.index)
+    prices['sp500'] = market
+    returns = capm_functions.daily_returns(prices.reset_index(), first_row='nan')
+    stats = capm_functions.batch_regression(returns, 'sp500', rf / 252)
+    block = pd.DataFrame({
+        'Stocks': stats.index,
+        'Beta': stats['beta'].to_numpy(),
+        'Alpha': stats['alpha'].to_numpy(),
+        'R²': stats['r2'].to_numpy(),
+        'Residual Vol': stats['resid_vol'].to_numpy(),
+        'Beta Std. Error': stats['beta_se'].to_numpy(),
+        'History (days)': stats['n_obs'].to_numpy(),
+        'RSI (14)': indicator_functions.rsi(prices[stats.index].to_numpy(), 14)[-1],
+    })
+    return block, report
+
+
+#function to compute one chunk's statistics from the price store: no downloads, and the chunk's prices
+#are a view of the store's Close column (rows kept where the market has a price)
+@timed()
+def screen_store_chunk(symbols, store, start, end, rf=0):
+    started = time.perf_counter()
+    held = [s for s in symbols if s in store]
+    view = store.view(held + [MARKET], 'Close', start, end)
+    view = view.rows(~np.isnan(view[MARKET]))
+    stats = capm_functions.batch_regression(capm_functions.daily_returns(view, first_row='nan'), MARKET, rf / 252)
+    block = pd.DataFrame({
+        'Stocks': stats.index,
+        'Beta': stats['beta'].to_numpy(),
+        'Alpha': stats['alpha'].to_numpy(),
+        'R²': stats['r2'].to_numpy(),
+        'Residual Vol': stats['resid_vol'].to_numpy(),
+        'Beta Std. Error': stats['beta_se'].to_numpy(),
+        'History (days)': stats['n_obs'].to_numpy(),
+        'RSI (14)': indicator_functions.rsi(view.select(list(stats.index)).values, 14)[-1],
+    })
+    seconds = (time.perf_counter() - started) / max(len(symbols), 1)
+    report = pd.DataFrame([{'Symbol': s, 'Rows': int(n), 'Attempts': 0, 'Seconds': seconds, 'Error': None}
+                           for s, n in zip(stats.index, stats['n_obs'])] +
+                          [{'Symbol': s, 'Rows': 0, 'Attempts': 0, 'Seconds': 0.0, 'Error': "not in price store"}
+                           for s in symbols if s not in store],
+                          columns=['Symbol', 'Rows', 'Attempts', 'Seconds', 'Error'])
+    return block, report
+
+
+#function to screen a list of symbols (default: the whole tickers.txt universe)
+#progress(done, total) is called after every chunk
+@timed()
+def screen(symbols=None, years=5, rf=0, chunk_size=200, min_history=252, min_r2=0.0,
+           max_workers=16, cache=None, progress=None, store=None):
+    cache = cache or default_cache()
+    symbols = list(symbols) if symbols is not None else list(get_universe().symbols)
+    end = date.today()
+    start = date(end.year - int(years), end.month, end.day)
+    if store is not None:
+        market = None
+        market_prices = store.view([MARKET], 'Close', start, end)[MARKET]
+    else:
+        market = market_series(start, end, cache)
+        market_prices = market.to_numpy()
+    market_returns = capm_functions.returns_matrix(market_prices[~np.isnan(market_prices)])
+    rm = np.nanmean(market_returns) * 252
+
+    blocks, reports = [], []
+    for i in range(0, len(symbols), chunk_size):
+        if store is not None:
+            block, report = screen_store_chunk(symbols[i:i + chunk_size], store, start, end, rf)
+        else:
+            block, report = screen_chunk(symbols[i:i + chunk_size], market, start, end, rf, cache, max_workers)
+        blocks.append(block)
+        reports.append(report)
+        if progress is not None:
+            progress(min(i + chunk_size, len(symbols)), len(symbols))
+
+    table = pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame(columns=COLUMNS[:-1])
+    table['Expected Return'] = capm_functions.capm_return(table['Beta'].astype(float), rm, rf)
+    table = table[(table['History (days)'] >= min_history) & (table['R²'] >= min_r2)]
+    table = table.sort_values('Beta', ascending=False, ignore_index=True)
+    report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame()
+    return table[COLUMNS], report
+
+
+if __name__ == '__main__':
+    # python -m pages.utils.screener --years 5 --min-r2 0.1 --out screener.csv
+    import argparse
+    parser = argparse.ArgumentParser(description="Rank the ticker universe by CAPM beta, alpha and expected return")
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--rf', type=float, default=0.0, help="risk-free rate, % per year")
+    parser.add_argument('--chunk-size', type=int, default=200)
+    parser.add_argument('--min-history', type=int, default=252)
+    parser.add_argument('--min-r2', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--store', action='store_true', help="read prices from the memory-mapped price store")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    symbols = list(get_universe().symbols)[:args.limit]
+    table, report = screen(symbols, args.years, args.rf, args.chunk_size, args.min_history, args.min_r2,
+                           args.workers, progress=lambda done, total: print(f"{done}/{total}", file=sys.stderr),
+                           store=default_store() if args.store else None)
+    failed = int(report['Error'].notna().sum()) if len(report) else 0
+    print(f"{len(table)} symbols ranked, {failed} failed downloads, {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+    if args.out:
+        table.to_csv(args.out, index=False)
+    else:
+        print(table.head(25).to_string(index=False))
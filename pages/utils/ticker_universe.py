@@ -0,0 +1,139 @@
+import os
+import csv
+import bisect
+import difflib
+import threading
+
+# Process-wide ticker universe built from tickers.txt (one symbol per line, sorted) and the
+# optional tickers_meta.csv written next to it by the refresh script (test.py).
+# It is loaded once per process and reloaded only when either file changes on disk; lookups
+# are a bisect over the sorted symbols, so page reruns don't depend on the universe size.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TICKERS_PATH = os.path.join(BASE_DIR, "tickers.txt")
+META_FIELDS = ['Symbol', 'Name', 'Market', 'ETF', 'Class']
+# Nasdaq fifth-letter suffixes for special share classes
+SUFFIX_CLASSES = {'W': 'warrant', 'U': 'unit', 'R': 'right'}
+
+
+#function to guess a Nasdaq symbol's security class from its fifth letter (warrants, units, rights)
+def symbol_class(symbol):
+    if len(symbol) == 5 and symbol[-1] in SUFFIX_CLASSES:
+        return SUFFIX_CLASSES[symbol[-1]]
+    return 'common'
+
+
+def meta_path(tickers_path):
+    return os.path.splitext(tickers_path)[0] + "_meta.csv"
+
+
+class TickerUniverse:
+
+    def __init__(self, symbols, metadata=None):
+        self.symbols = tuple(sorted(set(symbols)))
+        self.metadata = metadata or {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        i = bisect.bisect_left(self.symbols, symbol)
+        return i < len(self.symbols) and self.symbols[i] == symbol
+
+    def index(self, symbol, default=0):
+        i = bisect.bisect_left(self.symbols, symbol)
+        return i if i < len(self.symbols) and self.symbols[i] == symbol else default
+
+    def info(self, symbol):
+        entry = self.metadata.get(symbol, {})
+        return {'Symbol': symbol, 'Name': entry.get('Name', ''), 'Market': entry.get('Market', ''),
+                'ETF': entry.get('ETF') == 'Y', 'Class': entry.get('Class') or symbol_class(symbol)}
+
+    #function to list symbols starting with prefix, in sorted order
+    def prefix(self, query, limit=50):
+        query = query.strip().upper()
+        start = bisect.bisect_left(self.symbols, query)
+        stop = bisect.bisect_left(self.symbols, query + '\uffff')
+        return list(self.symbols[start:min(stop, start + limit)])
+
+    #function for type-ahead: prefix matches first, then symbols/company names containing the query,
+    #then (only if nothing matched) close fuzzy matches; etf/classes filter on the metadata
+    def search(self, query, limit=50, etf=None, classes=None):
+        query = query.strip().upper()
+
+        def keep(symbol):
+            info = self.info(symbol)
+            return (etf is None or info['ETF'] == etf) and (classes is None or info['Class'] in classes)
+
+        if not query:
+            results = [s for s in self.symbols[:limit * 4] if keep(s)]
+            return results[:limit]
+        results = [s for s in self.prefix(query, limit * 4) if keep(s)]
+        if len(results) < limit:
+            seen = set(results)
+            for symbol in self.symbols:
+                if symbol in seen:
+                    continue
+                name = self.metadata.get(symbol, {}).get('Name', '').upper()
+                if (query in symbol or (len(query) > 2 and query in name)) and keep(symbol):
+                    results.append(symbol)
+                    seen.add(symbol)
+                    if len(results) >= limit:
+                        break
+        if not results:
+            seen = set(results)
+            for symbol in difflib.get_close_matches(query, self.symbols, n=limit, cutoff=0.6):
+                if symbol not in seen and keep(symbol):
+                    results.append(symbol)
+        return results[:limit]
+
+
+#function to read tickers.txt (+ tickers_meta.csv when present) into a TickerUniverse
+def read_universe(tickers_path=TICKERS_PATH):
+    with open(tickers_path) as f:
+        symbols = [line.strip().upper() for line in f if line.strip()]
+    metadata = {}
+    if os.path.exists(meta_path(tickers_path)):
+        with open(meta_path(tickers_path), newline='') as f:
+            for row in csv.DictReader(f):
+                metadata[row['Symbol'].upper()] = row
+    return TickerUniverse(symbols, metadata)
+
+
+#function to write a universe from rows with Symbol (+ optional Name/Market/ETF) atomically:
+#both files are written to temp names first, then renamed into place
+def write_universe(rows, tickers_path=TICKERS_PATH):
+    entries = {}
+    for row in rows:
+        symbol = str(row.get('Symbol') or '').strip().upper()
+        if not symbol or symbol.startswith('FILE CREATION TIME'):
+            continue
+        entries[symbol] = {'Symbol': symbol, 'Name': row.get('Name', ''), 'Market': row.get('Market', ''),
+                           'ETF': row.get('ETF', ''), 'Class': symbol_class(symbol)}
+    symbols = sorted(entries)
+    with open(tickers_path + '.tmp', 'w') as f:
+        for symbol in symbols:
+            f.write(f"{symbol}\n")
+    with open(meta_path(tickers_path) + '.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=META_FIELDS)
+        writer.writeheader()
+        for symbol in symbols:
+            writer.writerow(entries[symbol])
+    os.replace(meta_path(tickers_path) + '.tmp', meta_path(tickers_path))
+    os.replace(tickers_path + '.tmp', tickers_path)
+    return len(symbols)
+
+
+_universes = {}
+_lock = threading.Lock()
+
+#function to get the shared universe, reloading only when tickers.txt or its metadata changed
+def get_universe(tickers_path=TICKERS_PATH):
+    stamps = tuple(os.path.getmtime(p) if os.path.exists(p) else None
+                   for p in (tickers_path, meta_path(tickers_path)))
+    with _lock:
+        cached = _universes.get(tickers_path)
+        if cached is None or cached[0] != stamps:
+            cached = (stamps, read_universe(tickers_path))
+            _universes[tickers_path] = cached
+        return cached[1]
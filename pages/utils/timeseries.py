@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+# Period slicing and server-side downsampling for the charts.
+# Periods are cut from the sorted DatetimeIndex with searchsorted (a positional slice, no
+# boolean scan or reset_index copies), and long traces are thinned before they are handed to
+# Plotly: LTTB for lines, OHLC bucketing for candlesticks.
+
+PERIOD_OFFSETS = {
+    '5d': relativedelta(days=5),
+    '1mo': relativedelta(months=1),
+    '6mo': relativedelta(months=6),
+    '1y': relativedelta(years=1),
+    '5y': relativedelta(years=5),
+}
+# default cap on points per trace: about two per horizontal pixel of a full-width chart
+MAX_POINTS = 2000
+
+
+#function to find the cut-off date for a period ('5d', '1mo', '6mo', '1y', '5y', 'ytd', else everything);
+#rows strictly after it are shown
+def period_start(index, num_period):
+    last = index[-1]
+    if num_period in PERIOD_OFFSETS:
+        return last - PERIOD_OFFSETS[num_period]
+    if num_period == 'ytd':
+        # the last bar of the previous year, so 1 January itself is kept
+        return pd.Timestamp(year=last.year, month=1, day=1, tz=getattr(last, 'tz', None)) - pd.Timedelta(days=1)
+    return index[0]
+
+
+#function to return the position of the first row shown for a period
+def period_position(index, num_period):
+    return int(index.searchsorted(period_start(index, num_period), side='right'))
+
+
+#function to slice a Date-indexed frame down to a period without copying
+def slice_period(dataframe, num_period):
+    return dataframe.iloc[period_position(dataframe.index, num_period):]
+
+
+#function to pick n_out indices of (x, y) with Largest-Triangle-Three-Buckets; keeps first and last point
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], max(edges[i + 2], edges[i + 1] + 1))
+        else:
+            nxt = slice(n - 1, n)
+        cx = x[nxt].mean()
+        cy = np.nanmean(y[nxt]) if not np.isnan(y[nxt]).all() else y[a]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        area = np.where(np.isnan(area), -1.0, area)
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+#function to downsample one line trace; returns (x, y) with at most max_points points
+def downsample_line(x, y, max_points=MAX_POINTS):
+    y = np.asarray(y)
+    if len(y) <= max_points:
+        return x, y
+    index = pd.Index(x)
+    xs = index.asi8 if isinstance(index, pd.DatetimeIndex) else np.asarray(index, dtype=np.float64)
+    keep = lttb_indices(xs, y, max_points)
+    return index[keep], y[keep]
+
+
+#function to merge consecutive OHLC bars into at most max_points buckets (first open, max high, min low, last close)
+def ohlc_buckets(dataframe, max_points=MAX_POINTS):
+    n = len(dataframe)
+    if n <= max_points:
+        return dataframe
+    starts = np.linspace(0, n, max_points + 1).astype(np.int64)[:-1]
+    starts = np.unique(starts)
+    ends = np.append(starts[1:], n)
+    return pd.DataFrame({
+        'Open': dataframe['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(dataframe['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(dataframe['Low'].to_numpy(), starts),
+        'Close': dataframe['Close'].to_numpy()[ends - 1],
+    }, index=dataframe.index[starts])
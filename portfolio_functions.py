@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import capm_functions
+
+# Portfolio analytics on top of the CAPM daily returns frame (Date, stocks..., sp500; returns in %).
+# Covariances are built once from the returns matrix, either as the full-sample estimate, with
+# Ledoit-Wolf shrinkage, or as a single-index (CAPM) factor model whose inverse is applied with the
+# Woodbury identity in O(n) so it scales to hundreds of names. Weights come from linear solves,
+# never from explicit matrix inverses.
+
+TRADING_DAYS = 252
+
+
+#function to pull the stock return matrix (rows with any missing value dropped) out of the daily returns frame
+def returns_matrix(stocks_daily_return, market='sp500'):
+    stocks = [i for i in stocks_daily_return.columns[1:] if i != market]
+    frame = stocks_daily_return[stocks + [market]].dropna()
+    return frame[stocks].to_numpy(dtype=np.float64), frame[market].to_numpy(dtype=np.float64), stocks
+
+
+#function for the full-sample covariance of the columns of R
+def sample_covariance(R):
+    X = R - R.mean(axis=0)
+    return X.T @ X / (len(R) - 1)
+
+
+#function for Ledoit-Wolf shrinkage of the sample covariance towards a scaled identity
+def ledoit_wolf_covariance(R):
+    n, p = R.shape
+    X = R - R.mean(axis=0)
+    S = X.T @ X / n
+    mu = np.trace(S) / p
+    target = mu * np.eye(p)
+    delta = np.sum((S - target) ** 2) / p
+    # sum_k ||x_k x_k' - S||^2 = sum_k ||x_k||^4 - n ||S||^2
+    beta = (np.sum(np.einsum('ij,ij->i', X, X) ** 2) - n * np.sum(S ** 2)) / (n ** 2 * p)
+    shrinkage = 0.0 if delta == 0 else min(beta, delta) / delta
+    return shrinkage * target + (1 - shrinkage) * S, shrinkage
+
+
+class SingleIndexCovariance:
+    # cov = beta beta' var(market) + diag(residual variance), stored in O(n)
+
+    def __init__(self, beta, market_var, resid_var):
+        self.beta = np.asarray(beta, dtype=np.float64)
+        self.market_var = float(market_var)
+        self.resid_var = np.asarray(resid_var, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, R, m):
+        frame = pd.DataFrame(R)
+        frame.insert(0, 'Date', 0)
+        frame['sp500'] = m
+        stats = capm_functions.batch_regression(frame)
+        return cls(stats['beta'].to_numpy(), np.var(m, ddof=1), stats['resid_vol'].to_numpy() ** 2)
+
+    def dense(self):
+        return self.market_var * np.outer(self.beta, self.beta) + np.diag(self.resid_var)
+
+    #function to solve cov @ x = b with the Woodbury identity
+    def solve(self, b):
+        d_inv_b = b / (self.resid_var if np.ndim(b) == 1 else self.resid_var[:, None])
+        d_inv_beta = self.beta / self.resid_var
+        scale = self.market_var / (1 + self.market_var * self.beta @ d_inv_beta)
+        return d_inv_b - np.multiply.outer(d_inv_beta, scale * (self.beta @ d_inv_b))
+
+    def quad(self, w):
+        return self.market_var * (self.beta @ w) ** 2 + np.sum(self.resid_var * w ** 2)
+
+
+#function to build a covariance estimate: 'sample', 'ledoit-wolf' or 'single-index'
+def covariance(R, m=None, method='sample'):
+    if method == 'sample':
+        return sample_covariance(R)
+    if method == 'ledoit-wolf':
+        return ledoit_wolf_covariance(R)[0]
+    if method == 'single-index':
+        return SingleIndexCovariance.fit(R, m)
+    raise ValueError(f"unknown covariance method: {method!r}")
+
+
+def _solve(cov, b):
+    return cov.solve(b) if hasattr(cov, 'solve') else np.linalg.solve(cov, b)
+
+
+def _quad(cov, w):
+    return cov.quad(w) if hasattr(cov, 'quad') else float(w @ cov @ w)
+
+
+#function to turn a covariance into a correlation matrix
+def correlation(cov):
+    cov = cov.dense() if hasattr(cov, 'dense') else cov
+    sd = np.sqrt(np.diag(cov))
+    return cov / np.outer(sd, sd)
+
+
+#function for the fully invested minimum-variance weights (shorts allowed)
+def min_variance_weights(cov):
+    n = len(cov.beta) if hasattr(cov, 'beta') else len(cov)
+    x = _solve(cov, np.ones(n))
+    return x / x.sum()
+
+
+#function for the maximum-Sharpe (tangency) weights, scaled to a net exposure of 1; mu and rf in daily %
+#(if the tangency direction is net short the weights sum to -1 rather than flipping it into the worst portfolio)
+def max_sharpe_weights(cov, mu, rf=0):
+    x = _solve(cov, np.asarray(mu, dtype=np.float64) - rf)
+    return x / abs(x.sum())
+
+
+#function for annualized portfolio return, volatility, Sharpe ratio and beta (rf in % per year)
+def portfolio_stats(w, mu, cov, betas=None, rf=0):
+    ret = float(w @ mu) * TRADING_DAYS
+    vol = np.sqrt(_quad(cov, w) * TRADING_DAYS)
+    stats = {'Return': ret, 'Volatility': vol, 'Sharpe': (ret - rf) / vol if vol > 0 else np.nan}
+    if betas is not None:
+        stats['Beta'] = float(w @ betas)
+    return stats
+
+
+#function to run the whole basket analysis for the CAPM page: weights and stats for
+#equal, minimum-variance and maximum-Sharpe portfolios, plus the correlation matrix
+def analyze(stocks_daily_return, method='sample', rf=0, market='sp500'):
+    R, m, stocks = returns_matrix(stocks_daily_return, market)
+    cov = covariance(R, m, method)
+    mu = R.mean(axis=0)
+    betas = capm_functions.batch_regression(stocks_daily_return, market)['beta'].reindex(stocks).to_numpy()
+    portfolios = {
+        'Equal Weight': np.full(len(stocks), 1 / len(stocks)),
+        'Minimum Variance': min_variance_weights(cov),
+        'Maximum Sharpe': max_sharpe_weights(cov, mu, rf / TRADING_DAYS),
+    }
+    weights = pd.DataFrame(portfolios, index=pd.Index(stocks, name='Stocks'))
+    stats = pd.DataFrame({name: portfolio_stats(w, mu, cov, betas, rf) for name, w in portfolios.items()})
+    corr = pd.DataFrame(correlation(cov), index=stocks, columns=stocks)
+    return weights, stats, corr
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# A window of prices over a datetime64 Date axis, as handed out by the price store
+# (pages/utils/price_store.py) and taken by capm_functions and factor_functions. It lives here,
+# next to them, with no imports from the app, so the analysis modules don't depend on the store,
+# its cache or the Streamlit-side utilities.
+
+
+class PriceView:
+    # a window of prices: a datetime64 Date axis and a rows x names value matrix, where names are
+    # symbols (one field across the universe) or fields (one symbol's bars); usually a view into the store
+
+    def __init__(self, dates, names, values):
+        self.dates = dates
+        self.names = list(names)
+        self.values = values
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __getitem__(self, name):
+        return self.values[:, self._positions[name]]
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.dates, name='Date')
+
+    #function to keep only some columns, in the given order (a copy unless they are one contiguous run)
+    def select(self, names):
+        positions = [self._positions[name] for name in names]
+        return PriceView(self.dates, names, _take(self.values, positions))
+
+    #function to cut the view to start..end (inclusive) without copying
+    def slice(self, start=None, end=None):
+        rows = _row_slice(self.dates, start, end)
+        return PriceView(self.dates[rows], self.names, self.values[rows])
+
+    #function to keep the rows where mask is True (copies those rows)
+    def rows(self, mask):
+        return PriceView(self.dates[mask], self.names, self.values[mask])
+
+    #function to wrap the view as a Date-indexed DataFrame over the same memory (read-only)
+    def to_frame(self):
+        return pd.DataFrame(self.values, index=self.index, columns=self.names, copy=False)
+
+
+#function to turn a view into a Date-indexed frame; anything else is returned as it is
+def as_frame(data):
+    return data.to_frame() if isinstance(data, PriceView) else data
+
+
+#function to pick columns of a 2-D array; a contiguous ascending run is a view, anything else a copy
+def _take(values, positions):
+    if positions and positions == list(range(positions[0], positions[0] + len(positions))):
+        return values[:, positions[0]:positions[0] + len(positions)]
+    return values[:, positions]
+
+
+#function to turn start/end dates into a positional slice of a sorted datetime64 axis
+def _row_slice(dates, start=None, end=None):
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left'))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side='right'))
+    return slice(lo, hi)
@@ -0,0 +1,121 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Monte Carlo engine for CAPM returns and ARIMA forecasts.
+# Paths are drawn as NumPy arrays in chunks of `chunk_size`, each chunk with its own child of one
+# SeedSequence, so results are reproducible for a given seed whether the chunks run in this
+# process or across a process pool. Only per-path outputs (terminal returns, forecast paths) are
+# kept; the per-step draws of a chunk are discarded as soon as they are accumulated.
+
+DEFAULT_CHUNK = 5000
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+#function to split n_paths into chunk sizes, each paired with an independent child seed
+def _chunks(n_paths, chunk_size, seed):
+    sizes = [min(chunk_size, n_paths - i) for i in range(0, n_paths, chunk_size)]
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+#function to run fn(*args, seed, size) over all chunks, in-process or on a process pool, and stack the results
+def _run(fn, args, n_paths, chunk_size, seed, processes):
+    chunks = _chunks(n_paths, chunk_size, seed)
+    if processes and processes > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(processes, len(chunks))) as pool:
+            parts = list(pool.map(fn, *zip(*[args + chunk for chunk in chunks])))
+    else:
+        parts = [fn(*args, *chunk) for chunk in chunks]
+    return np.concatenate(parts)
+
+
+#function to collect what the CAPM simulation needs from the daily returns frame (returns in %):
+#alpha, beta, the market series and the regression residuals on the rows where everything is known
+def capm_inputs(stocks_daily_return, market='sp500'):
+    stocks = [i for i in stocks_daily_return.columns[1:] if i != market]
+    frame = stocks_daily_return[stocks + [market]].dropna()
+    y = frame[stocks].to_numpy(dtype=np.float64)
+    x = frame[market].to_numpy(dtype=np.float64)
+    xc = x - x.mean()
+    beta = xc @ (y - y.mean(axis=0)) / (xc @ xc)
+    alpha = y.mean(axis=0) - beta * x.mean()
+    resid = y - alpha - np.outer(x, beta)
+    return {'stocks': stocks, 'alpha': alpha, 'beta': beta, 'market': x, 'resid': resid}
+
+
+#function to simulate one chunk of compounded horizon returns (in %) for every stock
+def _capm_chunk(alpha, beta, market, resid, horizon, method, seed, size):
+    rng = np.random.default_rng(seed)
+    growth = np.zeros((size, len(beta)))
+    if method == 'normal':
+        m_mean, m_sd = market.mean(), market.std(ddof=1)
+        e_sd = resid.std(axis=0, ddof=2)
+    for _ in range(horizon):
+        if method == 'bootstrap':
+            # resample whole days so the market move and every residual stay jointly drawn
+            days = rng.integers(0, len(market), size)
+            daily = alpha + np.outer(market[days], beta) + resid[days]
+        else:
+            daily = alpha + np.outer(m_mean + m_sd * rng.standard_normal(size), beta) \
+                + e_sd * rng.standard_normal((size, len(beta)))
+        growth += np.log1p(daily / 100)
+    return np.expm1(growth) * 100
+
+
+#function to simulate compounded returns over `horizon` days from the CAPM regression
+#method: 'bootstrap' (resampled historical days) or 'normal' (single-index multivariate normal)
+#weights (optional): adds a buy-and-hold 'Portfolio' column
+def simulate_capm(stocks_daily_return, horizon=21, n_paths=20000, method='bootstrap', seed=0,
+                  chunk_size=DEFAULT_CHUNK, processes=None, weights=None, market='sp500'):
+    if method not in ('bootstrap', 'normal'):
+        raise ValueError(f"unknown simulation method: {method!r}")
+    inputs = capm_inputs(stocks_daily_return, market)
+    args = (inputs['alpha'], inputs['beta'], inputs['market'], inputs['resid'], horizon, method)
+    paths = _run(_capm_chunk, args, n_paths, chunk_size, seed, processes)
+    result = pd.DataFrame(paths, columns=inputs['stocks'])
+    if weights is not None:
+        result['Portfolio'] = paths @ np.asarray(weights, dtype=np.float64)
+    return result
+
+
+#function for value at risk and expected shortfall of simulated returns (in %), reported as positive losses
+def var_cvar(samples, level=0.95):
+    frame = pd.DataFrame(samples)
+    values = frame.to_numpy(dtype=np.float64)
+    cutoff = np.quantile(values, 1 - level, axis=0)
+    tail = np.where(values <= cutoff, values, np.nan)
+    return pd.DataFrame({
+        f'VaR {level:.0%}': -cutoff,
+        f'CVaR {level:.0%}': -np.nanmean(tail, axis=0),
+        'Mean': values.mean(axis=0),
+    }, index=frame.columns)
+
+
+#function to simulate one chunk of linear-model forecast paths: mean + shocks convolved with psi
+def _linear_chunk(mean, psi, sigma, residuals, seed, size):
+    rng = np.random.default_rng(seed)
+    steps = len(mean)
+    if residuals is not None:
+        shocks = rng.choice(residuals, size=(size, steps), replace=True)
+    else:
+        shocks = sigma * rng.standard_normal((size, steps))
+    # response[k, h] = psi[h - k] for k <= h: the effect of the shock at step k on step h
+    lags = np.arange(steps)[None, :] - np.arange(steps)[:, None]
+    response = np.where(lags >= 0, psi[np.clip(lags, 0, None)], 0.0)
+    return mean + shocks @ response
+
+
+#function to simulate forecast paths for a linear (ARIMA) model from its point forecast `mean`,
+#impulse responses `psi` and either a shock sd `sigma` or `residuals` to bootstrap
+def linear_paths(mean, psi, sigma=None, residuals=None, n_paths=10000, seed=0,
+                 chunk_size=DEFAULT_CHUNK, processes=None):
+    mean = np.asarray(mean, dtype=np.float64)
+    psi = np.asarray(psi, dtype=np.float64)[:len(mean)]
+    residuals = None if residuals is None else np.asarray(residuals, dtype=np.float64)
+    return _run(_linear_chunk, (mean, psi, sigma, residuals), n_paths, chunk_size, seed, processes)
+
+
+#function to reduce simulated paths (paths x steps) to percentile bands, one column per percentile
+def percentile_bands(paths, percentiles=PERCENTILES, index=None):
+    bands = np.percentile(paths, percentiles, axis=0).T
+    return pd.DataFrame(bands, index=index, columns=[f'p{p}' for p in percentiles])
@@ -1,4 +1,5 @@
 import pandas as pd
+from pages.utils.ticker_universe import write_universe
 
 # Nasdaq full ticker list (live updated)
 url = "https://www.nasdaqtrader.com/dynamic/symdir/nasdaqlisted.txt"
@@ -6,10 +7,10 @@ url = "https://www.nasdaqtrader.com/dynamic/symdir/nasdaqlisted.txt"
 # Read file
 df = pd.read_csv(url, sep='|')
 
-# Extract only the "Symbol" column
-tickers = df['Symbol'].dropna().unique().tolist()
+# Keep the symbol plus the metadata the ticker search uses, skipping test issues
+df = df[df['Symbol'].notna() & (df.get('Test Issue', 'N') != 'Y')]
+df = df.rename(columns={'Security Name': 'Name', 'Market Category': 'Market'})
 
-# Save tickers into a file (CSV or TXT)
-with open("tickers.txt", "w") as f:
-    for t in tickers:
-        f.write(f"{t}\n")
+# Save tickers.txt (sorted) and tickers_meta.csv, both swapped in atomically
+count = write_universe(df.reindex(columns=['Symbol', 'Name', 'Market', 'ETF']).fillna('').to_dict('records'))
+print(f"{count} tickers written")
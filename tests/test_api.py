@@ -0,0 +1,30 @@
+import asyncio
+import json
+import pytest
+
+import api
+
+
+class _Request:
+    headers = {}
+
+
+def _missing(ticker):
+    raise api.NotFound(f"no price history for {ticker!r}")
+
+
+def _broken(ticker):
+    return {}[ticker]
+
+
+def test_not_found_is_a_404():
+    response = asyncio.run(api._serve(_Request(), ('test', 'missing'), 60, _missing, 'XYZ'))
+    assert response.status_code == 404
+    assert json.loads(response.body) == {'error': "no price history for 'XYZ'"}
+
+
+def test_other_errors_are_not_a_404():
+    # a bug inside a payload must reach Starlette (and come back as a 500), not pass for a missing ticker
+    with pytest.raises(KeyError):
+        asyncio.run(api._serve(_Request(), ('test', 'broken'), 60, _broken, 'XYZ'))
+    assert api.CACHE.get(('test', 'broken')) is None
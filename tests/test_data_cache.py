@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import capm_functions
+from pages.utils.data_cache import PriceCache, LocalProvider
+
+
+def _write(directory, close, days):
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=len(close), name='Date')[:days]
+    close = np.asarray(close[:days], dtype=np.float64)
+    frame = pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 1000.0},
+                         index=index)
+    frame.reset_index().to_csv(directory / 'TEST.csv', index=False)
+
+
+def _cache(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    provider = LocalProvider(str(data))
+    return data, provider, PriceCache(root=str(tmp_path / 'cache'), providers={'local': provider}, ttl=0)
+
+
+def test_refresh_only_fetches_the_tail(tmp_path):
+    data, provider, cache = _cache(tmp_path)
+    close = 100 + np.arange(40.0)
+    _write(data, close, 30)
+    cache.get('TEST', 'local')
+    _write(data, close, 40)
+    frame = cache.get('TEST', 'local')
+    assert len(frame) == 40
+    np.testing.assert_allclose(frame['Close'], close)
+    # the second call starts at a bar already held, not at the beginning
+    assert provider.calls[-1][1] is not None
+
+
+def test_split_refetches_the_whole_history(tmp_path):
+    data, provider, cache = _cache(tmp_path)
+    _write(data, np.full(40, 400.0), 30)
+    assert (cache.get('TEST', 'local')['Close'] == 400).all()
+    # a 4:1 split after day 30: the adjusted history is now 100 throughout
+    _write(data, np.full(40, 100.0), 40)
+    frame = cache.get('TEST', 'local')
+    assert len(frame) == 40
+    assert (frame['Close'] == 100).all()
+    assert provider.calls[-1][1] is None
+    returns = capm_functions.daily_returns(frame[['Close']].reset_index())
+    assert np.abs(returns['Close'].to_numpy()).max() < 1e-12
+    # and the stored entry is the re-adjusted one
+    reloaded = PriceCache(root=cache.root, providers=cache.providers, ttl=float('inf')).get('TEST', 'local')
+    assert (reloaded['Close'] == 100).all()
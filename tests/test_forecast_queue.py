@@ -0,0 +1,50 @@
+import os
+import time
+import multiprocessing
+import pandas as pd
+from pages.utils import forecast_queue
+
+
+#function standing in for the ARIMA pipeline in the workers: 'CRASH' kills its worker process
+def _fake_forecast(symbol, close_price, order_mode, bands):
+    if symbol == 'CRASH':
+        os._exit(1)
+    time.sleep(0.05)
+    return {'started_at': time.time(), 'fit_seconds': 0.0, 'symbol': symbol}
+
+
+def _wait(jobs, timeout=60):
+    deadline = time.time() + timeout
+    while not all(job.done for job in jobs) and time.time() < deadline:
+        time.sleep(0.05)
+    assert all(job.done for job in jobs)
+
+
+def test_a_dead_worker_leaves_one_live_pool(monkeypatch):
+    monkeypatch.setattr(forecast_queue, 'run_forecast', _fake_forecast)
+    queue = forecast_queue.ForecastQueue(max_workers=2, max_queue=16, start_method='fork')
+    pools = []
+    executor = queue._executor
+
+    def tracked():
+        pool = executor()
+        if not pools or pools[-1] is not pool:
+            pools.append(pool)
+        return pool
+    monkeypatch.setattr(queue, '_executor', tracked)
+
+    close = pd.DataFrame({'Close': [1.0, 2.0, 3.0]})
+    jobs = [queue.submit(symbol, close) for symbol in ['A', 'CRASH', 'B', 'C', 'D', 'E']]
+    _wait(jobs)
+    assert jobs[1].state == 'failed'
+    assert any(job.state == 'done' for job in jobs)
+    # every pool but the current one was shut down
+    assert all(pool._shutdown_thread for pool in pools if pool is not queue._pool)
+    after = queue.submit('F', close)
+    _wait([after])
+    assert after.state == 'done'
+    queue.shutdown()
+    deadline = time.time() + 10
+    while multiprocessing.active_children() and time.time() < deadline:
+        time.sleep(0.05)
+    assert not multiprocessing.active_children()
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+import indicator_functions
+
+# the kernels are checked against pandas_ta itself (pip install -r requirements-test.txt; needs Python 3.12+)
+pta = pytest.importorskip('pandas_ta', reason="pandas_ta is not installed (it needs Python 3.12+)")
+
+ROWS, TICKERS = 600, 8
+
+
+#function for synthetic OHLC frames (rows x tickers): ragged listing dates, a few missing days inside
+#every other ticker's history (one within its first bars, one three days long) and one delisted ticker
+def _bars(seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, (ROWS, TICKERS)), axis=0))
+    spread = np.abs(rng.normal(0, 0.01, (ROWS, TICKERS))) * close
+    starts = rng.integers(0, ROWS // 2, TICKERS)
+    starts[0] = 0
+    missing = np.arange(ROWS)[:, None] < starts
+    for j in range(1, TICKERS, 2):
+        missing[starts[j] + np.array([5, 60, 61, 62, 200]), j] = True
+    missing[ROWS - 50:, 2] = True
+    index = pd.bdate_range(end='2026-10-16', periods=ROWS, name='Date')
+    columns = [f'T{j}' for j in range(TICKERS)]
+    return {field: pd.DataFrame(np.where(missing, np.nan, values), index=index, columns=columns)
+            for field, values in (('Close', close), ('High', close + spread), ('Low', close - spread))}
+
+
+def _pick(frame, *prefixes):
+    return [frame[next(c for c in frame.columns if c.startswith(prefix))] for prefix in prefixes]
+
+
+REFERENCE = {
+    'rsi': lambda b: [pta.rsi(b['Close'], length=14, talib=False)],
+    'sma': lambda b: [pta.sma(b['Close'], length=50, talib=False)],
+    'ema': lambda b: [pta.ema(b['Close'], length=10, talib=False)],
+    'macd': lambda b: _pick(pta.macd(b['Close'], fast=12, slow=26, signal=9, talib=False),
+                            'MACD_', 'MACDs_', 'MACDh_'),
+    'bollinger': lambda b: _pick(pta.bbands(b['Close'], length=20, std=2.0, ddof=0, talib=False),
+                                 'BBL_', 'BBM_', 'BBU_'),
+    'atr': lambda b: [pta.atr(b['High'], b['Low'], b['Close'], length=14, talib=False)],
+}
+
+KERNELS = {
+    'rsi': lambda b: indicator_functions.rsi(b['Close'], 14),
+    'sma': lambda b: indicator_functions.sma(b['Close'], 50),
+    'ema': lambda b: indicator_functions.ema(b['Close'], 10),
+    'macd': lambda b: indicator_functions.macd(b['Close'], 12, 26, 9),
+    'bollinger': lambda b: indicator_functions.bollinger(b['Close'], 20, 2.0),
+    'atr': lambda b: indicator_functions.atr(b['High'], b['Low'], b['Close'], 14),
+}
+
+
+def _outputs(result):
+    return list(result) if isinstance(result, tuple) else [result]
+
+
+#function for one ticker's bars over its own history (from its listing on), as pandas_ta would be given them
+def _history(bars, column):
+    start = bars['Close'][column].first_valid_index()
+    return {field: frame[column].loc[start:] for field, frame in bars.items()}
+
+
+def _assert_matches(got, expected):
+    got, expected = np.asarray(got, dtype=np.float64), np.asarray(expected, dtype=np.float64)
+    np.testing.assert_array_equal(np.isnan(got), np.isnan(expected))
+    np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize('name', sorted(KERNELS))
+@pytest.mark.parametrize('column', ['T0', 'T1', 'T2'])
+def test_series_matches_pandas_ta(name, column):
+    history = _history(_bars(), column)
+    expected = REFERENCE[name](history)
+    got = _outputs(KERNELS[name](history))
+    assert all(isinstance(values, pd.Series) for values in got)
+    for values, reference in zip(got, expected):
+        pd.testing.assert_index_equal(values.index, reference.index)
+        _assert_matches(values, reference)
+    arrays = {field: values.to_numpy() for field, values in history.items()}
+    for values, reference in zip(_outputs(KERNELS[name](arrays)), expected):
+        assert values.ndim == 1
+        _assert_matches(values, reference)
+
+
+@pytest.mark.parametrize('name', sorted(KERNELS))
+@pytest.mark.parametrize('as_array', [False, True])
+def test_matrix_matches_pandas_ta_per_column(name, as_array):
+    bars = _bars(seed=1)
+    given = {field: frame.to_numpy() for field, frame in bars.items()} if as_array else bars
+    got = _outputs(KERNELS[name](given))
+    for values in got:
+        assert values.shape == (ROWS, TICKERS)
+        if not as_array:
+            pd.testing.assert_index_equal(values.index, bars['Close'].index)
+    for j, column in enumerate(bars['Close'].columns):
+        history = _history(bars, column)
+        rows = bars['Close'].index.get_indexer(history['Close'].index)
+        for values, reference in zip(got, REFERENCE[name](history)):
+            values = np.asarray(values, dtype=np.float64)
+            _assert_matches(values[rows, j], reference)
+            assert np.isnan(values[:rows[0], j]).all()
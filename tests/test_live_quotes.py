@@ -0,0 +1,65 @@
+import time
+import numpy as np
+import pandas as pd
+import indicator_functions
+from pages.utils import indicator_engine
+from pages.utils import live_quotes
+
+
+def _closes(rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, rows)))
+
+
+def _history(rows=300):
+    close = _closes(rows)
+    index = pd.bdate_range(end='2026-10-16', periods=rows, name='Date')
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                         'Volume': 1000.0}, index=index)
+
+
+class _NoQuotes:
+
+    def poll(self, symbol):
+        return live_quotes._bars(None)
+
+
+def test_macd_state_matches_batch_macd():
+    closes = _closes()
+    state, columns = indicator_engine.new_state('macd')
+    streamed = np.array(indicator_engine.replay(state, closes))
+    for column, batch in zip(streamed.T, indicator_functions.macd(closes)):
+        np.testing.assert_array_equal(np.isnan(column), np.isnan(batch))
+        np.testing.assert_allclose(column[~np.isnan(batch)], batch[~np.isnan(batch)], rtol=1e-9, atol=1e-9)
+
+
+def test_macd_state_matches_batch_macd_with_other_lengths():
+    closes = _closes(seed=1)
+    state, _ = indicator_engine.new_state('macd', fast=5, slow=35, signal=5)
+    streamed = np.array(indicator_engine.replay(state, closes))
+    batch = np.column_stack(indicator_functions.macd(closes, 5, 35, 5))
+    np.testing.assert_allclose(streamed, batch, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_feed_is_shared_per_symbol_and_stops_with_its_last_user():
+    history = _history()
+    first = live_quotes.acquire_feed('TEST', history, source=_NoQuotes(), interval=0.01)
+    second = live_quotes.acquire_feed('TEST', history, source=_NoQuotes(), interval=0.01)
+    assert first is second and first.users == 2 and first.running
+    live_quotes.release_feed(first)
+    assert first.running
+    live_quotes.release_feed(second)
+    assert not first.running
+
+
+def test_unread_feed_stops_itself():
+    feed = live_quotes.acquire_feed('IDLE', _history(), source=_NoQuotes(), interval=0.01, idle=0.1)
+    deadline = time.time() + 5
+    while feed.running and time.time() < deadline:
+        time.sleep(0.02)
+    assert not feed.running
+    again = live_quotes.acquire_feed('IDLE', _history(), source=_NoQuotes(), interval=0.01, idle=0.1)
+    assert again is not feed and again.running
+    live_quotes.release_feed(again)
+    live_quotes.release_feed(feed)
+    assert not again.running